@@ -1,10 +1,20 @@
 import sys, os
+import argparse
 import cmd
+import itertools
 import json
+import shlex
+import threading
 
 from PyQt5.QtWidgets import QApplication
 
 from arclimb.core.graph import Graph, Node
+from arclimb.core.correspondence.batch import find_all_correspondences, precompute_features
+from arclimb.core.correspondence.featurestore import FeatureStore, set_default_feature_store
+from arclimb.core.correspondence.trace import Trace
+from arclimb.core.utils import graph_serialization
+from arclimb.core.utils.graph_journal import GraphJournal
+from arclimb.core.utils.imagecache import ImageCache, set_default_image_cache
 
 from arclimb.annotator import ImagePairEditorDialog
 
@@ -15,11 +25,21 @@ class Cigar(cmd.Cmd):
     intro = 'Welcome to the Cigar shell.   Type help or ? to list commands.\n'
     prompt = '(cigar) '
     filename = None
+    default_filename = "labels.json"
+    # Images and features computed by "add --precompute" are kept here, in the current directory
+    cache_dir = ".arclimb-cache"
 
     graph = Graph()
 
     def __init__(self, filename=None):
         super().__init__()
+        # Changes not saved yet are written to the journal of the current file (or of the default one)
+        self.journal = GraphJournal(self.default_filename)
+        self.precompute_thread = None
+        self.precompute_stop = threading.Event()
+        self.using_cache_dir = False
+        if os.path.isdir(self.cache_dir):
+            self.use_cache_dir()
         if filename is not None:
             self.open(filename)
 
@@ -31,6 +51,7 @@ class Cigar(cmd.Cmd):
     def do_exit(self, arg):
         'Exit cigar:  exit'
         print('Thank you for using the only cigar that is not bad for your health.')
+        self.stop_precompute()
         self.close()
         return True
 
@@ -48,8 +69,8 @@ class Cigar(cmd.Cmd):
 
         if filename == '':
             if self.filename is None:
-                print("No file name provided. Using \"labels.json\"")
-                self.filename = filename = "labels.json"
+                print("No file name provided. Using \"%s\"" % self.default_filename)
+                self.filename = filename = self.default_filename
             else:
                 filename = self.filename
 
@@ -67,8 +88,19 @@ class Cigar(cmd.Cmd):
         """Shows the current graph in JSON format:  show"""
         print(json.dumps(self.graph.to_dict(), indent=4))
 
+    add_parser = argparse.ArgumentParser(prog='add', add_help=False)
+    add_parser.add_argument('-p', '--precompute', action='store_true')
+    add_parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    add_parser.add_argument('files', nargs='*')
+
     def do_add(self, arg):
-        if arg.strip() == "":
+        try:
+            args = self.add_parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # argparse already printed the error
+            return
+
+        if len(args.files) == 0:
             # Add all jpg/jpeg in current folder
             files = []
             for entry in os.scandir():
@@ -77,7 +109,7 @@ class Cigar(cmd.Cmd):
                     if name_lowercase.endswith('.jpg') or name_lowercase.endswith('.jpeg'):
                         files.append(entry.name)
         else:
-            files = arg.split()
+            files = args.files
             # Check if all files exist
             for file in files:
                 try:
@@ -87,16 +119,29 @@ class Cigar(cmd.Cmd):
                     return
 
         # Add each file as new node if there is no node with the same name
+        new_files = []
         for file in files:
             if not self.graph.has_node(file):
-                self.graph.add_node(Node(file))
+                node = Node(file)
+                self.graph.add_node(node)
+                self.journal.add_node(node)
+                new_files.append(file)
         print("%d images added (or already present)." % len(files))
 
+        if args.precompute and len(new_files) > 0:
+            self.start_precompute(new_files, args.workers)
+
     def help_add(self):
         print("Adds one or more files from the current directory as nodes.")
         print()
         print("add: adds all .jpg or .jpeg files.")
         print("add file1 [file2]...: adds file1, [file2...].")
+        print()
+        print("Options:")
+        print("  -p, --precompute: prepare the new images and their features in the background, in %s, so that" %
+              self.cache_dir)
+        print("                    label and autolabel can use them right away.")
+        print("  -j N, --workers N: number of worker processes used by --precompute (default: number of CPUs).")
 
     def do_label(self, arg):
         """Label two images:  label img1 img2"""
@@ -116,34 +161,177 @@ class Cigar(cmd.Cmd):
         correspondences = []
         if self.graph.has_edge(img1, img2):
             correspondences = self.graph.get_correspondences(img1, img2)
-        corr, accepted = ImagePairEditorDialog.run(img1, img2, correspondences)
+        try:
+            corr, accepted = ImagePairEditorDialog.run(img1, img2, correspondences)
+        except IOError as e:
+            print("Error: %s." % e)
+            return
 
         if accepted:
             if not self.graph.has_edge(img1, img2):
                 self.graph.add_edge(img1, img2)
             self.graph.set_correspondences(img1, img2, corr)
+            self.journal.set_correspondences(img1, img2, self.graph.get_correspondence_array(img1, img2))
+
+    autolabel_parser = argparse.ArgumentParser(prog='autolabel', add_help=False)
+    autolabel_parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    autolabel_parser.add_argument('-m', '--min-matches', type=int, default=4)
+    autolabel_parser.add_argument('-f', '--force', action='store_true')
+    autolabel_parser.add_argument('-t', '--trace', action='store_true')
+    autolabel_parser.add_argument('images', nargs='*')
+
+    def do_autolabel(self, arg):
+        try:
+            args = self.autolabel_parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            # argparse already printed the error
+            return
+
+        images = args.images
+        if len(images) == 0:
+            images = sorted(node.id for node in self.graph.iter_nodes())
+
+        for img_name in images:
+            if not self.graph.has_node(img_name):
+                print("Error: the graph does not have the node %s." % img_name)
+                return
+
+        pairs = [(img1, img2) for img1, img2 in itertools.combinations(images, 2)
+                 if args.force or not self.graph.has_edge(img1, img2)]
+        if len(pairs) == 0:
+            print("Nothing to do: all the pairs are labelled already.")
+            return
+
+        n_added = 0
+        trace = Trace() if args.trace else None
+        try:
+            if self.precompute_thread is not None and self.precompute_thread.is_alive():
+                print("Waiting for the features being precomputed...")
+                self.precompute_thread.join()
+            cache_dir = self.cache_dir if self.using_cache_dir else None
+            results = find_all_correspondences(pairs, workers=args.workers, cache_dir=cache_dir, trace=trace)
+            for i, (img1, img2, corrs) in enumerate(results, 1):
+                if corrs is None:
+                    status = "failed"
+                elif len(corrs) < args.min_matches:
+                    status = "%d correspondences, skipped" % len(corrs)
+                else:
+                    status = "%d correspondences" % len(corrs)
+                    self.graph.set_correspondence_array(img1, img2, corrs)
+                    self.journal.set_correspondences(img1, img2, corrs)
+                    n_added += 1
+                print("[%d/%d] %s - %s: %s" % (i, len(pairs), img1, img2, status))
+        except KeyboardInterrupt:
+            print("Interrupted.")
+
+        print("%d edges added or updated." % n_added)
+        if trace is not None:
+            print()
+            print(trace)
+
+    def help_autolabel(self):
+        print("Finds correspondences automatically for all the pairs of images, in parallel.")
+        print()
+        print("autolabel: labels all the pairs of nodes that are not connected yet.")
+        print("autolabel file1 file2 [file3]...: only labels the pairs among the given nodes.")
+        print()
+        print("Options:")
+        print("  -j N, --workers N: number of worker processes (default: number of CPUs).")
+        print("  -m N, --min-matches N: only add an edge if at least N correspondences are found (default: 4).")
+        print("  -f, --force: also label the pairs that already have an edge, replacing their correspondences.")
+        print("  -t, --trace: print the time spent in each stage of the matching, and its counts, for all the pairs.")
+
+    def use_cache_dir(self):
+        """Makes the images and features saved in cache_dir available to the editor and to the matchers."""
+        if not self.using_cache_dir:
+            set_default_image_cache(ImageCache(cache_dir=self.cache_dir))
+            set_default_feature_store(FeatureStore(cache_dir=self.cache_dir))
+            self.using_cache_dir = True
+
+    def start_precompute(self, files, workers):
+        if self.precompute_thread is not None and self.precompute_thread.is_alive():
+            print("Error: features are still being precomputed, try again later.")
+            return
+
+        self.use_cache_dir()
+        self.precompute_stop.clear()
+        self.precompute_thread = threading.Thread(target=self._precompute, args=(files, workers), daemon=True)
+        self.precompute_thread.start()
+        print("Precomputing features of %d images in the background." % len(files))
+
+    def _precompute(self, files, workers):
+        n_done, failed = 0, []
+        results = precompute_features(files, self.cache_dir, workers=workers)
+        try:
+            for file, n_keypoints in results:
+                if n_keypoints is None:
+                    failed.append(file)
+                else:
+                    n_done += 1
+                if self.precompute_stop.is_set():
+                    return
+        finally:
+            results.close()
+
+        message = "Features of %d images precomputed." % n_done
+        if len(failed) > 0:
+            message += " Failed: %s." % ", ".join(failed)
+        # The prompt was already printed, print it again after the message
+        print("\n%s\n%s" % (message, self.prompt), end='', flush=True)
+
+    def stop_precompute(self):
+        if self.precompute_thread is not None:
+            self.precompute_stop.set()
+            self.precompute_thread.join()
+            self.precompute_thread = None
 
     def open(self, filename: str):
         try:
-            with open(filename) as f:
-                self.graph = Graph.from_dict(json.load(f))
-            self.filename = filename
-            print("Opened %s" % filename)
+            journal = GraphJournal(filename)
+            if os.path.isfile(filename) or not os.path.isfile(journal.path):
+                graph = graph_serialization.from_json(filename)
+            else:
+                # The graph was never saved, but there are changes to recover
+                graph = Graph()
+            n_recovered = journal.replay(graph)
         except:
             print("Error opening %s." % filename)
+            return
+
+        self.journal.close()
+        self.graph, self.filename, self.journal = graph, filename, journal
+        print("Opened %s" % filename)
+        if n_recovered > 0:
+            print("Recovered %d unsaved changes from %s." % (n_recovered, journal.path))
+        if journal.stale_path is not None:
+            print("Warning: %s was changed after the unsaved changes were made; they were not applied, and were "
+                  "moved to %s." % (filename, journal.stale_path))
 
     def save(self, filename: str):
         try:
-            with open(filename, 'w') as f:
-                json.dump(self.graph.to_dict(), f)
-            self.filename = filename
-            print("Saved %s." % filename)
+            graph_serialization.to_json(self.graph, filename)
         except:
             print("Error saving %s." % filename)
+            return
+
+        # All the changes are in the file now
+        self.journal.clear()
+        self.journal = GraphJournal(filename)
+        self.journal.clear()
+        self.filename = filename
+        print("Saved %s." % filename)
 
     def close(self):
+        self.journal.close()
         self.graph = Graph()
         self.filename = None
+        self.journal = GraphJournal(self.default_filename)
+
+    def postcmd(self, stop, line):
+        # Once the journal is long enough, fold its changes into a snapshot; the graph file is only written by save
+        if not stop and self.journal.needs_compaction():
+            self.journal.compact(self.graph)
+        return stop
 
     def precmd(self, line):
         # any preprocessing of line goes here
@@ -153,10 +341,11 @@ class Cigar(cmd.Cmd):
 def run_cigar():
     # TODO: add command line arguments and a default behaviour (e.g.: preadd all jpegs in current folder)
 
-    filename = "labels.json"
+    filename = Cigar.default_filename
 
     app = QApplication(sys.argv)
-    Cigar(filename if os.path.isfile(filename) else None).cmdloop()
+    has_journal = os.path.isfile(GraphJournal(filename).path)
+    Cigar(filename if os.path.isfile(filename) or has_journal else None).cmdloop()
 
 if __name__ == '__main__':
     run_cigar()
\ No newline at end of file
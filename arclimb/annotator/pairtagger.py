@@ -3,17 +3,21 @@
 import cv2
 import numpy as np
 
-from typing import List, Union, Callable, cast, NewType, Optional
+import functools
+from typing import Dict, List, Union, Callable, cast, NewType, Optional
 
 # TODO(beisner): Decide if we should replace these with 'import *', since  they're getting a bit unruly
-from PyQt5.QtCore import QPointF, QRectF, QLineF, QSize, QSizeF, Qt, pyqtSignal
+from PyQt5.QtCore import QPointF, QRectF, QLineF, QSize, QSizeF, Qt, pyqtSignal, QThreadPool, QTimer
 from PyQt5.QtGui import QPolygonF, QPainterPath, QPainter, QPixmap, QWheelEvent, QMouseEvent, QCursor, QColor, QPen
 from PyQt5.QtWidgets import QGraphicsItem, QGraphicsView, QSizePolicy, QGraphicsScene, QMenu, QAction, \
     QMessageBox, QInputDialog, QDialog, QVBoxLayout, QHBoxLayout, QButtonGroup, QPushButton, QApplication, \
-    QFileDialog, QStyleOptionGraphicsItem, QWidget
+    QFileDialog, QStyleOptionGraphicsItem, QWidget, QGraphicsPixmapItem
 
-from arclimb.core.correspondence import DoubleORBMatcher, CorrespondenceFinder
-from arclimb.core.utils.image import scale_down_image
+from arclimb.core.correspondence import DoubleORBMatcher, CorrespondenceFinder, get_default_feature_store
+from arclimb.core.utils.imagecache import ImageCache, get_default_image_cache
+from arclimb.core.utils.spatial import GridIndex
+from arclimb.annotator.qtimage import get_qimage
+from arclimb.annotator.tasks import Task, TaskFunction, emitInBatches
 from arclimb.core import Point, Correspondence
 from arclimb.core import HomographicPointMap
 
@@ -133,6 +137,8 @@ class PointItem(BaseItem):
             if self.correspondenceItem is not None:
                 self.correspondenceItem.adjust()
             self._updateModel()
+            if self.correspondenceItem is not None:
+                self.imagePairEditor.correspondencesChanged()
         if change == QGraphicsItem.ItemSelectedHasChanged:
             # When a node is selected, also the CorrespondenceItem needs to update
             if self.correspondenceItem is not None:
@@ -239,73 +245,110 @@ class CorrespondenceItem(BaseItem):
 
 
 # noinspection PyPep8Naming
-class KeypointItem(BaseItem):
+class KeypointLayerItem(QGraphicsItem):
     """
-    QGraphicsItem representing a KeyPoint. The GUI allows to replace a pair of KeyPointItems with a PointItem for
-    convenience.
+    QGraphicsItem drawing all the keypoints of an image, as a child of its pixmap item (so coordinates are in pixels of
+    the image). Keypoints are kept in a GridIndex, which is used both to draw only the ones in the exposed area and for
+    hit-testing with keypointAt; the item itself has an empty shape, so it never gets mouse events.
+    The GUI allows to snap a new PointItem to a keypoint for convenience.
     """
 
     TYPE = QGraphicsItem.UserType + 3
     RADIUS = 4
+    MAX_CIRCLES = 2000  # If more keypoints are visible, they are drawn as dots
 
     def type(self):
-        return KeypointItem.TYPE
+        return KeypointLayerItem.TYPE
 
-    def __init__(self, imagePairEditor: 'ImagePairEditor', position: Point, boundTo: QGraphicsItem):
-        super().__init__(imagePairEditor)
+    def __init__(self, image: QGraphicsPixmapItem):
+        super().__init__(image)
 
-        self.correspondenceItem = None
+        self._index = GridIndex(KeypointLayerItem.RADIUS * 8)
+        self._selected = None  # type: Optional[int]
 
-        self.position = position
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.setZValue(1)
 
-        self.boundToImg = boundTo
+    def __len__(self):
+        return len(self._index)
 
-        p = position.toAbsoluteCoordinates(boundTo.sceneBoundingRect())
-        self.setPos(p.x, p.y)
+    def _imageSize(self) -> QSizeF:
+        return QSizeF(self.parentItem().pixmap().size())
 
-        self.setCursor(Qt.PointingHandCursor)
+    def addKeypoints(self, positions: List[Point]):
+        """Adds keypoints given in relative coordinates."""
+        size = self._imageSize()
+        self._index.add_many((p.x * size.width(), p.y * size.height()) for p in positions)
+        self.update()
 
-        self.setFlag(QGraphicsItem.ItemIsSelectable)
-        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
-        self.setFlag(QGraphicsItem.ItemIgnoresTransformations)
-        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
-        self.setZValue(1)
+    def getKeypoint(self, keypoint: int) -> Point:
+        """Returns the position of a keypoint in relative coordinates."""
+        size = self._imageSize()
+        x, y = self._index.get(keypoint)
+        return Point(x / size.width(), y / size.height())
 
-    def getModel(self):
-        return None
+    def getKeypointScenePos(self, keypoint: int) -> QPointF:
+        return self.mapToScene(QPointF(*self._index.get(keypoint)))
 
-    def boundingRect(self):
-        r = KeypointItem.RADIUS
-        return QRectF(-r, -r, 2 * r, 2 * r)
+    def removeKeypoint(self, keypoint: int):
+        self._index.remove(keypoint)
+        if self._selected == keypoint:
+            self._selected = None
+        self.update()
 
-    def shape(self):
-        path = QPainterPath()
-        path.addEllipse(self.boundingRect())
-        return path
+    def clear(self):
+        self._index.clear()
+        self._selected = None
+        self.update()
 
-    def paint(self, painter, option, widget=None):
-        super().paint(painter, option, widget)
+    def keypointAt(self, scenePos: QPointF, viewScale: float) -> Optional[int]:
+        """
+        Returns the keypoint drawn at scenePos, or None; viewScale is the scale factor of the view, since keypoints
+        have a fixed size on screen.
+        """
+        pos = self.mapFromScene(scenePos)
+        return self._index.nearest(pos.x(), pos.y(), KeypointLayerItem.RADIUS / viewScale)
 
-        # painter.setPen(QColor('green'))
+    def getSelectedKeypoint(self) -> Optional[int]:
+        return self._selected
 
-        pen = painter.pen()
-        if self.isSelected():
-            pen.setWidth(2)
+    def setSelectedKeypoint(self, keypoint: Optional[int]):
+        if self._selected != keypoint:
+            self._selected = keypoint
+            self.update()
 
-        painter.setPen(pen)
-        painter.drawEllipse(self.boundingRect())
+    def boundingRect(self):
+        # Keypoints lie in the image, but circles around the ones on the border extend out of it when zoomed out
+        rect = QRectF(QPointF(0, 0), self._imageSize())
+        margin = max(rect.width(), rect.height()) / 50
+        return rect.adjusted(-margin, -margin, margin, margin)
 
-    def itemChange(self, change, value):
-        # TODO: do we need this?
-        return super().itemChange(change, value)
+    def shape(self):
+        return QPainterPath()
 
-    def mousePressEvent(self, event):
-        self.update()
-        super().mousePressEvent(event)
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        r = KeypointLayerItem.RADIUS / lod
 
-    def mouseReleaseEvent(self, event):
-        self.update()
-        super().mouseReleaseEvent(event)
+        exposed = option.exposedRect.adjusted(-r, -r, r, r)
+        keypoints = self._index.query_rect(exposed.left(), exposed.top(), exposed.right(), exposed.bottom())
+
+        pen = QPen(QColor('yellow'))
+        pen.setCosmetic(True)
+        if len(keypoints) > KeypointLayerItem.MAX_CIRCLES:
+            # Level of detail: too many keypoints on screen to tell circles apart
+            pen.setWidth(3)
+            painter.setPen(pen)
+            painter.drawPoints(QPolygonF([QPointF(*self._index.get(k)) for k in keypoints]))
+        else:
+            painter.setPen(pen)
+            for k in keypoints:
+                painter.drawEllipse(QPointF(*self._index.get(k)), r, r)
+
+        if self._selected is not None:
+            pen.setWidth(2)
+            painter.setPen(pen)
+            painter.drawEllipse(QPointF(*self._index.get(self._selected)), r, r)
 
 
 # noinspection PyPep8Naming
@@ -326,7 +369,7 @@ class GhostItem(BaseItem):
         self.setFlag(QGraphicsItem.ItemIgnoresTransformations)
 
     def boundingRect(self):
-        r = KeypointItem.RADIUS
+        r = KeypointLayerItem.RADIUS
         return QRectF(-r, -r, 2 * r, 2 * r)
 
     def shape(self):
@@ -350,6 +393,11 @@ class ImagePairEditor(QGraphicsView):
     MODE_INSERT = 2
     MODE_DELETE = 3
 
+    GHOST_REFIT_DELAY = 200  # ms
+
+    # Kinds of background tasks that don't show a busy cursor
+    QUIET_TASKS = {'ghost'}
+
     modeChanged = pyqtSignal(int)  # Emitted when mode changes
 
     def __init__(self, parent, image1: str, image2: str, correspondences: Optional[List[Correspondence]] = None):
@@ -377,23 +425,41 @@ class ImagePairEditor(QGraphicsView):
 
         self._image1 = scene.addPixmap(QPixmap())
         self._image2 = scene.addPixmap(QPixmap())
+        self._keypointLayers = [KeypointLayerItem(self._image1), KeypointLayerItem(self._image2)]
 
-        # Also open the images in OpenCV format, since converting between Mat and QImage is not trivial.
-        # TODO: find a better way.
-        self._image1_cv = cv2.imread(image1)
-        self._image2_cv = cv2.imread(image2)
-
-        self.setImages(image1, image2)
+        self._image_cache = get_default_image_cache()
 
-        if correspondences is not None:
-            for corr in correspondences:
-                self.addCorrespondence(corr)
+        # Background tasks (see _startTask) that are still running, by kind
+        self._threadPool = QThreadPool.globalInstance()
+        self._tasks = {}  # type: Dict[str, List[Task]]
+        self._cancelledTasks = []  # type: List[Task]
+        self._busy = False
 
         # Initialize ghost
         self._ghost = GhostItem(self)
         self.scene().addItem(self._ghost)
         self._ghost.hide()
         self._ghost_enabled = False
+        self._ghost_pointmap = None
+
+        # The ghost is refitted in the background once correspondences stop changing for GHOST_REFIT_DELAY ms
+        self._ghostRefitTimer = QTimer(self)
+        self._ghostRefitTimer.setSingleShot(True)
+        self._ghostRefitTimer.setInterval(ImagePairEditor.GHOST_REFIT_DELAY)
+        self._ghostRefitTimer.timeout.connect(self._refitGhost)
+
+        # Position updates are throttled to the refresh rate of the screen
+        refreshRate = QApplication.primaryScreen().refreshRate() if QApplication.primaryScreen() is not None else 0
+        self._ghostMoveTimer = QTimer(self)
+        self._ghostMoveTimer.setSingleShot(True)
+        self._ghostMoveTimer.setInterval(int(1000 / refreshRate) if refreshRate > 0 else 16)
+        self._ghostMoveTimer.timeout.connect(self._updateGhostPosition)
+
+        self.setImages(image1, image2)
+
+        if correspondences is not None:
+            for corr in correspondences:
+                self.addCorrespondence(corr)
 
         self.fitToImages()
 
@@ -405,6 +471,13 @@ class ImagePairEditor(QGraphicsView):
         scene.addItem(node1)
         scene.addItem(node2)
         scene.addItem(CorrespondenceItem(self, node1, node2))
+        self.correspondencesChanged()
+
+    def correspondencesChanged(self):
+        """Called whenever correspondences are added, moved or removed."""
+        if self._ghost_enabled:
+            # Restarting the timer debounces the refit while the user is dragging
+            self._ghostRefitTimer.start()
 
     def showEvent(self, event):
         super().showEvent(event)
@@ -425,10 +498,14 @@ class ImagePairEditor(QGraphicsView):
     def setImages(self, image1: str, image2: str):
         assert image1 is not None and image2 is not None
 
+        # Images are decoded once by OpenCV and shared with Qt and with the matchers through the image cache
+        self._image1_path = image1
+        self._image2_path = image2
+
         self._zoom = 0
         self.setDragMode(QGraphicsView.ScrollHandDrag)
-        self._image1.setPixmap(QPixmap(image1))
-        self._image2.setPixmap(QPixmap(image2))
+        self._image1.setPixmap(QPixmap.fromImage(get_qimage(image1, self._image_cache)))
+        self._image2.setPixmap(QPixmap.fromImage(get_qimage(image2, self._image_cache)))
         self.fitToImages()
 
     def setGhostEnabled(self, enabled: bool = True) -> None:
@@ -437,20 +514,53 @@ class ImagePairEditor(QGraphicsView):
 
         self._ghost_enabled = enabled
         if enabled:
-            self._ghost_pointmap = HomographicPointMap(self.getCorrespondences())
+            self._ghost_pointmap = None
+            self._refitGhost()
+        else:
+            self._ghostRefitTimer.stop()
+            self._ghostMoveTimer.stop()
+            self.cancelTasks('ghost')
+            self._ghost.hide()
+
+    # Fits the point map of the ghost on a worker thread, starting from the current one
+    def _refitGhost(self):
+        if not self._ghost_enabled:
+            return
 
-            # TODO: handle if the PointMap fails to build
+        correspondences = self.getCorrespondences()
+        initial = self._ghost_pointmap.getPerspectiveTransformation() if self._ghost_pointmap is not None else None
 
+        def fit(emit, isCancelled):
+            try:
+                # The threshold is in relative coordinates, like the correspondences
+                pointmap = HomographicPointMap(correspondences, HomographicPointMap.DEFAULT_THRESHOLD,
+                                               initialHomography=initial)
+            except ValueError:
+                # Not enough correspondences (or no homography fits them): nothing to show
+                pointmap = None
+            emit([pointmap])
+
+        self._startTask('ghost', fit, self._setGhostPointMap)
+
+    def _setGhostPointMap(self, pointmaps: List[Optional[HomographicPointMap]]):
+        if self._ghost_enabled:
+            self._ghost_pointmap = pointmaps[-1]
             self._updateGhostPosition()
-        else:
-            self._ghost.hide()
+
+    def _scheduleGhostUpdate(self):
+        if not self._ghostMoveTimer.isActive():
+            self._ghostMoveTimer.start()
 
     def _updateGhostPosition(self):
+        if self._ghost_pointmap is None:
+            self._ghost.hide()
+            return
+
         scenePos = self.mapToScene(self.mapFromGlobal(QCursor.pos()))
         pt = Point(scenePos).toRelativeCoordinates(self._image1.sceneBoundingRect())
         if 0 <= pt.x <= 1 and 0 <= pt.y <= 1:
-            pt_mapped, _ = self._ghost_pointmap(pt)
-            ghostScenePos = pt_mapped.toAbsoluteCoordinates(self._image2.sceneBoundingRect())
+            mapped, _ = self._ghost_pointmap.map_many(np.array([pt.asTuple()]))
+            ghostScenePos = Point(mapped[0]).toAbsoluteCoordinates(self._image2.sceneBoundingRect())
 
             self._ghost.setPos(ghostScenePos.x, ghostScenePos.y)
             self._ghost.show()
@@ -501,10 +611,11 @@ class ImagePairEditor(QGraphicsView):
         image_rect = clicked_image.sceneBoundingRect()
         clickScenePos = self.mapToScene(event.pos())
 
-        keypointItems = [x for x in items if isinstance(x, KeypointItem)]
-        if len(keypointItems) > 0:
+        layer = self._getKeypointLayer(clicked_image)
+        keypoint = layer.keypointAt(clickScenePos, self.transform().m11())
+        if keypoint is not None:
             # If a keypoint was clicked, adjust the coordinates of the click to its coordinates
-            clickScenePos = keypointItems[0].pos()
+            clickScenePos = layer.getKeypointScenePos(keypoint)
 
         pt = Point(clickScenePos).toRelativeCoordinates(image_rect)
 
@@ -527,17 +638,24 @@ class ImagePairEditor(QGraphicsView):
                     CorrespondenceItem(self, cast(PointItem, self._insert_src), cast(PointItem, self._insert_dst)))
                 self._insert_src = None
                 self._insert_dst = None
+                self.correspondencesChanged()
         elif self.getMode() == ImagePairEditor.MODE_DELETE:
             # Delete all items overlapping with the cursor
             # TODO: implement stronger deletion tool (e.g.: delete all items in region around the cursor)
             for item in items:
                 self.deleteItem(item)  # FIXME: this sometimes deletes an element twice, which upsets Qt
+            if keypoint is not None:
+                layer.removeKeypoint(keypoint)
+        else:
+            # Selection mode: select the clicked keypoint, if any
+            for other in self._keypointLayers:
+                other.setSelectedKeypoint(keypoint if other is layer else None)
 
     def mouseMoveEvent(self, event: QMouseEvent):
         super().mouseMoveEvent(event)
 
         if self._ghost_enabled:
-            self._updateGhostPosition()
+            self._scheduleGhostUpdate()
 
     def contextMenuEvent(self, event):
         item = self.itemAt(event.pos())
@@ -545,10 +663,10 @@ class ImagePairEditor(QGraphicsView):
         items_at_pos = self.items(event.pos())
         if self._image1 in items_at_pos:
             clicked_image = self._image1
-            clicked_image_cv = self._image1_cv
+            clicked_image_path = self._image1_path
         elif self._image2 in items_at_pos:
             clicked_image = self._image2
-            clicked_image_cv = self._image2_cv
+            clicked_image_path = self._image2_path
         else:
             return  # No context menu for clicks outside the image
 
@@ -571,7 +689,9 @@ class ImagePairEditor(QGraphicsView):
         removeAllKeypointsAction = QAction("Remove all keypoints", self)
         menu.addAction(computeAllKeypointsAction)
         menu.addAction(computeKeypointsAroundHereAction)
-        if isinstance(item, KeypointItem):
+        clickedLayer = self._getKeypointLayer(clicked_image)
+        clickedKeypoint = clickedLayer.keypointAt(self.mapToScene(event.pos()), self.transform().m11())
+        if clickedKeypoint is not None:
             menu.addAction(removeKeypointAction)
         menu.addAction(removeAllKeypointsAction)
 
@@ -590,17 +710,8 @@ class ImagePairEditor(QGraphicsView):
             if retval == QMessageBox.Yes:
                 self.deleteAllItems()
         elif action == autoFillAction:
-            img1 = scale_down_image(self._image1_cv)
-            img2 = scale_down_image(self._image2_cv)
-
-            img1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-            img2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-
-            corrFinder = CorrespondenceFinder(DoubleORBMatcher())
-            correspondences = corrFinder.find_correspondences(img1, img2)
-
-            for corr in correspondences:
-                self.addCorrespondence(corr)
+            self._startTask('autodetect', _autodetectTask(self._image_cache, self._image1_path, self._image2_path),
+                            self._addCorrespondences)
         elif action == computeAllKeypointsAction:
             n_features, ok = QInputDialog.getInt(self, "Choose the number of keypoints.", "SIFT keypoints",
                                                  value=250, min=10, max=5000, step=50)
@@ -609,28 +720,13 @@ class ImagePairEditor(QGraphicsView):
                 return
 
             # Delete any existing keypoint
-            self.deleteAllItems(lambda it: isinstance(it, KeypointItem))
-
-            img1 = scale_down_image(self._image1_cv)
-            img2 = scale_down_image(self._image2_cv)
-
-            img1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-            img2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-
-            sift = cv2.xfeatures2d.SIFT_create(nfeatures=n_features)
-            kp1, _ = sift.detectAndCompute(img1, None)
-            kp2, _ = sift.detectAndCompute(img2, None)
+            self.cancelTasks('keypoints')
+            self.clearKeypoints()
 
-            scene = self.scene()
-            h1, w1, *_ = img1.shape
-            for kp in kp1:
-                pt = kp.pt
-                scene.addItem(KeypointItem(self, position=Point(pt[0] / w1, pt[1] / h1), boundTo=self._image1))
-
-            h2, w2, *_ = img2.shape
-            for kp in kp2:
-                pt = kp.pt
-                scene.addItem(KeypointItem(self, position=Point(pt[0] / w2, pt[1] / h2), boundTo=self._image2))
+            # One task per image, so that they run in parallel
+            for image, path in [(self._image1, self._image1_path), (self._image2, self._image2_path)]:
+                self._startTask('keypoints', _keypointsTask(self._image_cache, path, n_features),
+                                functools.partial(self._addKeypoints, image), cancelRunning=False)
 
         elif action == computeKeypointsAroundHereAction:
             n_features, ok = QInputDialog.getInt(self, "Choose the number of keypoints.", "SIFT keypoints",
@@ -644,31 +740,74 @@ class ImagePairEditor(QGraphicsView):
 
             pt = Point(clickScenePos).toRelativeCoordinates(image_rect)
 
-            img = scale_down_image(clicked_image_cv)
-
-            sift = cv2.xfeatures2d.SIFT_create(nfeatures=n_features)
-
-            h, w, *_ = img.shape
-            radius = min(w, h) / 10
-            x_0, y_0 = pt.x * w, pt.y * h  # coordinates of the click
-
-            # Only show keypoints around the click (radius roughly 1/10 of the image)
-            mask = np.zeros([h, w], np.uint8)
-            y, x = np.ogrid[0:h, 0:w]
-            mask[(x - x_0) ** 2 + (y - y_0) ** 2 <= radius ** 2] = 255
-
-            keypoints, _ = sift.detectAndCompute(img, mask)
-
-            scene = self.scene()
-            for kp in keypoints:
-                pt = kp.pt
-                scene.addItem(KeypointItem(self, position=Point(pt[0] / w, pt[1] / h), boundTo=clicked_image))
+            self._startTask('keypoints', _keypointsTask(self._image_cache, clicked_image_path, n_features, pt),
+                            functools.partial(self._addKeypoints, clicked_image), cancelRunning=False)
 
         elif action == removeKeypointAction:
-            self.deleteItem(item)
+            clickedLayer.removeKeypoint(clickedKeypoint)
 
         elif action == removeAllKeypointsAction:
-            self.deleteAllItems(lambda it: isinstance(it, KeypointItem))
+            self.clearKeypoints()
+
+    def _addCorrespondences(self, correspondences: List[Correspondence]):
+        for corr in correspondences:
+            self.addCorrespondence(corr)
+
+    def _getKeypointLayer(self, image: QGraphicsPixmapItem) -> KeypointLayerItem:
+        return self._keypointLayers[0] if image == self._image1 else self._keypointLayers[1]
+
+    def _addKeypoints(self, boundTo: QGraphicsPixmapItem, positions: List[Point]):
+        self._getKeypointLayer(boundTo).addKeypoints(positions)
+
+    def clearKeypoints(self):
+        for layer in self._keypointLayers:
+            layer.clear()
+
+    # Runs a function on the thread pool (see Task); each batch of its results is passed to onBatch in the GUI thread.
+    # Unless cancelRunning is False, the tasks of the same kind that are still running are cancelled first.
+    def _startTask(self, kind: str, function: TaskFunction, onBatch: Callable[[List], None], cancelRunning=True):
+        if cancelRunning:
+            self.cancelTasks(kind)
+
+        task = Task(function)
+        task.signals.batch.connect(lambda batch: None if task.isCancelled() else onBatch(batch))
+        task.signals.failed.connect(lambda message: None if task.isCancelled() else self._taskFailed(message))
+        task.signals.finished.connect(lambda: self._taskFinished(kind, task))
+        self._tasks.setdefault(kind, []).append(task)
+        self._updateBusyCursor()
+
+        self._threadPool.start(task)
+
+    def _taskFinished(self, kind: str, task: Task):
+        if task in self._cancelledTasks:
+            self._cancelledTasks.remove(task)
+        elif task in self._tasks.get(kind, []):
+            self._tasks[kind].remove(task)
+            if len(self._tasks[kind]) == 0:
+                del self._tasks[kind]
+            self._updateBusyCursor()
+
+    def _taskFailed(self, message: str):
+        QMessageBox.warning(self, "Error", message)
+
+    def _updateBusyCursor(self):
+        busy = any(kind not in ImagePairEditor.QUIET_TASKS for kind in self._tasks)
+        if busy != self._busy:
+            self._busy = busy
+            if busy:
+                QApplication.setOverrideCursor(Qt.BusyCursor)
+            else:
+                QApplication.restoreOverrideCursor()
+
+    def cancelTasks(self, kind: Optional[str] = None):
+        """Cancels the background tasks of the given kind, or all of them; results not yet shown are dropped."""
+        for task_kind in list(self._tasks):
+            if kind is None or task_kind == kind:
+                for task in self._tasks.pop(task_kind):
+                    task.cancel()
+                    # Keep a reference until the thread pool is done with it
+                    self._cancelledTasks.append(task)
+        self._updateBusyCursor()
 
     # Deletes an item and the ones attached to it; if the item was removed already, don't do anything
     def deleteItem(self, item: BaseItem):
@@ -678,13 +817,17 @@ class ImagePairEditor(QGraphicsView):
         scene = self.scene()
         for item in set(to_remove):
             scene.removeItem(item)
+        self.correspondencesChanged()
 
     def deleteAllItems(self, condition: Callable[[BaseItem], bool] = None):
         scene = self.scene()
         for item in scene.items():
-            if isinstance(item, BaseItem):
+            if isinstance(item, BaseItem) and not isinstance(item, GhostItem):
                 if condition is None or condition(item):
                     scene.removeItem(item)
+        if condition is None:
+            self.clearKeypoints()
+        self.correspondencesChanged()
 
     def keyPressEvent(self, event):
         # If not in selection mode, Esc aborts and goes back to selection mode
@@ -697,6 +840,13 @@ class ImagePairEditor(QGraphicsView):
             if event.key() in [Qt.Key_Delete, Qt.Key_Backspace]:
                 for item in [it for it in self.scene().selectedItems() if isinstance(it, BaseItem)]:
                     self.deleteItem(item)
+                for layer in self._keypointLayers:
+                    if layer.getSelectedKeypoint() is not None:
+                        layer.removeKeypoint(layer.getSelectedKeypoint())
+
+        # In selection mode, Esc cancels the background tasks
+        if self.getMode() == ImagePairEditor.MODE_SELECT and event.key() == Qt.Key_Escape:
+            self.cancelTasks()
 
         # Prevent dialog from closing on escape
         if event.key() != Qt.Key_Escape:
@@ -746,6 +896,49 @@ class ImagePairEditor(QGraphicsView):
                 isinstance(item, CorrespondenceItem)]
 
 
+def _autodetectTask(cache: ImageCache, path1: str, path2: str) -> TaskFunction:
+    def run(emit, isCancelled):
+        img1 = cache.get_matching_image(path1)
+        img2 = cache.get_matching_image(path2)
+        if isCancelled():
+            return
+
+        store = get_default_feature_store()
+        store.register_source(path1, img1)
+        store.register_source(path2, img2)
+
+        correspondences = CorrespondenceFinder(DoubleORBMatcher()).find_correspondences(img1, img2)
+        emitInBatches(emit, correspondences, isCancelled)
+    return run
+
+
+# Computes SIFT keypoints of the image at path, in relative coordinates; if center is given, only the ones around it
+def _keypointsTask(cache: ImageCache, path: str, n_features: int, center: Optional[Point] = None) -> TaskFunction:
+    def run(emit, isCancelled):
+        if center is None:
+            img = cache.get_matching_image(path)
+        else:
+            img = cache.get_scaled_image(path)
+        if isCancelled():
+            return
+
+        h, w, *_ = img.shape
+        mask = None
+        if center is not None:
+            radius = min(w, h) / 10
+            x_0, y_0 = center.x * w, center.y * h  # coordinates of the click
+
+            # Only show keypoints around the click (radius roughly 1/10 of the image)
+            mask = np.zeros([h, w], np.uint8)
+            y, x = np.ogrid[0:h, 0:w]
+            mask[(x - x_0) ** 2 + (y - y_0) ** 2 <= radius ** 2] = 255
+
+        sift = cv2.xfeatures2d.SIFT_create(nfeatures=n_features)
+        keypoints, _ = sift.detectAndCompute(img, mask)
+        emitInBatches(emit, (Point(kp.pt[0] / w, kp.pt[1] / h) for kp in keypoints), isCancelled)
+    return run
+
+
 # noinspection PyPep8Naming,PyUnresolvedReferences
 class ImagePairEditorDialog(QDialog):
     def __init__(self, image1: str, image2: str, correspondences: Optional[List[Correspondence]] = None, parent=None):
@@ -803,6 +996,11 @@ class ImagePairEditorDialog(QDialog):
         for btn in self.modeButtonGroup.buttons():
             btn.setChecked(self.modeButtonGroup.id(btn) == mode)
 
+    def done(self, result):
+        # Results of background tasks arriving after the dialog is closed must be ignored
+        self.editor.cancelTasks()
+        super().done(result)
+
     def okButtonClicked(self):
         self.accept()
 
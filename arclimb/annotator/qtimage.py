@@ -0,0 +1,54 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from PyQt5.QtGui import QImage
+
+from arclimb.core.utils.imagecache import ImageCache, get_default_image_cache
+
+
+def numpy_to_qimage(image: np.ndarray) -> QImage:
+    """
+    Wraps an OpenCV image (grayscale, BGR or BGRA, 8 bits per channel) in a QImage without copying the pixels when
+    possible. The QImage keeps a reference to the array, which must not be modified while the QImage is in use.
+    """
+    if image.ndim == 2:
+        fmt = QImage.Format_Grayscale8
+    elif image.shape[2] == 3 and hasattr(QImage, 'Format_BGR888'):
+        fmt = QImage.Format_BGR888
+    elif image.shape[2] == 3:
+        # Qt < 5.14 has no BGR format
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        fmt = QImage.Format_RGB888
+    elif image.shape[2] == 4:
+        # Same memory layout as BGRA on little-endian machines
+        fmt = QImage.Format_ARGB32
+    else:
+        raise ValueError("Unsupported image shape %s" % (image.shape,))
+
+    if image.dtype != np.uint8:
+        raise ValueError("Unsupported image type %s" % image.dtype)
+
+    # Pixels must be contiguous within each row, but rows may be padded
+    if image.strides[0] < 0 or image.strides[1] != (1 if image.ndim == 2 else image.shape[2]) or \
+            (image.ndim == 3 and image.strides[2] != 1):
+        image = np.ascontiguousarray(image)
+
+    h, w = image.shape[:2]
+    qimage = QImage(image.data, w, h, image.strides[0], fmt)
+    qimage._array = image
+    return qimage
+
+
+def get_qimage(path: str, cache: Optional[ImageCache] = None) -> QImage:
+    """Returns the image at path as a QImage that shares the pixels decoded (and cached) by an ImageCache."""
+    if cache is None:
+        cache = get_default_image_cache()
+
+    def compute():
+        qimage = numpy_to_qimage(cache.get_image(path))
+        # The array is counted again in this entry, since the decoded image may be evicted while the QImage is in use
+        return qimage._array, qimage
+
+    return cache.get(path, 'qimage', compute)[1]
@@ -0,0 +1,70 @@
+import threading
+import traceback
+from typing import Any, Callable, Iterable, List
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+BATCH_SIZE = 200
+
+# The function run by a Task: it gets a function to emit batches of results, and one that tells if it was cancelled
+TaskFunction = Callable[[Callable[[List[Any]], None], Callable[[], bool]], None]
+
+
+class TaskSignals(QObject):
+    batch = pyqtSignal(object)  # Emitted with a list of results
+    failed = pyqtSignal(str)  # Emitted with the error message if the task raises an exception
+    finished = pyqtSignal()  # Always emitted last, also if the task was cancelled or failed
+
+
+class Task(QRunnable):
+    """
+    Runs a function on a QThreadPool, streaming its results back to the GUI thread in batches through the batch
+    signal. Since signals are delivered asynchronously, slots should check isCancelled() before using a batch.
+
+    Cancellation is cooperative: cancel() only sets a flag, that the function is expected to check between its
+    steps; batches emitted after cancel() are dropped.
+    """
+
+    def __init__(self, function: TaskFunction):
+        super().__init__()
+        # The owner of the task keeps a reference until it finishes
+        self.setAutoDelete(False)
+
+        self.signals = TaskSignals()
+        self._function = function
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def isCancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _emit(self, results: List[Any]) -> None:
+        if not self.isCancelled() and len(results) > 0:
+            self.signals.batch.emit(results)
+
+    def run(self):
+        try:
+            if not self.isCancelled():
+                self._function(self._emit, self.isCancelled)
+        except Exception as e:
+            traceback.print_exc()
+            if not self.isCancelled():
+                self.signals.failed.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+
+def emitInBatches(emit: Callable[[List[Any]], None], results: Iterable[Any], isCancelled: Callable[[], bool],
+                  batchSize: int = BATCH_SIZE) -> None:
+    """Emits the results in batches of batchSize, so that the GUI thread can process events between them."""
+    batch = []
+    for result in results:
+        if isCancelled():
+            return
+        batch.append(result)
+        if len(batch) >= batchSize:
+            emit(batch)
+            batch = []
+    emit(batch)
@@ -1,3 +1,12 @@
-from .correspondence import *
-from .graph import *
-from .utils import *
+# Names are imported on first use, see lazy_exports: importing arclimb.core does not require Qt, OpenCV or scipy
+from arclimb.core.utils.lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    '.correspondence': ['ORBMatcher', 'DoubleORBMatcher', 'SIFTMatcher', 'HomographyFilter', 'CascadeMatcher',
+                        'CascadeStats', 'PyramidMatcher', 'Matcher', 'CorrespondenceFinder', 'DescriptorBackend',
+                        'BruteForceBackend', 'KDTreeBackend', 'LSHBackend', 'make_backend', 'HomographyEstimator',
+                        'HomographyEstimate', 'FeatureStore', 'get_default_feature_store', 'set_default_feature_store',
+                        'PointMap', 'HomographicPointMap'],
+    '.graph': ['Node', 'NodeId', 'Point', 'Correspondence', 'Graph'],
+    '.utils': ['scale_down_image'],
+}, submodules=['correspondence', 'graph', 'retrieval', 'utils'])
@@ -1,2 +1,10 @@
-from .correspondence import ORBMatcher, DoubleORBMatcher, SIFTMatcher, HomographyFilter, Matcher, CorrespondenceFinder
-from .pointmap import PointMap, HomographicPointMap
+from arclimb.core.utils.lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    '.correspondence': ['ORBMatcher', 'DoubleORBMatcher', 'SIFTMatcher', 'HomographyFilter', 'CascadeMatcher',
+                        'CascadeStats', 'PyramidMatcher', 'Matcher', 'CorrespondenceFinder'],
+    '.descriptor_matching': ['DescriptorBackend', 'BruteForceBackend', 'KDTreeBackend', 'LSHBackend', 'make_backend'],
+    '.homography': ['HomographyEstimator', 'HomographyEstimate'],
+    '.featurestore': ['FeatureStore', 'get_default_feature_store', 'set_default_feature_store'],
+    '.pointmap': ['PointMap', 'HomographicPointMap'],
+})
@@ -0,0 +1,154 @@
+import os
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from arclimb.core.correspondence.correspondence import CorrespondenceFinder, DoubleORBMatcher, Matcher
+from arclimb.core.correspondence.featurestore import FeatureStore, get_default_feature_store, set_default_feature_store
+from arclimb.core.correspondence.trace import Trace, stage
+from arclimb.core.utils.image import load_matching_image
+from arclimb.core.utils.imagecache import ImageCache
+
+# Matcher of the current worker process, created once by _init_worker
+_worker_finder = None  # type: Optional[CorrespondenceFinder]
+
+# Cache of the images of the current worker process, if a cache_dir was given
+_worker_image_cache = None  # type: Optional[ImageCache]
+
+# Whether the current worker process returns a Trace of each pair
+_worker_tracing = False
+
+
+def _init_worker(matcher_factory: Callable[[], Matcher], cache_dir: Optional[str] = None, tracing: bool = False,
+                 in_process: bool = False) -> None:
+    global _worker_finder, _worker_image_cache, _worker_tracing
+    _worker_image_cache = None
+    _worker_tracing = tracing
+    if cache_dir is not None:
+        # Workers only share the caches on disk; they keep few entries in memory, since there is one per process
+        _worker_image_cache = ImageCache(max_bytes=0, cache_dir=cache_dir)
+        if not in_process:
+            # In the current process, the default FeatureStore (and its memory tier) is left alone
+            set_default_feature_store(FeatureStore(cache_dir=cache_dir, max_entries=4))
+    _worker_finder = CorrespondenceFinder(matcher_factory())
+
+
+def _load(path: str) -> np.ndarray:
+    matcher = _worker_finder.matcher
+    if _worker_image_cache is not None:
+        image = _worker_image_cache.get_matching_image(path, matcher.max_pixels)
+    else:
+        image = load_matching_image(path, matcher.max_pixels)
+
+    # Drops the features computed on an older version of the file, if any
+    store = matcher.feature_store if matcher.feature_store is not None else get_default_feature_store()
+    store.register_source(path, image)
+    return image
+
+
+def _find_pair(pair: Tuple[str, str]):
+    path1, path2 = pair
+    trace = Trace() if _worker_tracing else None
+    _worker_finder.trace = trace
+    try:
+        with ExitStack() as stack:
+            if trace is not None:
+                stack.enter_context(trace)
+            with stage('load') as counts:
+                image1 = _load(path1)
+                image2 = _load(path2)
+                counts['images'] = 2
+            correspondences = _worker_finder.find_correspondences(image1, image2)
+    except Exception:
+        # Unreadable images, but also matchers failing on degenerate images: the pair fails, the batch goes on
+        return path1, path2, None, trace
+
+    rows = np.array([(c.point1.x, c.point1.y, c.point2.x, c.point2.y) for c in correspondences],
+                    dtype=np.float32).reshape(-1, 4)
+    return path1, path2, rows, trace
+
+
+def _precompute_image(path: str):
+    try:
+        return path, _worker_finder.matcher.precompute(_load(path))
+    except Exception:
+        return path, None
+
+
+def _imap_unordered(function, items, workers: int, initargs: tuple) -> Iterator:
+    """
+    Yields function(item) for each item, computed by a pool of worker processes initialized with _init_worker(*initargs)
+    (or in the current process, if workers is 1), in completion order. At most twice as many items as workers are
+    submitted at any time.
+    """
+    if workers <= 1:
+        _init_worker(*initargs, in_process=True)
+        for item in items:
+            yield function(item)
+        return
+
+    items = iter(items)
+    max_pending = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        pending = set()
+        try:
+            while True:
+                for item in items:
+                    pending.add(executor.submit(function, item))
+                    if len(pending) >= max_pending:
+                        break
+
+                if len(pending) == 0:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # If the caller stops early (or an item fails), don't start the items that are still queued
+            for future in pending:
+                future.cancel()
+
+
+def find_all_correspondences(pairs: Iterable[Tuple[str, str]], matcher_factory: Callable[[], Matcher] = DoubleORBMatcher,
+                             workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                             trace: Optional[Trace] = None) -> Iterator[Tuple[str, str, np.ndarray]]:
+    """
+    Runs a CorrespondenceFinder on each pair of image files, using a pool of worker processes (or the current process,
+    if workers is 1). Yields (path1, path2, correspondences) as soon as each pair is done, in completion order;
+    correspondences is an Nx4 array of (x1, y1, x2, y2) rows in relative coordinates, or None if the pair failed (e.g.
+    if one of the images could not be read, or if the matcher raised an exception).
+
+    Each worker only decodes the two images of the pair it is working on, and at most twice as many pairs as workers
+    are submitted at any time, so memory does not grow with the number of images. If cache_dir is given, the images
+    and features saved there (see precompute_features) are used, and the missing ones are added; with a single worker,
+    features are looked up in the default FeatureStore of the current process instead.
+
+    If trace is given, the stages of each pair (see Trace) are recorded in the worker, and added to trace as soon as the
+    pair is yielded.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = _imap_unordered(_find_pair, pairs, workers, (matcher_factory, cache_dir, trace is not None))
+    try:
+        for path1, path2, rows, pair_trace in results:
+            if pair_trace is not None:
+                trace.merge(pair_trace)
+            yield path1, path2, rows
+    finally:
+        results.close()
+
+
+def precompute_features(paths: Iterable[str], cache_dir: str, matcher_factory: Callable[[], Matcher] = DoubleORBMatcher,
+                        workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Decodes, scales down and converts to grayscale each image file (as load_matching_image does; cv2.imread also
+    applies the EXIF orientation), and computes the features needed by the matcher, saving both in cache_dir. Uses a
+    pool of worker processes like find_all_correspondences; yields (path, number of keypoints), or (path, None) if the
+    image could not be read or the matcher failed on it, in completion order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return _imap_unordered(_precompute_image, paths, workers, (matcher_factory, cache_dir))
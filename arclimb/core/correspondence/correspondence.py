@@ -1,66 +1,149 @@
-from typing import List
+import time
+from functools import partial
+from typing import List, Optional, Union
 
 import cv2
 import numpy as np
-from scipy.spatial import KDTree
 
 from arclimb.core.graph import Correspondence, Point
+from arclimb.core.correspondence.descriptor_matching import DescriptorBackend, make_backend, ratio_test
+from arclimb.core.correspondence.featurestore import FeatureStore, get_default_feature_store
+from arclimb.core.correspondence.guided import grid_coverage, guided_match, spatial_suppression
+from arclimb.core.correspondence.homography import HomographyEstimator
+from arclimb.core.correspondence.tiled import TiledDetector
+from arclimb.core.correspondence.trace import Trace, stage
+from arclimb.core.utils.image import DEFAULT_MAX_PIXELS, scale_down_image
 
 
 class Matcher:
-    def __init__(self):
-        pass
+    """
+    Base class of the matchers. Keypoints and descriptors are computed through a FeatureStore, so that they are not
+    computed again for images that were already seen; if feature_store is None, the default one is used.
+
+    Images are expected to be scaled down to max_pixels (see load_matching_image), or at full resolution if it is None.
+    """
+    max_pixels = DEFAULT_MAX_PIXELS
+
+    def __init__(self, feature_store: Optional[FeatureStore] = None):
+        self.feature_store = feature_store
 
     def match(self, image1, image2):
         raise NotImplementedError
 
+    def detectors(self) -> List:
+        """Returns the OpenCV detectors used by match on each image."""
+        return []
+
+    def precompute(self, image) -> int:
+        """
+        Computes the keypoints and descriptors that match will need for image, so that they are found in the
+        FeatureStore later; returns the total number of keypoints.
+        """
+        return sum(len(self._detect_and_compute(detector, image)[0]) for detector in self.detectors())
+
+    def _detect_and_compute(self, detector, image):
+        store = self.feature_store if self.feature_store is not None else get_default_feature_store()
+        with stage('detect') as counts:
+            keypoints, descriptors = store.detect_and_compute(detector, image)
+            counts['images'] = 1
+            counts['keypoints'] = len(keypoints)
+        return keypoints, descriptors
+
+    def _knn_match_with_ratio_test(self, backend, des1, des2, ratio=0.75):
+        with stage('knn_match') as counts:
+            knn_matches = backend.knn_match(des1, des2, k=2)
+            counts['queries'] = len(des1) if des1 is not None else 0
+            counts['candidates'] = len(knn_matches)
+        with stage('ratio_test') as counts:
+            matches = ratio_test(knn_matches, ratio)
+            counts['in'] = len(knn_matches)
+            counts['out'] = len(matches)
+        return matches
+
 
 class SIFTMatcher(Matcher):
-    def __init__(self, nfeatures=0):
-        super().__init__()
+    """
+    Matches SIFT features with the ratio test. backend selects how descriptors are matched (see make_backend): 'bf' is
+    exact, 'flann' uses KD-trees, which is much faster with many features.
 
-        self._sift = cv2.xfeatures2d.SIFT_create(nfeatures=nfeatures)
-        self._bf = cv2.BFMatcher()
+    If tile_size is given, features are detected at full resolution with a TiledDetector: nfeatures is the budget of
+    each tile, and of the whole image after adaptive non-maximal suppression (0 means no limit).
+    """
+
+    def __init__(self, nfeatures=0, feature_store: Optional[FeatureStore] = None,
+                 backend: Union[str, DescriptorBackend] = 'bf', tile_size: Optional[int] = None):
+        super().__init__(feature_store)
+
+        if tile_size is None:
+            self._sift = cv2.xfeatures2d.SIFT_create(nfeatures=nfeatures)
+        else:
+            self._sift = TiledDetector(partial(cv2.xfeatures2d.SIFT_create, nfeatures=nfeatures), tile_size,
+                                       max_keypoints=nfeatures or None)
+            self.max_pixels = None
+        self._backend = make_backend(backend, binary=False)
+
+    def detectors(self):
+        return [self._sift]
 
     def match(self, image1, image2):
 
         # find the keypoints and descriptors with SIFT
-        kp1, des1 = self._sift.detectAndCompute(image1, None)
-        kp2, des2 = self._sift.detectAndCompute(image2, None)
+        kp1, des1 = self._detect_and_compute(self._sift, image1)
+        kp2, des2 = self._detect_and_compute(self._sift, image2)
 
-        # Find matches
-        matches = self._bf.knnMatch(des1, des2, k=2)
-
-        # Apply ratio test
-        res = []
-        for m, n in matches:
-            if m.distance < 0.75 * n.distance:
-                res.append(m)
-        return res, kp1, kp2
+        # Find matches and apply ratio test
+        return self._knn_match_with_ratio_test(self._backend, des1, des2, 0.75), kp1, kp2
 
 
 class ORBMatcher(Matcher):
-    def __init__(self, nfeatures=500):
-        super().__init__()
+    """
+    Matches ORB features with the ratio test. backend selects how descriptors are matched (see make_backend): 'bf' is
+    exact, 'flann' uses multi-probe LSH.
 
-        self._orb = cv2.ORB_create(nfeatures=nfeatures)
-        self._bf = cv2.BFMatcher(normType=cv2.NORM_HAMMING)
+    If tile_size is given, features are detected at full resolution with a TiledDetector: nfeatures is the budget of
+    each tile, and of the whole image after adaptive non-maximal suppression.
+    """
+
+    def __init__(self, nfeatures=500, feature_store: Optional[FeatureStore] = None,
+                 backend: Union[str, DescriptorBackend] = 'bf', tile_size: Optional[int] = None):
+        super().__init__(feature_store)
+
+        if tile_size is None:
+            self._orb = cv2.ORB_create(nfeatures=nfeatures)
+        else:
+            self._orb = TiledDetector(partial(cv2.ORB_create, nfeatures=nfeatures), tile_size, max_keypoints=nfeatures)
+            self.max_pixels = None
+        self._backend = make_backend(backend, binary=True)
+
+    def detectors(self):
+        return [self._orb]
 
     def match(self, image1, image2):
 
         # find the keypoints and descriptors with ORB
-        kp1, des1 = self._orb.detectAndCompute(image1, None)
-        kp2, des2 = self._orb.detectAndCompute(image2, None)
+        kp1, des1 = self._detect_and_compute(self._orb, image1)
+        kp2, des2 = self._detect_and_compute(self._orb, image2)
 
-        # Find matches
-        matches = self._bf.knnMatch(des1, des2, k=2)
+        # Find matches and apply ratio test
+        return self._knn_match_with_ratio_test(self._backend, des1, des2, 0.75), kp1, kp2
 
-        # Apply ratio test
-        res = []
-        for m, n in matches:
-            if m.distance < 0.75 * n.distance:
-                res.append(m)
-        return res, kp1, kp2
+
+def homography_inliers(src_pts, dst_pts, M, size, threshold, mask=None):
+    """
+    Returns a boolean array telling which of the Nx2 points in src_pts are mapped by the homography M to a point that
+    is not too far from the corresponding point in dst_pts; distances are normalized by size = (width, height) of the
+    destination image. If mask is given (e.g. the inlier mask of cv2.findHomography), only its inliers are kept.
+    """
+    src_pts = np.asarray(src_pts, dtype=np.float32).reshape(-1, 1, 2)
+    dst_pts = np.asarray(dst_pts, dtype=np.float32).reshape(-1, 2)
+
+    src_transformed = cv2.perspectiveTransform(src_pts, M).reshape(-1, 2)
+    diff_normalized = (dst_pts - src_transformed) / np.float32(size)
+    inliers = np.hypot(diff_normalized[:, 0], diff_normalized[:, 1]) < threshold
+
+    if mask is not None:
+        inliers &= np.asarray(mask).ravel() != 0
+    return inliers
 
 
 class HomographyFilter(Matcher):
@@ -68,52 +151,74 @@ class HomographyFilter(Matcher):
     Given another Matcher as input, this decorator returns another Matcher that attempts to
     refine the match by removing the best homography and removing the matching points that don't agree
     with the homography.
+    If use_mask is True, the matches that the homography estimator marked as outliers are also removed.
+    If no plausible homography is found (see HomographyEstimator), there are no matches.
     """
     MIN_MATCH_COUNT = 10
 
-    def __init__(self, matcher, threshold=0.2):
+    def __init__(self, matcher, threshold=0.2, use_mask=False, estimator: Optional[HomographyEstimator] = None):
         super().__init__()
         self._matcher = matcher
         self.threshold = threshold
+        self.use_mask = use_mask
+        self.estimator = estimator if estimator is not None else HomographyEstimator('lmeds', threshold=3.0)
 
-    def match(self, image1, image2):
-        matches, kp1, kp2 = self._matcher.match(image1, image2)
-
-        if len(matches) >= HomographyFilter.MIN_MATCH_COUNT:
-            src_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp2[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
-
-            M, _ = cv2.findHomography(src_pts, dst_pts, cv2.LMEDS)
-
-            # TODO: add some sanity checks and fail if M does not make sense (e.g.: 4 clockwise points should alsways stay clockwise)
+    @property
+    def max_pixels(self):
+        return self._matcher.max_pixels
 
-            # Apply the homography to each source points and retain only the ones whose destination is not too far from the transformed point
-            res = []
-            for m in matches:
-                src_pt = kp1[m.queryIdx].pt
-                dst_pt = kp2[m.trainIdx].pt
+    def detectors(self):
+        return self._matcher.detectors()
 
-                src_transformed = cv2.perspectiveTransform(np.float32([src_pt]).reshape(-1, 1, 2), M)
-                h, w, *_ = image2.shape
-                diff_normalized = np.divide(dst_pt - src_transformed, [w, h])
+    def precompute(self, image):
+        return self._matcher.precompute(image)
 
-                if np.linalg.norm(diff_normalized) < self.threshold:
-                    res.append(m)
+    def match(self, image1, image2):
+        matches, kp1, kp2 = self._matcher.match(image1, image2)
 
+        if len(matches) >= HomographyFilter.MIN_MATCH_COUNT:
+            src_pts = cv2.KeyPoint_convert(kp1)[[m.queryIdx for m in matches]]
+            dst_pts = cv2.KeyPoint_convert(kp2)[[m.trainIdx for m in matches]]
+
+            h1, w1, *_ = image1.shape
+            h, w, *_ = image2.shape
+            with stage('homography') as counts:
+                estimate = self.estimator.estimate(src_pts, dst_pts, scores=[m.distance for m in matches],
+                                                   size1=(w1, h1), size2=(w, h))
+                counts['in'] = len(matches)
+                counts['inliers'] = int(np.count_nonzero(estimate.inliers)) if estimate is not None else 0
+
+            if estimate is None:
+                return [], kp1, kp2
+
+            # Apply the homography to all source points and retain only the ones whose destination is not too far from the transformed point
+            with stage('homography_filter') as counts:
+                inliers = homography_inliers(src_pts, dst_pts, estimate.homography, (w, h), self.threshold,
+                                             estimate.inliers if self.use_mask else None)
+                res = [m for m, inlier in zip(matches, inliers) if inlier]
+                counts['in'] = len(matches)
+                counts['out'] = len(res)
             return res, kp1, kp2
         else:
             return matches, kp1, kp2
 
 
 class DoubleORBMatcher(Matcher):
-    def __init__(self, max_displacement=0.01, min_kp_distance=0.15):
-        super().__init__()
+    def __init__(self, max_displacement=0.01, min_kp_distance=0.15, feature_store: Optional[FeatureStore] = None,
+                 backend: Union[str, DescriptorBackend] = 'bf', estimator: Optional[HomographyEstimator] = None):
+        super().__init__(feature_store)
         self.max_displacement = max_displacement
         self.min_kp_distance = min_kp_distance
+        # Estimates the homography from the initial matches, best ones first
+        self.estimator = estimator if estimator is not None else HomographyEstimator('ransac', threshold=5.0)
 
         # TODO: tune parameters, add constructor arguments
-        self._fastORBMatcher = ORBMatcher(nfeatures=1000)
-        self._orb = cv2.ORB_create(nfeatures=3000)  # ORB detector with many more points
+        # backend is used for the initial matches, that estimate the homography
+        self._fastORBMatcher = ORBMatcher(nfeatures=1000, feature_store=feature_store, backend=backend)
+        self._orb = cv2.ORB_create(nfeatures=1000)  # ORB detector with many more points
+
+    def detectors(self):
+        return self._fastORBMatcher.detectors() + [self._orb]
 
     def match(self, image1, image2):
         initial_matches, initial_kp1, initial_kp2 = self._fastORBMatcher.match(image1, image2)  # TODO: parameter tuning
@@ -121,7 +226,15 @@ class DoubleORBMatcher(Matcher):
         initial_src_pts = np.float32([initial_kp1[m.queryIdx].pt for m in initial_matches]).reshape(-1, 1, 2)
         initial_dst_pts = np.float32([initial_kp2[m.trainIdx].pt for m in initial_matches]).reshape(-1, 1, 2)
 
-        M, _ = cv2.findHomography(initial_src_pts, initial_dst_pts, method=cv2.RANSAC, ransacReprojThreshold=5.0)
+        h1, w1, *_ = image1.shape
+        h2, w2, *_ = image2.shape
+        with stage('homography') as counts:
+            estimate = self.estimator.estimate(initial_src_pts, initial_dst_pts,
+                                               scores=[m.distance for m in initial_matches],
+                                               size1=(w1, h1), size2=(w2, h2))
+            counts['in'] = len(initial_matches)
+            counts['inliers'] = int(np.count_nonzero(estimate.inliers)) if estimate is not None else 0
+        M = estimate.homography if estimate is not None else None
 
         ##Debug code: print the homography and save the result
         # h, w, *_ = image1.shape
@@ -130,81 +243,57 @@ class DoubleORBMatcher(Matcher):
         # temp = cv2.polylines(image2, [np.int32(corners_dst)], True, 255, 3, cv2.LINE_AA)
         # cv2.imwrite("temp.jpg", temp)
 
-        # TODO: add sanity checks for M
-
         # Compute many more keypoints, this time
-        kp1, des1 = self._orb.detectAndCompute(image1, None)
-        kp2, des2 = self._orb.detectAndCompute(image2, None)
-        n_kp1 = len(kp1)
+        kp1, des1 = self._detect_and_compute(self._orb, image1)
+        kp2, des2 = self._detect_and_compute(self._orb, image2)
 
-        pts1 = np.float32([kp.pt for kp in kp1]).reshape(-1, 1, 2)
-        pts1_transformed = cv2.perspectiveTransform(pts1, M)  # apply homography to all source keypoints
+        if M is None or len(kp1) == 0 or len(kp2) == 0:
+            return [], kp1, kp2
 
-        # build KDTree of points in kp2
-        tree = KDTree([kp.pt for kp in kp2])
+        pts1 = cv2.KeyPoint_convert(kp1)
+        pts1_transformed = cv2.perspectiveTransform(pts1.reshape(-1, 1, 2), M)  # apply homography to all source keypoints
 
         # For each point in kp1, find the keypoints in image2 that are near the transformed point, and do the rest like BFMatcher
         disp = self.max_displacement * min(
             image2.shape[:2])  # maximum displacement is a fraction of the minimum between width and height
-        matches = []
-        for pt1_idx in range(n_kp1):
-            pt1_transformed = pts1_transformed[pt1_idx]
-
-            points2_idxs = tree.query_ball_point(pt1_transformed, disp)[0]
-
-            # find the best two keypoints (minimizing the Hamming distance)
-            best_idx = None
-            best_dist = float('inf')
-            second_best_idx = None
-            second_best_dist = float('inf')
-
-            for pt2_idx in points2_idxs:
-                dist = cv2.norm(des1[pt1_idx], des2[pt2_idx], normType=cv2.NORM_HAMMING)
-                if dist < best_dist:
-                    second_best_idx, second_best_dist = best_idx, best_dist
-                    best_dist, best_idx = dist, pt2_idx
-                elif dist < second_best_dist:
-                    second_best_dist, second_best_idx = dist, pt2_idx
-
-            if best_idx is not None:
-                # Add the match only only there is one with the same source keypoint (not sure if this ever happens)
-                # or if it passes the ratio test
-                if second_best_idx is None or best_dist < 0.75 * second_best_dist:
-                    matches.append(cv2.DMatch(pt1_idx, best_idx, best_idx))
+        with stage('guided_match') as counts:
+            query_idx, train_idx, distances = guided_match(pts1_transformed, des1, cv2.KeyPoint_convert(kp2), des2,
+                                                           disp)
+            counts['queries'] = len(kp1)
+            counts['matches'] = len(query_idx)
 
         # Now keep adding the best matches, but skip if the source points are too close
-        matches = sorted(matches, key=lambda x: x.distance)
-
-        final_matches = []
-        chosen_keypoints = []
-        for match_candidate in matches:
-            candidate_pt = kp1[match_candidate.queryIdx].pt
-            if len(chosen_keypoints) == 0:
-                min_dist = float('inf')
-            else:
-                min_dist = min(cv2.norm(candidate_pt, chosen_pt) for chosen_pt in chosen_keypoints)
-
-            if min_dist > self.min_kp_distance * min(image1.shape[:2]):
-                final_matches.append(match_candidate)
-                chosen_keypoints.append(candidate_pt)
-
+        with stage('suppression') as counts:
+            order = np.argsort(distances, kind='stable')
+            query_idx, train_idx, distances = query_idx[order], train_idx[order], distances[order]
+            selected = spatial_suppression(pts1[query_idx], self.min_kp_distance * min(image1.shape[:2]))
+            counts['in'] = len(query_idx)
+            counts['out'] = len(selected)
+
+        final_matches = [cv2.DMatch(int(query_idx[i]), int(train_idx[i]), float(distances[i])) for i in selected]
         return final_matches, kp1, kp2
 
 
 # BruteForce Matcher based on ORB (for debug purposes, quite useless in practice)
 class ORBMatcherBF(Matcher):
-    def __init__(self, nfeatures=500):
-        super().__init__()
+    def __init__(self, nfeatures=500, feature_store: Optional[FeatureStore] = None):
+        super().__init__(feature_store)
 
         self._orb = cv2.ORB_create(nfeatures=nfeatures)
         self._bf = cv2.BFMatcher(normType=cv2.NORM_HAMMING)
 
+    def detectors(self):
+        return [self._orb]
+
     def match(self, image1, image2):
         # find the keypoints and descriptors with ORB
-        kp1, des1 = self._orb.detectAndCompute(image1, None)
-        kp2, des2 = self._orb.detectAndCompute(image2, None)
+        kp1, des1 = self._detect_and_compute(self._orb, image1)
+        kp2, des2 = self._detect_and_compute(self._orb, image2)
 
-        matches = self._bf.match(des1, des2)
+        with stage('knn_match') as counts:
+            matches = self._bf.match(des1, des2)
+            counts['queries'] = len(des1) if des1 is not None else 0
+            counts['candidates'] = len(matches)
 
         # Find matches
         matches = sorted(matches, key=lambda x: x.distance)
@@ -212,131 +301,295 @@ class ORBMatcherBF(Matcher):
         return matches, kp1, kp2
 
 
-class DoubleORBMatcher(Matcher):
-    def __init__(self, max_displacement=0.01, min_kp_distance=0.15):
-        super().__init__()
-        self.max_displacement = max_displacement
-        self.min_kp_distance = min_kp_distance
-
-        # TODO: tune parameters, add constructor arguments
-        self._fastORBMatcher = ORBMatcher(nfeatures=1000)
-        self._orb = cv2.ORB_create(nfeatures=1000)  # ORB detector with many more points
+# Convenience class to transform te output of a Matcher to a list of Correspondences
+# If a trace is given, the stages of the matcher are recorded there (see Trace), as well as a 'total' stage for each pair.
+class CorrespondenceFinder():
+    def __init__(self, matcher: Matcher, trace: Optional[Trace] = None):
+        self.matcher = matcher
+        self.trace = trace
 
-    def match(self, image1, image2):
-        initial_matches, initial_kp1, initial_kp2 = self._fastORBMatcher.match(image1, image2)  # TODO: parameter tuning
+    def find_correspondences(self, image1, image2) -> List[Correspondence]:
+        if self.trace is None:
+            return self._find_correspondences(image1, image2)
 
-        initial_src_pts = np.float32([initial_kp1[m.queryIdx].pt for m in initial_matches]).reshape(-1, 1, 2)
-        initial_dst_pts = np.float32([initial_kp2[m.trainIdx].pt for m in initial_matches]).reshape(-1, 1, 2)
+        with self.trace, self.trace.stage('total') as counts:
+            result = self._find_correspondences(image1, image2)
+            counts['pairs'] = 1
+            counts['correspondences'] = len(result)
+        return result
 
-        M, _ = cv2.findHomography(initial_src_pts, initial_dst_pts, method=cv2.RANSAC, ransacReprojThreshold=5.0)
+    def _find_correspondences(self, image1, image2) -> List[Correspondence]:
+        matches, kp1, kp2 = self.matcher.match(image1, image2)
 
-        ##Debug code: print the homography and save the result
-        # h, w, *_ = image1.shape
-        # corners_src = np.float32([[0, 0], [0, h - 1], [w - 1, h - 1], [w - 1, 0]]).reshape(-1, 1, 2)
-        # corners_dst = cv2.perspectiveTransform(corners_src, M)
-        # temp = cv2.polylines(image2, [np.int32(corners_dst)], True, 255, 3, cv2.LINE_AA)
-        # cv2.imwrite("temp.jpg", temp)
+        h1, w1, *_ = image1.shape
+        h2, w2, *_ = image2.shape
 
-        # TODO: add sanity checks for M
+        result = []
+        for match in matches:
+            pt1 = kp1[match.queryIdx].pt
+            pt2 = kp2[match.trainIdx].pt
+            result.append(Correspondence(
+                Point(pt1[0] / w1, pt1[1] / h1),
+                Point(pt2[0] / w2, pt2[1] / h2)
+            ))
 
-        # Compute many more keypoints, this time
-        kp1, des1 = self._orb.detectAndCompute(image1, None)
-        kp2, des2 = self._orb.detectAndCompute(image2, None)
-        n_kp1 = len(kp1)
+        return result
 
-        pts1 = np.float32([kp.pt for kp in kp1]).reshape(-1, 1, 2)
-        pts1_transformed = cv2.perspectiveTransform(pts1, M)  # apply homography to all source keypoints
 
-        # build KDTree of points in kp2
-        tree = KDTree([kp.pt for kp in kp2])
+class CascadeStats(object):
+    """
+    Number of pairs seen by a CascadeMatcher, and number of pairs rejected and time spent by each of its stages. The
+    stats of several matchers (e.g. one in each worker process) can be added together with merge.
+    """
+    STAGES = ('coarse', 'homography', 'fine')
 
-        # For each point in kp1, find the keypoints in image2 that are near the transformed point, and do the rest like BFMatcher
-        disp = self.max_displacement * min(
-            image2.shape[:2])  # maximum displacement is a fraction of the minimum between width and height
-        matches = []
-        for pt1_idx in range(n_kp1):
-            pt1_transformed = pts1_transformed[pt1_idx]
-
-            points2_idxs = tree.query_ball_point(pt1_transformed, disp)[0]
-
-            # find the best two keypoints (minimizing the Hamming distance)
-            best_idx = None
-            best_dist = float('inf')
-            second_best_idx = None
-            second_best_dist = float('inf')
-
-            for pt2_idx in points2_idxs:
-                dist = cv2.norm(des1[pt1_idx], des2[pt2_idx], normType=cv2.NORM_HAMMING)
-                if dist < best_dist:
-                    second_best_idx, second_best_dist = best_idx, best_dist
-                    best_dist, best_idx = dist, pt2_idx
-                elif dist < second_best_dist:
-                    second_best_dist, second_best_idx = dist, pt2_idx
-
-            if best_idx is not None:
-                # Add the match only only there is one with the same source keypoint (not sure if this ever happens)
-                # or if it passes the ratio test
-                if second_best_idx is None or best_dist < 0.75 * second_best_dist:
-                    matches.append(cv2.DMatch(pt1_idx, best_idx, best_dist))
+    def __init__(self):
+        self.pairs = 0
+        self.rejected = {name: 0 for name in CascadeStats.STAGES}
+        self.seconds = {name: 0.0 for name in CascadeStats.STAGES}
 
-        # Now keep adding the best matches, but skip if the source points are too close
-        matches = sorted(matches, key=lambda x: x.distance)
+    @property
+    def accepted(self) -> int:
+        return self.pairs - sum(self.rejected.values())
 
-        final_matches = []
-        chosen_keypoints = []
-        for match_candidate in matches:
-            candidate_pt = kp1[match_candidate.queryIdx].pt
-            if len(chosen_keypoints) == 0:
-                min_dist = float('inf')
-            else:
-                min_dist = min(cv2.norm(candidate_pt, chosen_pt) for chosen_pt in chosen_keypoints)
+    def merge(self, other: 'CascadeStats') -> None:
+        self.pairs += other.pairs
+        for name in CascadeStats.STAGES:
+            self.rejected[name] += other.rejected[name]
+            self.seconds[name] += other.seconds[name]
 
-            if min_dist > self.min_kp_distance * min(image1.shape[:2]):
-                final_matches.append(match_candidate)
-                chosen_keypoints.append(candidate_pt)
+    def __str__(self):
+        stages = ", ".join("%s: %d rejected (%.2f s)" % (name, self.rejected[name], self.seconds[name])
+                           for name in CascadeStats.STAGES)
+        return "%d pairs, %d accepted; %s" % (self.pairs, self.accepted, stages)
 
-        return final_matches, kp1, kp2
 
+class CascadeMatcher(Matcher):
+    """
+    Matches images with a sequence of increasingly expensive stages, so that pairs of images that do not overlap are
+    rejected early:
+
+    1. coarse: ORB features are matched on copies of the images scaled down to coarse_pixels; the pair is rejected if
+       less than min_coarse_matches pass the ratio test;
+    2. homography: a homography is estimated from the coarse matches with estimator (RANSAC by default); the pair is
+       rejected if it has less than min_inliers inliers or if it is not plausible (see homography_is_plausible);
+    3. fine: the pair is matched with fine_matcher (a DoubleORBMatcher by default); it counts as rejected if there are
+       less than min_matches matches.
+
+    A rejected pair gets no matches. The number of pairs rejected by each stage is counted in stats, and in the
+    'cascade' stage of the active Trace, if any.
+    """
 
-# BruteForce Matcher based on ORB (for debug purposes, quite useless in practice)
-class ORBMatcherBF(Matcher):
-    def __init__(self, nfeatures=500):
-        super().__init__()
+    def __init__(self, fine_matcher: Optional[Matcher] = None, coarse_pixels=320, coarse_features=300,
+                 min_coarse_matches=12, min_inliers=8, min_matches=4, feature_store: Optional[FeatureStore] = None,
+                 estimator: Optional[HomographyEstimator] = None):
+        super().__init__(feature_store)
+        self.coarse_pixels = coarse_pixels
+        self.min_coarse_matches = min_coarse_matches
+        self.min_matches = min_matches
+        if estimator is None:
+            estimator = HomographyEstimator('ransac', threshold=3.0, min_inliers=min_inliers)
+        self.estimator = estimator
 
-        self._orb = cv2.ORB_create(nfeatures=nfeatures)
-        self._bf = cv2.BFMatcher(normType=cv2.NORM_HAMMING)
+        self._coarse_matcher = ORBMatcher(nfeatures=coarse_features, feature_store=feature_store)
+        self._fine_matcher = fine_matcher if fine_matcher is not None else DoubleORBMatcher(feature_store=feature_store)
+        self.stats = CascadeStats()
 
-    def match(self, image1, image2):
-        # find the keypoints and descriptors with ORB
-        kp1, des1 = self._orb.detectAndCompute(image1, None)
-        kp2, des2 = self._orb.detectAndCompute(image2, None)
+    @property
+    def max_pixels(self):
+        return self._fine_matcher.max_pixels
 
-        matches = self._bf.match(des1, des2)
+    def detectors(self):
+        return self._fine_matcher.detectors()
 
-        # Find matches
-        matches = sorted(matches, key=lambda x: x.distance)
+    def precompute(self, image):
+        return (self._coarse_matcher.precompute(scale_down_image(image, self.coarse_pixels)) +
+                self._fine_matcher.precompute(image))
 
+    def match(self, image1, image2):
+        self.stats.pairs += 1
+        start = time.perf_counter()
+
+        small1 = scale_down_image(image1, self.coarse_pixels)
+        small2 = scale_down_image(image2, self.coarse_pixels)
+        matches, kp1, kp2 = self._coarse_matcher.match(small1, small2)
+        start = self._lap('coarse', start)
+        if len(matches) < self.min_coarse_matches:
+            return self._reject('coarse')
+
+        src_pts = cv2.KeyPoint_convert(kp1)[[m.queryIdx for m in matches]]
+        dst_pts = cv2.KeyPoint_convert(kp2)[[m.trainIdx for m in matches]]
+        h1, w1 = small1.shape[:2]
+        h2, w2 = small2.shape[:2]
+        with stage('homography') as counts:
+            estimate = self.estimator.estimate(src_pts, dst_pts, scores=[m.distance for m in matches],
+                                               size1=(w1, h1), size2=(w2, h2))
+            counts['in'] = len(matches)
+            counts['inliers'] = int(np.count_nonzero(estimate.inliers)) if estimate is not None else 0
+        start = self._lap('homography', start)
+        if estimate is None:
+            return self._reject('homography')
+
+        matches, kp1, kp2 = self._fine_matcher.match(image1, image2)
+        self._lap('fine', start)
+        if len(matches) < self.min_matches:
+            return self._reject('fine')
+        with stage('cascade') as counts:
+            counts['accepted'] = 1
         return matches, kp1, kp2
 
+    def _lap(self, name, start):
+        now = time.perf_counter()
+        self.stats.seconds[name] += now - start
+        return now
 
-# Convenience class to transform te output of a Matcher to a list of Correspondences
-class CorrespondenceFinder():
-    def __init__(self, matcher: Matcher):
-        self.matcher = matcher
+    def _reject(self, name):
+        self.stats.rejected[name] += 1
+        with stage('cascade') as counts:
+            counts['rejected_' + name] = 1
+        return [], [], []
 
-    def find_correspondences(self, image1, image2) -> List[Correspondence]:
-        matches, kp1, kp2 = self.matcher.match(image1, image2)
 
-        h1, w1, *_ = image1.shape
-        h2, w2, *_ = image2.shape
+def _scale_keypoints(keypoints, sx: float, sy: float):
+    """Returns copies of the keypoints with coordinates scaled by (sx, sy); the originals may be in a FeatureStore."""
+    size_scale = (sx + sy) / 2
+    return [cv2.KeyPoint(kp.pt[0] * sx, kp.pt[1] * sy, kp.size * size_scale, kp.angle, kp.response, kp.octave,
+                         kp.class_id) for kp in keypoints]
 
-        result = []
-        for match in matches:
-            pt1 = kp1[match.queryIdx].pt
-            pt2 = kp2[match.trainIdx].pt
-            result.append(Correspondence(
-                Point(pt1[0] / w1, pt1[1] / h1),
-                Point(pt2[0] / w2, pt2[1] / h2)
-            ))
 
-        return result
+class PyramidMatcher(Matcher):
+    """
+    Coarse-to-fine matcher that works down a pyramid of the images, so that images can be matched at full resolution
+    without detecting features densely at full size. The longest side of the levels doubles from coarse_pixels up to
+    the size of the input images, which are expected at full resolution (max_pixels is None).
+
+    1. At the coarsest level, coarse_features ORB features are matched with the ratio test, and a homography is
+       estimated from the matches with estimator.
+    2. At each finer level, nfeatures ORB features are detected, and the homography of the previous level predicts
+       where the keypoints of the first image are in the second one: they are matched with guided_match within
+       radius_factor times the RMS residual of that homography, scaled to the level and kept between min_radius pixels
+       and max_displacement times the shorter side of the second image. The matches are the inliers of the homography
+       estimated from them, which guides the next level.
+
+    The matcher stops at the first fine level with at least target_matches matches that cover at least target_spread
+    of a grid_size x grid_size grid on the first image (see grid_coverage), and whose homography has an RMS residual
+    of at most max_error pixels of the input images; it returns the matches of that level, with the keypoints in the
+    coordinates of the input images. If no homography is found at a fine level, the matches of
+    the previous level are returned; a pair without a homography at the coarsest level gets no matches.
+    """
+    max_pixels = None
+
+    def __init__(self, coarse_pixels=500, coarse_features=1000, nfeatures=2000, target_matches=200, target_spread=0.5,
+                 max_error=2.0, grid_size=8, radius_factor=3.0, min_radius=4.0, max_displacement=0.02,
+                 feature_store: Optional[FeatureStore] = None, backend: Union[str, DescriptorBackend] = 'bf',
+                 estimator: Optional[HomographyEstimator] = None):
+        super().__init__(feature_store)
+        self.coarse_pixels = coarse_pixels
+        self.target_matches = target_matches
+        self.target_spread = target_spread
+        self.max_error = max_error
+        self.grid_size = grid_size
+        self.radius_factor = radius_factor
+        self.min_radius = min_radius
+        self.max_displacement = max_displacement
+        self.estimator = estimator if estimator is not None else HomographyEstimator('ransac', threshold=3.0)
+
+        self._coarse_orb = cv2.ORB_create(nfeatures=coarse_features)
+        self._orb = cv2.ORB_create(nfeatures=nfeatures)
+        self._backend = make_backend(backend, binary=True)
+
+    def detectors(self):
+        return [self._coarse_orb, self._orb]
+
+    def precompute(self, image):
+        total = 0
+        for k in range(self._count_levels(image)):
+            detector = self._coarse_orb if k == 0 else self._orb
+            total += len(self._detect_and_compute(detector, self._level(image, k))[0])
+        return total
+
+    def _count_levels(self, *images) -> int:
+        longest = max(max(image.shape[:2]) for image in images)
+        n_levels = 1
+        while self.coarse_pixels * 2 ** (n_levels - 1) < longest:
+            n_levels += 1
+        return n_levels
+
+    def _level(self, image, k: int):
+        side = self.coarse_pixels * 2 ** k
+        return image if side >= max(image.shape[:2]) else scale_down_image(image, side)
+
+    def _estimate(self, src_pts, dst_pts, distances, image1, image2):
+        h1, w1 = image1.shape[:2]
+        h2, w2 = image2.shape[:2]
+        with stage('homography') as counts:
+            estimate = self.estimator.estimate(src_pts, dst_pts, scores=distances, size1=(w1, h1), size2=(w2, h2))
+            counts['in'] = len(src_pts)
+            counts['inliers'] = int(np.count_nonzero(estimate.inliers)) if estimate is not None else 0
+        return estimate
+
+    def match(self, image1, image2):
+        n_levels = self._count_levels(image1, image2)
+
+        level1, level2 = self._level(image1, 0), self._level(image2, 0)
+        kp1, des1 = self._detect_and_compute(self._coarse_orb, level1)
+        kp2, des2 = self._detect_and_compute(self._coarse_orb, level2)
+        matches = self._knn_match_with_ratio_test(self._backend, des1, des2, 0.75)
+        src_pts = cv2.KeyPoint_convert(kp1)[[m.queryIdx for m in matches]].reshape(-1, 2)
+        dst_pts = cv2.KeyPoint_convert(kp2)[[m.trainIdx for m in matches]].reshape(-1, 2)
+        estimate = self._estimate(src_pts, dst_pts, [m.distance for m in matches], level1, level2)
+        if estimate is None:
+            return [], [], []
+        result = [m for m, inlier in zip(matches, estimate.inliers) if inlier], kp1, kp2, level1, level2
+
+        visited, stopped_early = 1, False
+        for k in range(1, n_levels):
+            previous1, previous2 = level1, level2
+            level1, level2 = self._level(image1, k), self._level(image2, k)
+
+            # From the coordinates of the previous level to the ones of this level
+            h1, w1 = level1.shape[:2]
+            h2, w2 = level2.shape[:2]
+            scale1 = np.diag([w1 / previous1.shape[1], h1 / previous1.shape[0], 1.0])
+            scale2 = np.diag([w2 / previous2.shape[1], h2 / previous2.shape[0], 1.0])
+            M = scale2 @ estimate.homography @ np.linalg.inv(scale1)
+            radius = self.radius_factor * estimate.rms_residual * (scale2[0, 0] + scale2[1, 1]) / 2
+            radius = min(max(radius, self.min_radius), self.max_displacement * min(h2, w2))
+
+            kp1, des1 = self._detect_and_compute(self._orb, level1)
+            kp2, des2 = self._detect_and_compute(self._orb, level2)
+            visited += 1
+            if len(kp1) == 0 or len(kp2) == 0:
+                break
+            pts1, pts2 = cv2.KeyPoint_convert(kp1), cv2.KeyPoint_convert(kp2)
+            with stage('guided_match') as counts:
+                query_idx, train_idx, distances = guided_match(cv2.perspectiveTransform(pts1.reshape(-1, 1, 2), M),
+                                                               des1, pts2, des2, radius)
+                counts['queries'] = len(kp1)
+                counts['matches'] = len(query_idx)
+
+            estimate = self._estimate(pts1[query_idx], pts2[train_idx], distances, level1, level2)
+            if estimate is None:
+                break
+            inliers = estimate.inliers
+            query_idx, train_idx, distances = query_idx[inliers], train_idx[inliers], distances[inliers]
+            matches = [cv2.DMatch(int(q), int(t), float(d)) for q, t, d in zip(query_idx, train_idx, distances)]
+            result = matches, kp1, kp2, level1, level2
+
+            error = estimate.rms_residual * image2.shape[1] / w2
+            if (len(matches) >= self.target_matches and error <= self.max_error and
+                    grid_coverage(pts1[query_idx], w1, h1, self.grid_size) >= self.target_spread):
+                stopped_early = k < n_levels - 1
+                break
+
+        matches, kp1, kp2, level1, level2 = result
+        with stage('pyramid') as counts:
+            counts['levels'] = visited
+            counts['stopped_early'] = int(stopped_early)
+
+        # Keypoints in the coordinates of the input images
+        if level1 is not image1:
+            kp1 = _scale_keypoints(kp1, image1.shape[1] / level1.shape[1], image1.shape[0] / level1.shape[0])
+        if level2 is not image2:
+            kp2 = _scale_keypoints(kp2, image2.shape[1] / level2.shape[1], image2.shape[0] / level2.shape[0])
+        return matches, kp1, kp2
@@ -0,0 +1,92 @@
+from typing import List, Optional, Union
+
+import cv2
+import numpy as np
+
+# FLANN index algorithms, as defined in flann/defines.h (they are not exported by the Python bindings)
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+
+
+class DescriptorBackend(object):
+    """
+    Finds the nearest neighbours of descriptors, like cv2.DescriptorMatcher.knnMatch. Backends may be approximate, and
+    may return less than k neighbours for some descriptors (or none at all).
+    """
+
+    def knn_match(self, des1: Optional[np.ndarray], des2: Optional[np.ndarray], k: int = 2) -> List[List[cv2.DMatch]]:
+        """For each descriptor in des1, returns its (at most) k nearest neighbours in des2, sorted by distance."""
+        if des1 is None or des2 is None or len(des1) == 0 or len(des2) == 0:
+            return []
+        return self._knn_match(des1, des2, min(k, len(des2)))
+
+    def _knn_match(self, des1: np.ndarray, des2: np.ndarray, k: int) -> List[List[cv2.DMatch]]:
+        raise NotImplementedError
+
+
+class BruteForceBackend(DescriptorBackend):
+    """Exact matching, comparing each pair of descriptors; the cost is quadratic in the number of features."""
+
+    def __init__(self, norm_type: int = cv2.NORM_L2):
+        self.norm_type = norm_type
+        self._matcher = cv2.BFMatcher(normType=norm_type)
+
+    def _knn_match(self, des1, des2, k):
+        return self._matcher.knnMatch(des1, des2, k=k)
+
+
+class KDTreeBackend(DescriptorBackend):
+    """
+    Approximate matching of float descriptors (e.g. SIFT) with a FLANN forest of randomized KD-trees built on des2.
+    Each query visits at most checks leaves: more checks give a higher recall, at the cost of speed.
+    """
+
+    def __init__(self, trees: int = 4, checks: int = 64):
+        self.trees = trees
+        self.checks = checks
+        self._matcher = cv2.FlannBasedMatcher(dict(algorithm=FLANN_INDEX_KDTREE, trees=trees), dict(checks=checks))
+
+    def _knn_match(self, des1, des2, k):
+        return self._matcher.knnMatch(np.asarray(des1, np.float32), np.asarray(des2, np.float32), k=k)
+
+
+class LSHBackend(DescriptorBackend):
+    """
+    Approximate matching of binary descriptors (e.g. ORB) with FLANN multi-probe LSH: table_number hash tables on
+    key_size bits each, also probing the buckets within multi_probe_level bits of the one of the query.
+    """
+
+    def __init__(self, table_number: int = 6, key_size: int = 12, multi_probe_level: int = 1, checks: int = 64):
+        self.table_number = table_number
+        self.key_size = key_size
+        self.multi_probe_level = multi_probe_level
+        self.checks = checks
+        index_params = dict(algorithm=FLANN_INDEX_LSH, table_number=table_number, key_size=key_size,
+                            multi_probe_level=multi_probe_level)
+        self._matcher = cv2.FlannBasedMatcher(index_params, dict(checks=checks))
+
+    def _knn_match(self, des1, des2, k):
+        return self._matcher.knnMatch(des1, des2, k=k)
+
+
+def make_backend(backend: Union[str, DescriptorBackend, None], binary: bool) -> DescriptorBackend:
+    """
+    Returns the DescriptorBackend selected by backend: an instance is returned as is, 'bf' (or None) is brute force,
+    and 'flann' is the FLANN index suited to the descriptors (LSH if binary, KD-trees otherwise).
+    """
+    if isinstance(backend, DescriptorBackend):
+        return backend
+    if backend is None or backend == 'bf':
+        return BruteForceBackend(cv2.NORM_HAMMING if binary else cv2.NORM_L2)
+    if backend == 'flann':
+        return LSHBackend() if binary else KDTreeBackend()
+    raise ValueError("Unknown descriptor matching backend %r" % (backend,))
+
+
+def ratio_test(knn_matches: List[List[cv2.DMatch]], ratio: float = 0.75) -> List[cv2.DMatch]:
+    """
+    Keeps the best match of each descriptor if it is closer than ratio times the second best. Descriptors with a single
+    neighbour (which approximate backends may return) have nothing to compare to, and are dropped.
+    """
+    return [neighbours[0] for neighbours in knn_matches
+            if len(neighbours) >= 2 and neighbours[0].distance < ratio * neighbours[1].distance]
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+
+def image_key(image: np.ndarray) -> str:
+    """Returns a hash of the content (pixels, shape and type) of an image."""
+    image = np.ascontiguousarray(image)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(("%s%s" % (image.shape, image.dtype)).encode())
+    h.update(image.data)
+    return h.hexdigest()
+
+
+def detector_key(detector) -> str:
+    """
+    Returns a string identifying the type and the parameters of an OpenCV Feature2D detector, built from its getters.
+    If the detector exposes no parameters, the key also contains its id, so that it is never confused with another one.
+    """
+    params = []
+    for name in sorted(dir(detector)):
+        if name.startswith('get') and name != 'getDefaultName':
+            try:
+                params.append("%s=%r" % (name[3:], getattr(detector, name)()))
+            except (cv2.error, TypeError):
+                pass
+
+    if len(params) == 0:
+        params.append("id=%d" % id(detector))
+
+    return "%s(%s)" % (detector.getDefaultName(), ",".join(params))
+
+
+def keypoints_to_array(keypoints) -> np.ndarray:
+    return np.array([(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id) for kp in keypoints],
+                    dtype=np.float32).reshape(-1, 7)
+
+
+def array_to_keypoints(array: np.ndarray) -> List[cv2.KeyPoint]:
+    return [cv2.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+            for x, y, size, angle, response, octave, class_id in array.tolist()]
+
+
+class FeatureStore(object):
+    """
+    Cache of the keypoints and descriptors computed on images, keyed by a hash of the image content and by the type and
+    parameters of the detector.
+
+    The most recently used entries are kept in memory; if cache_dir is given, every entry is also saved there as a pair
+    of .npy files, which are memory-mapped when loaded. Entries computed on images loaded from a file can be associated
+    to it with register_source, which the loaders of arclimb call: when the file is registered again after it changed,
+    the entries of its old content are dropped, from memory and from cache_dir. The association is saved in cache_dir
+    too, so that entries of files changed between two runs are dropped as well.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 64):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+        self._memory = OrderedDict()  # type: OrderedDict[Tuple[str, str], Tuple[List[cv2.KeyPoint], np.ndarray]]
+        self._sources = {}  # type: Dict[str, Tuple[Tuple[int, int], Set[str]]]
+        self._image_entries = {}  # type: Dict[str, Set[Tuple[str, str]]]
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(os.path.join(cache_dir, 'sources'), exist_ok=True)
+
+    def detect_and_compute(self, detector, image: np.ndarray):
+        """Same as detector.detectAndCompute(image, None), but reuses the result of previous calls if possible."""
+        key = (image_key(image), detector_key(detector))
+
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                return result
+
+        result = self._load(key)
+        if result is None:
+            result = detector.detectAndCompute(image, None)
+            self._save(key, result)
+
+        with self._lock:
+            self._remember(key, result)
+        return result
+
+    def register_source(self, path: str, image: np.ndarray) -> None:
+        """
+        Records that image was loaded (possibly after some processing) from the file at path; several images (e.g. at
+        different resolutions) can be registered for the same file. If the file changed since it was last registered,
+        the entries of the images previously loaded from it are dropped.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        new_image_key = image_key(image)
+
+        with self._lock:
+            old = self._sources.get(path)
+        if old is None:
+            old = self._load_source(path)
+
+        if old is not None and old[0] == signature:
+            if new_image_key in old[1]:
+                return
+            image_keys = old[1] | {new_image_key}
+        else:
+            image_keys = {new_image_key}
+
+        with self._lock:
+            self._sources[path] = signature, image_keys
+        self._save_source(path, signature, image_keys)
+
+        if old is not None and old[0] != signature:
+            for old_image_key in old[1] - image_keys:
+                self._drop_image(old_image_key)
+
+    def invalidate(self, path: str) -> None:
+        """Drops all the entries of the images loaded from path."""
+        path = os.path.abspath(path)
+        with self._lock:
+            old = self._sources.pop(path, None)
+        if old is None:
+            old = self._load_source(path)
+
+        if old is not None:
+            if self.cache_dir is not None:
+                try:
+                    os.remove(self._source_path(path))
+                except FileNotFoundError:
+                    pass
+            for old_image_key in old[1]:
+                self._drop_image(old_image_key)
+
+    def clear(self) -> None:
+        """Drops all the entries kept in memory; files in cache_dir are not deleted."""
+        with self._lock:
+            self._memory.clear()
+            self._image_entries.clear()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _remember(self, key, result) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        self._image_entries.setdefault(key[0], set()).add(key)
+
+        while len(self._memory) > self.max_entries:
+            old_key, _ = self._memory.popitem(last=False)
+            entries = self._image_entries.get(old_key[0])
+            if entries is not None:
+                entries.discard(old_key)
+                if len(entries) == 0:
+                    del self._image_entries[old_key[0]]
+
+    def _drop_image(self, image_hash: str) -> None:
+        with self._lock:
+            for key in self._image_entries.pop(image_hash, ()):
+                self._memory.pop(key, None)
+
+        if self.cache_dir is not None:
+            prefix = image_hash + '-'
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.startswith(prefix):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        # Removed by another process sharing cache_dir
+                        pass
+
+    def _source_path(self, path: str) -> str:
+        name = hashlib.blake2b(path.encode(), digest_size=16).hexdigest() + '.json'
+        return os.path.join(self.cache_dir, 'sources', name)
+
+    def _load_source(self, path: str) -> Optional[Tuple[Tuple[int, int], Set[str]]]:
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with open(self._source_path(path)) as f:
+                source = json.load(f)
+            return (source['mtime_ns'], source['size']), set(source['images'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_source(self, path: str, signature: Tuple[int, int], image_keys: Set[str]) -> None:
+        if self.cache_dir is None:
+            return
+
+        source_path = self._source_path(path)
+        tmp_path = "%s.%d.tmp" % (source_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'path': path, 'mtime_ns': signature[0], 'size': signature[1], 'images': sorted(image_keys)}, f)
+        os.replace(tmp_path, source_path)
+
+    def _paths(self, key) -> Tuple[str, str]:
+        image_hash, det_key = key
+        name = "%s-%s" % (image_hash, hashlib.blake2b(det_key.encode(), digest_size=8).hexdigest())
+        return os.path.join(self.cache_dir, name + '.kp.npy'), os.path.join(self.cache_dir, name + '.des.npy')
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+
+        kp_path, des_path = self._paths(key)
+        try:
+            kp_array = np.load(kp_path)
+            des = np.load(des_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        keypoints = array_to_keypoints(kp_array)
+        return keypoints, (des if len(keypoints) > 0 else None)
+
+    def _save(self, key, result) -> None:
+        if self.cache_dir is None:
+            return
+
+        keypoints, des = result
+        if des is None:
+            des = np.empty((0, 0), np.uint8)
+
+        # Write to temporary files first, so that a concurrent reader never sees a partial entry
+        for path, array in zip(self._paths(key), [keypoints_to_array(keypoints), des]):
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+
+_default_feature_store = FeatureStore()
+
+
+def get_default_feature_store() -> FeatureStore:
+    """Returns the FeatureStore used by the Matchers that are not given one explicitly."""
+    return _default_feature_store
+
+
+def set_default_feature_store(store: FeatureStore) -> None:
+    global _default_feature_store
+    _default_feature_store = store
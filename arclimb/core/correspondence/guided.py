@@ -0,0 +1,121 @@
+import itertools
+import math
+
+import numpy as np
+
+# Number of set bits of each byte value
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(des1: np.ndarray, des2: np.ndarray) -> np.ndarray:
+    """Row-wise Hamming distances between two NxB uint8 arrays of packed binary descriptors (e.g. ORB)."""
+    return POPCOUNT_TABLE[np.bitwise_xor(des1, des2)].sum(axis=1, dtype=np.int32)
+
+
+def guided_match(pts1, des1, pts2, des2, radius: float, ratio: float = 0.75):
+    """
+    Matches each point in pts1 with the point in pts2 whose descriptor is closest in Hamming distance, among the points
+    of pts2 within the given radius. A match is only kept if there is a single candidate, or if it passes the ratio test
+    against the second best candidate. Ties are broken in favour of the lowest index in pts2.
+
+    pts1 (already mapped to the coordinates of the second image) and pts2 are Nx2 arrays, des1 and des2 are the
+    corresponding packed binary descriptors.
+    Returns three arrays (query_idx, train_idx, distances), sorted by query_idx.
+    """
+    pts1 = np.asarray(pts1, dtype=np.float64).reshape(-1, 2)
+    pts2 = np.asarray(pts2, dtype=np.float64).reshape(-1, 2)
+
+    if len(pts1) == 0 or len(pts2) == 0:
+        return np.empty(0, np.intp), np.empty(0, np.intp), np.empty(0, np.int32)
+
+    # Imported here since scipy is slow to import, and most Matchers never get to guided matching
+    from scipy.spatial import cKDTree
+
+    # A single query for all the points; neighbour indices are sorted for each point
+    neighbours = cKDTree(pts2).query_ball_point(pts1, radius, return_sorted=True)
+    counts = np.fromiter(map(len, neighbours), dtype=np.intp, count=len(neighbours))
+    query = np.repeat(np.arange(len(pts1)), counts)
+    train = np.fromiter(itertools.chain.from_iterable(neighbours), dtype=np.intp, count=counts.sum())
+
+    if len(query) == 0:
+        return np.empty(0, np.intp), np.empty(0, np.intp), np.empty(0, np.int32)
+
+    dist = hamming_distances(des1[query], des2[train])
+
+    # Sort the candidates of each query point by distance, then by index; the first two are the best and second best
+    order = np.lexsort((train, dist, query))
+    has_candidates = counts > 0
+    starts = np.concatenate(([0], np.cumsum(counts[has_candidates])[:-1]))
+    best = order[starts]
+
+    best_dist = dist[best]
+    second_dist = np.full(len(best), np.inf)
+    has_second = counts[has_candidates] > 1
+    second_dist[has_second] = dist[order[starts[has_second] + 1]]
+
+    accepted = best[best_dist < ratio * second_dist]
+    return query[accepted], train[accepted], dist[accepted]
+
+
+def spatial_suppression(points, min_distance: float):
+    """
+    Greedily selects points in the given order, skipping the ones whose distance from an already selected point is
+    not larger than min_distance. Uses a grid with cells of size min_distance, so only neighbouring cells are checked.
+    Returns the list of indices of the selected points.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    cell_size = min_distance if min_distance > 0 else 1.0
+
+    grid = {}
+    selected = []
+    for i, (x, y) in enumerate(points.tolist()):
+        cx, cy = int(math.floor(x / cell_size)), int(math.floor(y / cell_size))
+
+        neighbourhood = (p for nx in (cx - 1, cx, cx + 1) for ny in (cy - 1, cy, cy + 1) for p in grid.get((nx, ny), ()))
+        if all(math.sqrt((x - px) ** 2 + (y - py) ** 2) > min_distance for px, py in neighbourhood):
+            selected.append(i)
+            grid.setdefault((cx, cy), []).append((x, y))
+
+    return selected
+
+
+def adaptive_suppression(points, responses, n: int, tolerance: float = 0.1, max_iterations: int = 20):
+    """
+    Adaptive non-maximal suppression: selects about n of the points, spread uniformly over the image. Points are taken
+    by decreasing response with spatial_suppression, and its min_distance is found by binary search, until between n
+    and n * (1 + tolerance) points are selected; the weakest ones beyond n are then dropped.
+    Returns the list of indices of the selected points, by decreasing response.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    order = np.argsort(-np.asarray(responses, dtype=np.float64), kind='stable')
+    if len(points) <= n:
+        return order.tolist()
+
+    # Radius at which n points would tile the bounding box of all the points; the answer is almost always below it
+    width, height = np.ptp(points, axis=0) + 1
+    low, high = 0.0, 2 * math.sqrt(width * height / n)
+    best = order[:n].tolist()
+    for _ in range(max_iterations):
+        radius = (low + high) / 2
+        selected = spatial_suppression(points[order], radius)
+        if len(selected) < n:
+            high = radius
+        else:
+            low = radius
+            best = order[selected[:n]].tolist()
+            if len(selected) <= n * (1 + tolerance):
+                break
+    return best
+
+
+def grid_coverage(points, width: float, height: float, grid_size: int = 8) -> float:
+    """
+    Fraction of the cells of a grid_size x grid_size grid over a width x height image that contain at least one of the
+    points; it tells how well the points are spread over the image.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return 0.0
+    cx = np.clip((points[:, 0] * grid_size / width).astype(np.intp), 0, grid_size - 1)
+    cy = np.clip((points[:, 1] * grid_size / height).astype(np.intp), 0, grid_size - 1)
+    return len(np.unique(cy * grid_size + cx)) / grid_size ** 2
@@ -0,0 +1,183 @@
+import math
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Robust estimation methods of cv2.findHomography; the USAC ones are only available since OpenCV 4.5
+METHODS = {
+    'lsq': 0,
+    'ransac': cv2.RANSAC,
+    'lmeds': cv2.LMEDS,
+    'rho': cv2.RHO,
+}
+for _name, _flag in [('usac', 'USAC_DEFAULT'), ('magsac', 'USAC_MAGSAC'), ('prosac', 'USAC_PROSAC')]:
+    if hasattr(cv2, _flag):
+        METHODS[_name] = getattr(cv2, _flag)
+
+HomographyEstimate = NamedTuple('HomographyEstimate', [('homography', np.ndarray),
+                                                       ('inliers', np.ndarray),
+                                                       ('inlier_ratio', float),
+                                                       ('rms_residual', float),
+                                                       ('confidence', float)])
+HomographyEstimate.__doc__ = """
+Result of a HomographyEstimator: the 3x3 homography, a boolean array telling which correspondences are inliers, the
+fraction of inliers, the root mean square reprojection error of the inliers, and a confidence between 0 and 1.
+"""
+
+
+def _quad_is_plausible(M, corners: np.ndarray, area2: float, max_scale: float) -> bool:
+    # Points mapped to infinity or behind the camera give no meaningful quadrilateral
+    denominators = corners @ np.asarray(M[2, :2]) + M[2, 2]
+    if not (np.all(denominators > 0) or np.all(denominators < 0)):
+        return False
+
+    quad = cv2.perspectiveTransform(corners.reshape(-1, 1, 2), M).reshape(-1, 2)
+    edges = np.roll(quad, -1, axis=0) - quad
+    next_edges = np.roll(edges, -1, axis=0)
+    if not np.all(edges[:, 0] * next_edges[:, 1] - edges[:, 1] * next_edges[:, 0] > 0):
+        return False
+
+    area = cv2.contourArea(quad.astype(np.float32))
+    return area2 / max_scale ** 2 <= area <= area2 * max_scale ** 2
+
+
+def homography_is_plausible(M, size1, size2, max_scale: float = 4.0) -> bool:
+    """
+    Tells if the homography M could map an image of size1 = (width, height) to a view of the same scene in an image of
+    size2: the corners of the first image must be mapped to a convex quadrilateral with the same orientation (i.e.,
+    the image is not folded nor mirrored), whose area is within a factor max_scale ** 2 of the area of the second image.
+    """
+    if M is None or not np.all(np.isfinite(M)):
+        return False
+    w, h = size1
+    corners = np.float64([[0, 0], [w, 0], [w, h], [0, h]])
+    return _quad_is_plausible(M, corners, float(size2[0] * size2[1]), max_scale)
+
+
+def _bounding_box(points: np.ndarray) -> Tuple[np.ndarray, float]:
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    return np.float64([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]), float((x1 - x0) * (y1 - y0))
+
+
+def _is_degenerate_configuration(points: np.ndarray, tolerance: float = 1e-3) -> bool:
+    """Tells if the points are (almost) all on a line, in which case no homography is determined by them."""
+    centered = points - points.mean(axis=0)
+    singular_values = np.linalg.svd(centered.astype(np.float64), compute_uv=False)
+    return singular_values[0] == 0 or singular_values[-1] < tolerance * singular_values[0]
+
+
+class HomographyEstimator(object):
+    """
+    Robust estimation of the homography between two sets of corresponding points, with cv2.findHomography.
+
+    method is one of the keys of METHODS: besides RANSAC and LMEDS, 'usac' and 'magsac' (MAGSAC++) are more accurate
+    and usually faster, and 'prosac' samples the best correspondences first: they are sorted by the scores passed to
+    estimate (lower is better, e.g. descriptor distances), which the other methods ignore.
+
+    Hopeless inputs are rejected early: less than min_inliers points or points on a line are rejected without any
+    estimation, and a first run of probe_iters iterations must find at least min_inliers inliers; if it found enough
+    inliers to reach the required confidence, it is also the final result. Homographies that fold, mirror or scale the
+    region covered by the inliers by more than max_scale are rejected (see homography_is_plausible).
+
+    The confidence of an estimate is its inlier ratio, scaled down as the RMS reprojection error of the inliers gets
+    closer to threshold.
+    """
+
+    def __init__(self, method: str = 'ransac', threshold: float = 5.0, confidence: float = 0.995,
+                 max_iters: int = 2000, probe_iters: int = 100, min_inliers: int = 4, max_scale: float = 4.0):
+        if method not in METHODS:
+            raise ValueError("Unknown homography estimation method %r (available: %s)" %
+                             (method, ", ".join(sorted(METHODS))))
+        self.method = method
+        self.threshold = threshold
+        self.confidence = confidence
+        self.max_iters = max_iters
+        self.probe_iters = probe_iters
+        self.min_inliers = max(4, min_inliers)
+        self.max_scale = max_scale
+
+    def _find(self, src: np.ndarray, dst: np.ndarray, max_iters: int) -> Optional[np.ndarray]:
+        M, _ = cv2.findHomography(src, dst, METHODS[self.method], self.threshold, maxIters=max_iters,
+                                  confidence=self.confidence)
+        if M is None or not np.all(np.isfinite(M)):
+            return None
+        return M
+
+    def _required_iters(self, inlier_ratio: float) -> float:
+        # Number of iterations after which a sample of 4 inliers was drawn with the required confidence
+        p_good_sample = inlier_ratio ** 4
+        if p_good_sample >= 1:
+            return 1
+        if p_good_sample <= 0:
+            return float('inf')
+        return math.log(1 - self.confidence) / math.log(1 - p_good_sample)
+
+    def evaluate(self, src_pts, dst_pts, M: np.ndarray) -> HomographyEstimate:
+        """Computes the inliers, residuals and confidence of the homography M on the given correspondences."""
+        src = np.asarray(src_pts, dtype=np.float64).reshape(-1, 2)
+        dst = np.asarray(dst_pts, dtype=np.float64).reshape(-1, 2)
+        projected = cv2.perspectiveTransform(src.reshape(-1, 1, 2), M).reshape(-1, 2)
+        residuals = np.hypot(*(projected - dst).T)
+        inliers = residuals < self.threshold
+
+        n_inliers = int(np.count_nonzero(inliers))
+        inlier_ratio = n_inliers / len(src) if len(src) > 0 else 0.0
+        rms = math.sqrt(np.mean(residuals[inliers] ** 2)) if n_inliers > 0 else float('inf')
+        confidence = inlier_ratio * max(0.0, 1.0 - rms / self.threshold) if n_inliers > 0 else 0.0
+        return HomographyEstimate(M, inliers, inlier_ratio, rms, confidence)
+
+    def is_plausible(self, M: np.ndarray, src: np.ndarray, dst: np.ndarray, size1=None, size2=None) -> bool:
+        """
+        Tells if M is plausible (see homography_is_plausible) for images of the given sizes, or, if they are not given,
+        for the bounding boxes of the src and dst points.
+        """
+        if size1 is not None and size2 is not None:
+            return homography_is_plausible(M, size1, size2, self.max_scale)
+        corners, _ = _bounding_box(src)
+        _, area2 = _bounding_box(dst)
+        return _quad_is_plausible(M, corners, area2, self.max_scale)
+
+    def estimate(self, src_pts, dst_pts, scores=None, size1=None, size2=None) -> Optional[HomographyEstimate]:
+        """
+        Estimates the homography mapping the Nx2 src_pts to dst_pts. Returns None if no plausible homography with at
+        least min_inliers inliers was found.
+        """
+        src = np.asarray(src_pts, dtype=np.float32).reshape(-1, 2)
+        dst = np.asarray(dst_pts, dtype=np.float32).reshape(-1, 2)
+        if len(src) < self.min_inliers:
+            return None
+        if _is_degenerate_configuration(src) or _is_degenerate_configuration(dst):
+            return None
+
+        order = None
+        if scores is not None and self.method == 'prosac':
+            order = np.argsort(np.asarray(scores).ravel(), kind='stable')
+            src, dst = src[order], dst[order]
+
+        robust = self.method != 'lsq'
+        M = self._find(src, dst, self.probe_iters if robust else 0)
+        result = self.evaluate(src, dst, M) if M is not None else None
+        if robust and 0 < self.probe_iters < self.max_iters:
+            if result is None or np.count_nonzero(result.inliers) < self.min_inliers:
+                # Not even a handful of inliers: a longer run would not find a good homography either
+                return None
+            if self._required_iters(result.inlier_ratio) > self.probe_iters:
+                M = self._find(src, dst, self.max_iters)
+                if M is not None:
+                    full = self.evaluate(src, dst, M)
+                    if np.count_nonzero(full.inliers) >= np.count_nonzero(result.inliers):
+                        result = full
+
+        if result is None or np.count_nonzero(result.inliers) < self.min_inliers:
+            return None
+        inliers = result.inliers
+        if not self.is_plausible(result.homography, src[inliers], dst[inliers], size1, size2):
+            return None
+
+        if order is not None:
+            # Back to the order of the input
+            unsorted = np.empty_like(inliers)
+            unsorted[order] = inliers
+            result = result._replace(inliers=unsorted)
+        return result
@@ -1,10 +1,11 @@
 import cv2
 import numpy as np
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from abc import ABCMeta, abstractmethod
 
 from arclimb.core.graph import Point, Correspondence
+from arclimb.core.correspondence.homography import HomographyEstimate, HomographyEstimator
 
 
 # noinspection PyPep8Naming
@@ -17,27 +18,132 @@ class PointMap(metaclass=ABCMeta):
     def map(self, point: Point) -> (Point, Optional[float]):
         pass
 
+    @abstractmethod
+    def inverse_map(self, point: Point) -> (Point, Optional[float]):
+        pass
+
+    @staticmethod
+    def _map_each(function, points: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        results = [function(Point(x, y)) for x, y in points.tolist()]
+        mapped = np.array([p.asTuple() for p, _ in results], dtype=np.float64).reshape(-1, 2)
+        if any(confidence is None for _, confidence in results):
+            return mapped, None
+        return mapped, np.array([confidence for _, confidence in results])
+
+    def map_many(self, points: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Maps an Nx2 array of points; returns an Nx2 array with the mapped points and an array with the confidence of
+        each point (or None). Subclasses should override this with a vectorized implementation.
+        """
+        return self._map_each(self.map, points)
+
+    def inverse_map_many(self, points: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Like map_many, with inverse_map."""
+        return self._map_each(self.inverse_map, points)
+
     def __call__(self, point: Point) -> (Point, Optional[float]):
         return self.map(point)
 
 
 # noinspection PyPep8Naming
 class HomographicPointMap(PointMap):
-    def __init__(self, correspondences: List[Correspondence]):
+    """
+    Maps points with a homography fitted with RANSAC on the correspondences (or with the given HomographyEstimator).
+    If initialHomography is given (e.g. the one fitted before a few correspondences were added or moved), it is used as
+    the starting hypothesis: if at least half of the correspondences agree with it, the homography is only refined on
+    them, which is much faster than a full RANSAC; otherwise it is ignored.
+
+    The confidence of the mapped points is the one of the homography (see HomographyEstimator).
+    Correspondences are in relative coordinates, so ransacReprojThreshold is a fraction of the image size (by default
+    DEFAULT_THRESHOLD). If an estimator is given, its threshold is used instead, so ransacReprojThreshold can't be given.
+    """
+
+    DEFAULT_THRESHOLD = 0.01
+
+    def __init__(self, correspondences: List[Correspondence], ransacReprojThreshold: Optional[float] = None,
+                 initialHomography: Optional[np.ndarray] = None, estimator: Optional[HomographyEstimator] = None):
         super().__init__(correspondences)
+        if len(correspondences) < 4:
+            raise ValueError("At least 4 correspondences are needed to fit a homography")
+        if estimator is None:
+            if ransacReprojThreshold is None:
+                ransacReprojThreshold = HomographicPointMap.DEFAULT_THRESHOLD
+            estimator = HomographyEstimator('ransac', ransacReprojThreshold)
+        elif ransacReprojThreshold is not None:
+            raise ValueError("ransacReprojThreshold can't be given with an estimator, which has its own threshold")
+
         src_pts = np.float32([[corr.point1.x, corr.point1.y] for corr in correspondences]).reshape(-1, 1, 2)
         dst_pts = np.float32([[corr.point2.x, corr.point2.y] for corr in correspondences]).reshape(-1, 1, 2)
 
-        M, _ = cv2.findHomography(src_pts, dst_pts, method=cv2.RANSAC,ransacReprojThreshold=5.0)
+        estimate = None
+        if initialHomography is not None:
+            M = self._refine(src_pts, dst_pts, initialHomography, estimator.threshold)
+            if M is not None and estimator.is_plausible(M, src_pts.reshape(-1, 2), dst_pts.reshape(-1, 2)):
+                estimate = estimator.evaluate(src_pts, dst_pts, M)
+        if estimate is None:
+            estimate = estimator.estimate(src_pts, dst_pts)
 
-        # TODO: handle failure cases (not enough points, M not a homography, etc)
+        if estimate is None:
+            raise ValueError("Could not fit a homography to the correspondences")
 
-        self._M = M
+        self._estimate = estimate
+        self._M = estimate.homography
+        self._M_inv = None
+
+    @staticmethod
+    def _count_inliers(src_pts: np.ndarray, dst_pts: np.ndarray, M: np.ndarray, threshold: float) -> np.ndarray:
+        projected = cv2.perspectiveTransform(src_pts.astype(np.float64), M)
+        return np.linalg.norm(projected - dst_pts, axis=2).ravel() < threshold
+
+    @staticmethod
+    def _refine(src_pts: np.ndarray, dst_pts: np.ndarray, M: np.ndarray, threshold: float) -> Optional[np.ndarray]:
+        """Refits M on the correspondences that agree with it; returns None if M is not a good enough hypothesis."""
+        inliers = HomographicPointMap._count_inliers(src_pts, dst_pts, M, threshold)
+        n_inliers = np.count_nonzero(inliers)
+        if n_inliers < 4 or 2 * n_inliers < len(src_pts):
+            return None
+
+        refined, _ = cv2.findHomography(src_pts[inliers], dst_pts[inliers], method=0)
+        if refined is None:
+            return None
+
+        # The refined homography must explain at least as many correspondences as the hypothesis
+        if np.count_nonzero(HomographicPointMap._count_inliers(src_pts, dst_pts, refined, threshold)) < n_inliers:
+            return M
+        return refined
+
+    @staticmethod
+    def _transform(points: np.ndarray, M: np.ndarray) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        return cv2.perspectiveTransform(points, M).reshape(-1, 2)
 
     def map(self, point: Point) -> (Point, Optional[float]):
-        pt = np.array([point.x, point.y]).reshape(-1, 1, 2)
-        x, y = cv2.perspectiveTransform(pt, self._M).flatten()
-        return Point(x, y), None
+        x, y = self._transform(np.array([point.x, point.y]), self._M)[0]
+        return Point(x, y), self._estimate.confidence
+
+    def map_many(self, points: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        mapped = self._transform(points, self._M)
+        return mapped, np.full(len(mapped), self._estimate.confidence)
+
+    def inverse_map(self, point: Point) -> (Point, Optional[float]):
+        x, y = self._transform(np.array([point.x, point.y]), self.getInversePerspectiveTransformation())[0]
+        return Point(x, y), self._estimate.confidence
+
+    def inverse_map_many(self, points: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        mapped = self._transform(points, self.getInversePerspectiveTransformation())
+        return mapped, np.full(len(mapped), self._estimate.confidence)
+
+    def getEstimate(self) -> HomographyEstimate:
+        """Returns the inliers, the inlier ratio and the confidence of the homography."""
+        return self._estimate
 
     def getPerspectiveTransformation(self):
-        return self._M
\ No newline at end of file
+        return self._M
+
+    def getInversePerspectiveTransformation(self):
+        if self._M_inv is None:
+            self._M_inv = np.linalg.inv(self._M)
+        return self._M_inv
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.featurestore import detector_key
+from arclimb.core.correspondence.guided import adaptive_suppression
+
+
+def tile_grid(width: int, height: int, tile_size: int) -> List[Tuple[int, int, int, int]]:
+    """Splits a width x height image in tiles of at most tile_size x tile_size pixels; returns (x0, y0, x1, y1) tuples."""
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+
+
+class TiledDetector(object):
+    """
+    Runs an OpenCV Feature2D detector on the tiles of a (large) image in parallel threads, so that images can be used at
+    full resolution; OpenCV releases the GIL while detecting. It can be used in place of the detector, e.g. with a
+    FeatureStore.
+
+    Each tile is extended by overlap pixels on each side, so that the keypoints near its border get the same
+    descriptors as in the whole image; only the keypoints inside the tile itself are kept. Since the detector keeps the
+    strongest keypoints of each tile, the merged keypoints are spread over the image; if max_keypoints is given, they
+    are further reduced to max_keypoints with adaptive_suppression.
+
+    detector_factory is called to create a detector for each tile, since detectors are not guaranteed to be thread-safe.
+    """
+
+    def __init__(self, detector_factory: Callable[[], cv2.Feature2D], tile_size: int = 1024, overlap: int = 96,
+                 max_keypoints: Optional[int] = None, workers: Optional[int] = None):
+        if tile_size <= 0:
+            raise ValueError("tile_size must be positive")
+        self.detector_factory = detector_factory
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.max_keypoints = max_keypoints
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+        # Only used to describe the detector, see detector_key
+        self._prototype = detector_factory()
+
+    # ----- parameters, as exposed by OpenCV detectors -----
+    def getDefaultName(self) -> str:
+        return "Tiled." + self._prototype.getDefaultName()
+
+    def getDetector(self) -> str:
+        return detector_key(self._prototype)
+
+    def getTileSize(self) -> int:
+        return self.tile_size
+
+    def getOverlap(self) -> int:
+        return self.overlap
+
+    def getMaxKeypoints(self) -> Optional[int]:
+        return self.max_keypoints
+
+    def descriptorSize(self) -> int:
+        return self._prototype.descriptorSize()
+
+    def descriptorType(self) -> int:
+        return self._prototype.descriptorType()
+
+    # ----- detection -----
+    def _detect_tile(self, image, mask, tile):
+        x0, y0, x1, y1 = tile
+        h, w = image.shape[:2]
+        ex0, ey0 = max(0, x0 - self.overlap), max(0, y0 - self.overlap)
+        ex1, ey1 = min(w, x1 + self.overlap), min(h, y1 + self.overlap)
+
+        tile_mask = mask[ey0:ey1, ex0:ex1] if mask is not None else None
+        keypoints, descriptors = self.detector_factory().detectAndCompute(image[ey0:ey1, ex0:ex1], tile_mask)
+
+        result_keypoints, rows = [], []
+        for i, kp in enumerate(keypoints):
+            # From the coordinates of the extended tile to the ones of the image
+            x, y = kp.pt[0] + ex0, kp.pt[1] + ey0
+            if x0 <= x < x1 and y0 <= y < y1:
+                kp.pt = (x, y)
+                result_keypoints.append(kp)
+                rows.append(i)
+
+        if descriptors is None:
+            return result_keypoints, None
+        return result_keypoints, descriptors[rows]
+
+    def detectAndCompute(self, image: np.ndarray, mask: Optional[np.ndarray] = None):
+        h, w = image.shape[:2]
+        tiles = tile_grid(w, h, self.tile_size)
+
+        if self.workers <= 1 or len(tiles) == 1:
+            results = [self._detect_tile(image, mask, tile) for tile in tiles]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(tiles))) as executor:
+                results = list(executor.map(lambda tile: self._detect_tile(image, mask, tile), tiles))
+
+        keypoints = [kp for tile_keypoints, _ in results for kp in tile_keypoints]
+        descriptors = [des for tile_keypoints, des in results if des is not None and len(tile_keypoints) > 0]
+        descriptors = np.concatenate(descriptors) if len(descriptors) > 0 else None
+
+        if self.max_keypoints is not None and len(keypoints) > self.max_keypoints:
+            selected = adaptive_suppression(cv2.KeyPoint_convert(keypoints), [kp.response for kp in keypoints],
+                                            self.max_keypoints)
+            keypoints = [keypoints[i] for i in selected]
+            descriptors = descriptors[selected] if descriptors is not None else None
+
+        return keypoints, descriptors
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class StageStats(object):
+    """Number of calls, total wall time and total counts (e.g. keypoints, matches) of a stage of the pipeline."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.counts = OrderedDict()  # type: OrderedDict[str, int]
+
+    def add(self, seconds: float, counts: Dict[str, int], calls: int = 1) -> None:
+        self.calls += calls
+        self.seconds += seconds
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'seconds': self.seconds, 'counts': dict(self.counts)}
+
+
+class Trace(object):
+    """
+    Structured record of where the time and the matches go in the matching pipeline: for each named stage (detection,
+    descriptor matching, ratio test, ...), how many times it ran, its total wall time, and the totals of its counts.
+
+    The Matchers record their stages into the trace that is active in the current thread, if any: a trace is activated
+    with a with statement (or by passing it to CorrespondenceFinder). Traces of several runs, e.g. of all the pairs of a
+    batch, can be added together with merge.
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()  # type: OrderedDict[str, StageStats]
+
+    def __getitem__(self, name: str) -> StageStats:
+        return self.stages[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.stages
+
+    def record(self, name: str, seconds: float, counts: Dict[str, int], calls: int = 1) -> None:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.add(seconds, counts, calls)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, int]]:
+        """Times the body of the with statement as stage name; counts can be added to the dict it yields."""
+        counts = OrderedDict()
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(name, time.perf_counter() - start, counts)
+
+    def merge(self, other: 'Trace') -> None:
+        for name, stats in other.stages.items():
+            self.record(name, stats.seconds, stats.counts, stats.calls)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return OrderedDict((name, stats.to_dict()) for name, stats in self.stages.items())
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'Trace':
+        trace = Trace()
+        for name, stats in d.items():
+            trace.record(name, stats['seconds'], stats['counts'], stats['calls'])
+        return trace
+
+    def __str__(self):
+        lines = ["%-16s %7s %11s  %s" % ("stage", "calls", "time (ms)", "counts")]
+        for name, stats in self.stages.items():
+            counts = ", ".join("%s=%d" % item for item in stats.counts.items())
+            lines.append("%-16s %7d %11.1f  %s" % (name, stats.calls, stats.seconds * 1000, counts))
+        return "\n".join(lines)
+
+    # ----- activation -----
+    def __enter__(self):
+        _active.__dict__.setdefault('traces', []).append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.traces.pop()
+
+
+# Stack of the traces activated in each thread
+_active = threading.local()
+
+
+def current_trace() -> Optional[Trace]:
+    """Returns the trace active in the current thread, or None."""
+    traces = getattr(_active, 'traces', None)
+    return traces[-1] if traces else None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Dict[str, int]]:
+    """Same as Trace.stage on the active trace; if there is none, the stage is not recorded."""
+    trace = current_trace()
+    if trace is None:
+        yield {}
+    else:
+        with trace.stage(name) as counts:
+            yield counts
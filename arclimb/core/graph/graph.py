@@ -1,32 +1,73 @@
-import networkx as nw
 import math
-from typing import NamedTuple, Tuple, Dict, Set, Iterable, Any, NewType, Union
+import struct
+from collections.abc import Set as AbstractSet
+from typing import NamedTuple, Tuple, Dict, Set, Iterable, Iterator, Any, NewType, Optional, Union, TYPE_CHECKING
 
-from PyQt5.QtCore import QPointF, QRectF
+import numpy as np
+
+if TYPE_CHECKING:
+    from PyQt5.QtCore import QPointF, QRectF
 
 NodeId = NewType('NodeId', str)
 
-PointUnion = NewType('PointUnion', Union['Point', QPointF, Tuple[float, float]])
+PointUnion = NewType('PointUnion', Union['Point', 'QPointF', Tuple[float, float]])
+
+# Used to set the slots of Points, whose __setattr__ raises
+_set_attribute = object.__setattr__
+
 
 # noinspection PyPep8Naming
-class Point:
-    """Immutable point class with floating point coordinates."""
+class Point(object):
+    """
+    Immutable point class with floating point coordinates.
+
+    A Point is built from two coordinates, from another Point, a tuple or a QPointF, or from the x and y keywords;
+    Points and tuples take a fast path. fromTuple, fromQPointF and from_dict skip the dispatch on the arguments.
+    Qt is not needed to use Points: QPointF arguments are recognized by their x() and y() methods, and the conversions
+    to Qt types are in arclimb.core.graph.qt.
+    """
+    __slots__ = ('x', 'y', '_hash')
 
     def __init__(self, *args, **kwargs):
-        if len(args) == 2 and len(kwargs) == 0:
-            super().__setattr__("x", args[0])
-            super().__setattr__("y", args[1])
-        elif len(args) == 1 and len(kwargs) == 0:
+        if kwargs:
+            if args or len(kwargs) != 2 or 'x' not in kwargs or 'y' not in kwargs:
+                raise TypeError("Wrong arguments in constructor.")
+            x, y = kwargs['x'], kwargs['y']
+        elif len(args) == 2:
+            x, y = args
+        elif len(args) == 1:
             p = args[0]
-            if isinstance(p, QPointF):
-                self.__init__(p.x(), p.y())
+            if type(p) is Point:
+                x, y = p.x, p.y
+            elif type(p) is tuple or hasattr(p, '__getitem__'):
+                # p is a Point, a tuple or a list, so it's indexable
+                x, y = p[0], p[1]
+            elif callable(getattr(p, 'x', None)) and callable(getattr(p, 'y', None)):
+                # A QPointF, or a QPoint
+                x, y = p.x(), p.y()
             else:
-                # p is a Point or a tuple, so it's indexable
-                self.__init__(p[0], p[1])
-        elif len(args) == 0 and len(kwargs) == 2 and 'x' in kwargs and 'y' in kwargs:
-            self.__init__(kwargs['x'], kwargs['y'])
+                raise TypeError("Wrong arguments in constructor.")
         else:
             raise TypeError("Wrong arguments in constructor.")
+        _set_attribute(self, 'x', x)
+        _set_attribute(self, 'y', y)
+        _set_attribute(self, '_hash', None)
+
+    @staticmethod
+    def fromTuple(p: Tuple[float, float]) -> 'Point':
+        return _make_point(p[0], p[1])
+
+    @staticmethod
+    def fromQPointF(p: 'QPointF') -> 'Point':
+        return _make_point(p.x(), p.y())
+
+    @staticmethod
+    def from_dict(point_dict: Dict[str, Any]) -> 'Point':
+        return _make_point(point_dict['x'], point_dict['y'])
+
+    def __reduce__(self):
+        # The default protocol would restore the slots with setattr
+        return Point, (self.x, self.y)
 
     def __getitem__(self, key: int) -> float:
         if key == 0:
@@ -44,51 +85,58 @@ class Point:
         else:
             raise IndexError("Index out of bounds; it must be 0 or 1")
 
-    def __setattr__(self, key: int, value: float) -> None:
+    def __setattr__(self, key: str, value: float) -> None:
         raise AttributeError("Point objects are immutable")
 
     def __add__(self, p: PointUnion) -> 'Point':
-        p = Point(p)
-        return Point(self.x+p.x, self.y+p.y)
+        if type(p) is not Point:
+            p = Point(p)
+        return _make_point(self.x + p.x, self.y + p.y)
 
     def __radd__(self, p: PointUnion) -> 'Point':
         return Point(p) + self
 
     def __sub__(self, p: PointUnion) -> 'Point':
-        p = Point(p)
-        return Point(self.x-p.x, self.y-p.y)
+        if type(p) is not Point:
+            p = Point(p)
+        return _make_point(self.x - p.x, self.y - p.y)
 
     def __rsub__(self, p: PointUnion) -> 'Point':
-        p = Point(p)
         return Point(p) - self
 
     def __mul__(self, scalar: float) -> 'Point':
-        return Point(self.x*scalar, self.y*scalar)
+        return _make_point(self.x * scalar, self.y * scalar)
 
     def __rmul__(self, scalar: float) -> 'Point':
-        return Point(self.x*scalar, self.y*scalar)
+        return _make_point(self.x * scalar, self.y * scalar)
 
     def __div__(self, scalar: float) -> 'Point':
-        return Point(self.x/scalar, self.y/scalar)
+        return _make_point(self.x / scalar, self.y / scalar)
 
     def __eq__(self, p: PointUnion) -> bool:
-        p = Point(p)
+        if type(p) is not Point:
+            p = Point(p)
         return self.x == p.x and self.y == p.y
 
     def __hash__(self):
-        return hash(self.asTuple())
+        # Computed on first use, since most Points are never hashed
+        h = self._hash
+        if h is None:
+            h = hash((self.x, self.y))
+            _set_attribute(self, '_hash', h)
+        return h
 
     def __ne__(self, p: PointUnion) -> bool:
         return not self == p
 
     def __neg__(self) -> 'Point':
-        return Point(-self.x, -self.y)
+        return _make_point(-self.x, -self.y)
 
     def __pos__(self) -> 'Point':
-        return Point(self)
+        return _make_point(self.x, self.y)
 
     def __abs__(self) -> 'Point':
-        return Point(abs(self.x), abs(self.y))
+        return _make_point(abs(self.x), abs(self.y))
 
     def __str__(self):
         return "(%s, %s)" % (self.x, self.y)
@@ -99,23 +147,26 @@ class Point:
     def asTuple(self) -> Tuple[float, float]:
         return self.x, self.y
 
-    def asQPointF(self) -> QPointF:
-        return QPointF(self.x, self.y)
+    def asQPointF(self) -> 'QPointF':
+        from arclimb.core.graph.qt import as_qpointf
+        return as_qpointf(self)
 
     def dist(self, p: PointUnion) -> float:
-        p = Point(p)
+        if type(p) is not Point:
+            p = Point(p)
         return math.hypot(self.x - p.x, self.y - p.y)
 
-    def toRelativeCoordinates(self, rect: QRectF) -> 'Point':
+    def toRelativeCoordinates(self, rect: 'QRectF') -> 'Point':
         x = (self.x - rect.x()) / rect.width()
         y = (self.y - rect.y()) / rect.height()
-        return Point(x, y)
+        return _make_point(x, y)
 
-    def toAbsoluteCoordinates(self, rect: QRectF) -> 'Point':
-        return Point(rect.x() + rect.width() * self.x, rect.y() + rect.height() * self.y)
+    def toAbsoluteCoordinates(self, rect: 'QRectF') -> 'Point':
+        return _make_point(rect.x() + rect.width() * self.x, rect.y() + rect.height() * self.y)
 
-    def inRect(self, rect: QRectF) -> bool:
-        return self.asQPointF() in rect
+    def inRect(self, rect: 'QRectF') -> bool:
+        from arclimb.core.graph.qt import in_rect
+        return in_rect(self, rect)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -124,6 +175,15 @@ class Point:
         }
 
 
+def _make_point(x: float, y: float) -> Point:
+    """Builds a Point from its coordinates without going through Point.__init__."""
+    p = object.__new__(Point)
+    _set_attribute(p, 'x', x)
+    _set_attribute(p, 'y', y)
+    _set_attribute(p, '_hash', None)
+    return p
+
+
 class Correspondence(NamedTuple('Correspondence', [('point1', Point), ('point2', Point)])):
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -133,11 +193,142 @@ class Correspondence(NamedTuple('Correspondence', [('point1', Point), ('point2',
 
     @staticmethod
     def from_dict(corr_dict: Dict[str, Any]):
-        point1 = Point(**corr_dict['point1'])
-        point2 = Point(**corr_dict['point2'])
+        point1 = Point.from_dict(corr_dict['point1'])
+        point2 = Point.from_dict(corr_dict['point2'])
         return Correspondence(point1, point2)
 
 
+class CorrespondenceStore(object):
+    """
+    Compact storage for the correspondences of an edge.
+
+    Each correspondence is a row (x1, y1, x2, y2) of an Nx4 float32 array; a dictionary from the packed row to its
+    index rejects duplicates, like the set of Correspondence objects it replaces. Coordinates are rounded to float32.
+    """
+
+    INITIAL_CAPACITY = 8
+
+    _row_format = struct.Struct('<4f')
+    _row_dtype = np.dtype((np.void, 16))
+
+    def __init__(self, correspondences: Iterable[Correspondence] = ()):
+        self._data = np.empty((CorrespondenceStore.INITIAL_CAPACITY, 4), dtype=np.float32)
+        self._size = 0
+        self._index = {}  # type: Dict[bytes, int]
+
+        for corr in correspondences:
+            self.add(corr)
+
+    @staticmethod
+    def _row(corr: Correspondence) -> Tuple[float, float, float, float]:
+        p1, p2 = corr
+        # Adding 0.0 turns -0.0 into 0.0, so that points that compare equal also have the same key
+        if type(p1) is Point and type(p2) is Point:
+            return p1.x + 0.0, p1.y + 0.0, p2.x + 0.0, p2.y + 0.0
+        return p1[0] + 0.0, p1[1] + 0.0, p2[0] + 0.0, p2[1] + 0.0
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity > len(self._data):
+            data = np.empty((max(capacity, 2 * len(self._data)), 4), dtype=np.float32)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, corr: Correspondence) -> bool:
+        return CorrespondenceStore._row_format.pack(*CorrespondenceStore._row(corr)) in self._index
+
+    def __iter__(self) -> Iterator[Correspondence]:
+        for x1, y1, x2, y2 in self._data[:self._size].tolist():
+            yield Correspondence(_make_point(x1, y1), _make_point(x2, y2))
+
+    def add(self, corr: Correspondence) -> None:
+        row = CorrespondenceStore._row(corr)
+        key = CorrespondenceStore._row_format.pack(*row)
+        if key not in self._index:
+            self._reserve(self._size + 1)
+            self._data[self._size] = row
+            self._index[key] = self._size
+            self._size += 1
+
+    def extend_array(self, array) -> None:
+        """Adds all the rows of an Nx4 array of (x1, y1, x2, y2) coordinates, skipping duplicates."""
+        rows = np.asarray(array, dtype=np.float32).reshape(-1, 4) + np.float32(0.0)
+        keys = np.ascontiguousarray(rows).view(CorrespondenceStore._row_dtype).ravel().tolist()
+
+        keep = []
+        index = self._index
+        for i, key in enumerate(keys):
+            if key not in index:
+                index[key] = self._size + len(keep)
+                keep.append(i)
+
+        self._reserve(self._size + len(keep))
+        self._data[self._size:self._size + len(keep)] = rows[keep]
+        self._size += len(keep)
+
+    def remove(self, corr: Correspondence) -> None:
+        """Removes a correspondence; raises KeyError if it is not present. The last row takes the place of the removed one."""
+        key = CorrespondenceStore._row_format.pack(*CorrespondenceStore._row(corr))
+        i = self._index.pop(key)
+        last = self._size - 1
+        if i != last:
+            self._data[i] = self._data[last]
+            self._index[self._data[i].tobytes()] = i
+        self._size = last
+
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only Nx4 view of the stored rows; it is only valid until the next change to the store."""
+        view = self._data[:self._size].view()
+        view.flags.writeable = False
+        return view
+
+
+class CorrespondenceView(AbstractSet):
+    """
+    Read-only, set-like view of the correspondences in a CorrespondenceStore.
+    If swapped is True, the two points of each correspondence are exchanged.
+    """
+
+    def __init__(self, store: CorrespondenceStore, swapped: bool = False):
+        self._store = store
+        self._swapped = swapped
+
+    @classmethod
+    def _from_iterable(cls, it):
+        # Results of set operations (e.g.: view & other) are plain sets
+        return set(it)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, corr: Any) -> bool:
+        if not isinstance(corr, tuple) or len(corr) != 2:
+            return False
+        if self._swapped:
+            corr = Correspondence(corr[1], corr[0])
+        return corr in self._store
+
+    def __iter__(self) -> Iterator[Correspondence]:
+        if not self._swapped:
+            return iter(self._store)
+        return (Correspondence(p2, p1) for p1, p2 in self._store)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, set(self))
+
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only Nx4 array of (x1, y1, x2, y2) rows."""
+        array = self._store.array
+        if self._swapped:
+            array = array[:, [2, 3, 0, 1]]
+            array.flags.writeable = False
+        return array
+
+
 # Create a node class, and make it have an optional argument
 class Node(NamedTuple('Node', [('id', NodeId), ('attributes', Dict[str, Any])])):
     def __hash__(self):
@@ -152,67 +343,220 @@ class Node(NamedTuple('Node', [('id', NodeId), ('attributes', Dict[str, Any])]))
 Node.__new__.__defaults__ = ({},)
 
 
+class _NodeRecord(object):
+    """A node of a Graph: its index, and the edges to its neighbours, keyed by their index."""
+    __slots__ = ('node', 'index', 'edges')
+
+    def __init__(self, node: Node, index: int):
+        self.node = node
+        self.index = index
+        self.edges = {}  # type: Dict[int, _EdgeRecord]
+
+
+class _EdgeRecord(object):
+    """An edge of a Graph; its correspondences are oriented from src to dest."""
+    __slots__ = ('src', 'dest', 'correspondences', 'revision')
+
+    def __init__(self, src: NodeId, dest: NodeId, correspondences: CorrespondenceStore, revision: int):
+        self.src = src
+        self.dest = dest
+        self.correspondences = correspondences
+        self.revision = revision
+
+
 class Graph(object):
+    """
+    Undirected graph of images. The correspondences of each edge are kept in a CorrespondenceStore, oriented from the
+    node that was passed first when the edge was created; get_correspondences(node1_id, node2_id) always returns
+    correspondences whose point1 lies in node1_id.
+
+    Node ids are interned to integer indices, that are never reused; each node keeps its edges keyed by the index of
+    the other node, and all the edges are also kept by pair of indices, in the order they were created, so that
+    lookups are O(1) and iterating over nodes or edges makes no copies.
+    """
+
     def __init__(self, undirected=True):
-        self.__graph = nw.Graph(undirected=undirected)
+        # Only undirected graphs are supported; the argument is kept for compatibility
+        self.__nodes = {}  # type: Dict[NodeId, _NodeRecord]
+        self.__edges = {}  # type: Dict[Tuple[int, int], _EdgeRecord]
+        self.__next_index = 0
+        self.__revision = 0
+        self.__query = None
+
+    # Records a change to the graph; if an edge is given, it also gets a new revision number, unique in this graph
+    def __touch(self, edge: Optional[_EdgeRecord] = None) -> None:
+        self.__revision += 1
+        if edge is not None:
+            edge.revision = self.__revision
+
+    # Returns the record of the edge between two nodes, or None
+    def __get_edge(self, node1_id: NodeId, node2_id: NodeId) -> Optional[_EdgeRecord]:
+        record1 = self.__nodes.get(node1_id)
+        record2 = self.__nodes.get(node2_id)
+        if record1 is None or record2 is None:
+            return None
+        return record1.edges.get(record2.index)
+
+    def __edge(self, node1_id: NodeId, node2_id: NodeId) -> _EdgeRecord:
+        edge = self.__get_edge(node1_id, node2_id)
+        if edge is None:
+            raise KeyError("The graph has no edge between %s and %s" % (node1_id, node2_id))
+        return edge
 
     def add_node(self, node: Node) -> None:
-        self.__graph.add_node(node.id, node=node)
+        record = self.__nodes.get(node.id)
+        if record is None:
+            self.__nodes[node.id] = _NodeRecord(node, self.__next_index)
+            self.__next_index += 1
+        else:
+            record.node = node
+        self.__touch()
 
     def remove_node(self, node_id: NodeId) -> None:
-        self.__graph.remove_node(node_id)
+        record = self.__nodes.pop(node_id)
+        for neighbour_index in record.edges:
+            del self.__edges[min(record.index, neighbour_index), max(record.index, neighbour_index)]
+        for edge in record.edges.values():
+            other = edge.dest if edge.src == node_id else edge.src
+            if other != node_id:
+                del self.__nodes[other].edges[record.index]
+        self.__touch()
 
     def has_node(self, node_id: NodeId) -> bool:
-        return self.__graph.has_node(node_id)
+        return node_id in self.__nodes
 
     def has_edge(self, node1_id: NodeId, node2_id: NodeId) -> bool:
-        return self.__graph.has_edge(node1_id, node2_id)
+        return self.__get_edge(node1_id, node2_id) is not None
 
     def add_edge(self, node1_id: NodeId, node2_id: NodeId) -> None:
-        if not self.__graph.has_edge(node1_id, node2_id):
-            self.__graph.add_edge(node1_id, node2_id, correspondences=set())
+        if self.__get_edge(node1_id, node2_id) is None:
+            # Like networkx, missing nodes are added
+            for node_id in (node1_id, node2_id):
+                if node_id not in self.__nodes:
+                    self.add_node(Node(node_id))
+
+            record1, record2 = self.__nodes[node1_id], self.__nodes[node2_id]
+            edge = _EdgeRecord(node1_id, node2_id, CorrespondenceStore(), 0)
+            record1.edges[record2.index] = edge
+            record2.edges[record1.index] = edge
+            self.__edges[min(record1.index, record2.index), max(record1.index, record2.index)] = edge
+            self.__touch(edge)
 
     def remove_edge(self, node1_id: NodeId, node2_id: NodeId) -> None:
-        return self.__graph.remove_edge(node1_id, node2_id)
+        self.__edge(node1_id, node2_id)
+        record1, record2 = self.__nodes[node1_id], self.__nodes[node2_id]
+        del record1.edges[record2.index]
+        record2.edges.pop(record1.index, None)
+        del self.__edges[min(record1.index, record2.index), max(record1.index, record2.index)]
+        self.__touch()
+
+    def get_neighbours(self, node_id: NodeId) -> Iterable[NodeId]:
+        return (edge.dest if edge.src == node_id else edge.src for edge in self.__nodes[node_id].edges.values())
+
+    def get_revision(self) -> int:
+        """Returns a number that changes whenever the graph is modified."""
+        return self.__revision
+
+    def get_edge_revision(self, node1_id: NodeId, node2_id: NodeId) -> int:
+        """Returns a number that changes whenever the correspondences of the edge are modified; it is never reused."""
+        return self.__edge(node1_id, node2_id).revision
+
+    # Returns the store of the edge, and whether node1_id is the second endpoint of its correspondences
+    def __get_store(self, node1_id: NodeId, node2_id: NodeId) -> Tuple[CorrespondenceStore, bool]:
+        edge = self.__edge(node1_id, node2_id)
+        return edge.correspondences, edge.src != node1_id
+
+    def __set_store(self, node1_id: NodeId, node2_id: NodeId, store: CorrespondenceStore) -> None:
+        self.add_edge(node1_id, node2_id)
+        edge = self.__edge(node1_id, node2_id)
+        edge.src, edge.dest = node1_id, node2_id
+        edge.correspondences = store
+        self.__touch(edge)
 
     def set_correspondences(self, node1_id: NodeId, node2_id: NodeId, correspondences: Iterable[Correspondence]) -> None:
+        self.__set_store(node1_id, node2_id, CorrespondenceStore(correspondences))
+
+    def set_correspondence_array(self, node1_id: NodeId, node2_id: NodeId, array) -> None:
+        """Like set_correspondences, but takes an Nx4 array of (x1, y1, x2, y2) rows."""
+        store = CorrespondenceStore()
+        store.extend_array(array)
+        self.__set_store(node1_id, node2_id, store)
+
+    def add_correspondence_array(self, node1_id: NodeId, node2_id: NodeId, array) -> None:
+        """Like add_correspondence for each row of an Nx4 array of (x1, y1, x2, y2) rows."""
         self.add_edge(node1_id, node2_id)
-        self.__graph[node1_id][node2_id]['correspondences'] = set(correspondences)
+        edge = self.__edge(node1_id, node2_id)
+        array = np.asarray(array, dtype=np.float32).reshape(-1, 4)
+        edge.correspondences.extend_array(array[:, [2, 3, 0, 1]] if edge.src != node1_id else array)
+        self.__touch(edge)
 
     def remove_correspondences(self, node1_id: NodeId, node2_id: NodeId) -> None:
-        self.set_correspondences(set())
+        self.set_correspondences(node1_id, node2_id, ())
 
     def add_correspondence(self, node1_id: NodeId, node2_id: NodeId, correspondence: Correspondence) -> None:
         self.add_edge(node1_id, node2_id)
-        self.__graph[node1_id][node2_id]['correspondences'].add(correspondence)
+        edge = self.__edge(node1_id, node2_id)
+        if edge.src != node1_id:
+            correspondence = Correspondence(correspondence[1], correspondence[0])
+        edge.correspondences.add(correspondence)
+        self.__touch(edge)
 
     def remove_correspondence(self, node1_id: NodeId, node2_id: NodeId, correspondence: Correspondence) -> None:
-        if self.__graph.has_edge(node1_id, node2_id):
-            self.__graph[node1_id][node2_id]['correspondences'].remove(correspondence)
-
-            if not self.__graph.has_edge(node1_id, node2_id):
-                self.__graph.remove_edge(node1_id, node2_id)
+        edge = self.__get_edge(node1_id, node2_id)
+        if edge is not None:
+            if edge.src != node1_id:
+                correspondence = Correspondence(correspondence[1], correspondence[0])
+            edge.correspondences.remove(correspondence)
+            self.__touch(edge)
 
     def get_nodes(self) -> Set[Node]:
-        return set([self.__graph.node[node_id]['node'] for node_id in self.__graph.nodes()])
+        return set(record.node for record in self.__nodes.values())
+
+    def iter_nodes(self) -> Iterator[Node]:
+        """Iterates over the nodes, in the order they were added, without copying them to a set like get_nodes."""
+        return (record.node for record in self.__nodes.values())
 
-    def get_correspondences(self, node1_id: NodeId, node2_id: NodeId) -> Set[Correspondence]:
-        if not self.__graph.has_edge(node1_id, node2_id):
+    def get_edges(self) -> Iterator[Tuple[NodeId, NodeId]]:
+        """Iterates over the edges; each edge is oriented like its correspondences (point1 lies in the first node)."""
+        return ((edge.src, edge.dest) for edge in self.__edges.values())
+
+    def get_correspondences(self, node1_id: NodeId, node2_id: NodeId) -> AbstractSet:
+        edge = self.__get_edge(node1_id, node2_id)
+        if edge is None:
             return set()
-        else:
-            return self.__graph[node1_id][node2_id]['correspondences']
+        return CorrespondenceView(edge.correspondences, edge.src != node1_id)
+
+    def get_correspondence_array(self, node1_id: NodeId, node2_id: NodeId) -> np.ndarray:
+        """Returns the correspondences between two nodes as a read-only Nx4 float32 array of (x1, y1, x2, y2) rows."""
+        edge = self.__get_edge(node1_id, node2_id)
+        if edge is None:
+            return np.empty((0, 4), dtype=np.float32)
+        return CorrespondenceView(edge.correspondences, edge.src != node1_id).array
+
+    def map_point(self, node1_id: NodeId, node2_id: NodeId, point: Point) -> Tuple[Optional[Point], float]:
+        """
+        Returns the point of node2_id corresponding to the given point of node1_id (in relative coordinates), and a
+        confidence between 0 and 1; see GraphQuery.map_point. If there is no answer, returns (None, 0.0).
+        """
+        if self.__query is None:
+            # Imported here, since arclimb.core.correspondence depends on this module
+            from arclimb.core.graph.query import GraphQuery
+            self.__query = GraphQuery(self)
+        return self.__query.map_point(node1_id, node2_id, point)
 
     def to_dict(self) -> Dict[str, Any]:
-        nodes = self.get_nodes()
-        edges = self.__graph.edges(data=True)
+        nodes = self.iter_nodes()
 
         return {
             'nodes': [node.to_dict() for node in nodes],
             'edges': [{
                 'src': src,
                 'dest': dest,
-                'correspondences': [corr.to_dict() for corr in attr['correspondences']]
-            } for src, dest, attr in edges],
+                'correspondences': [{
+                    'point1': {'x': x1, 'y': y1},
+                    'point2': {'x': x2, 'y': y2},
+                } for x1, y1, x2, y2 in self.get_correspondence_array(src, dest).tolist()]
+            } for src, dest in self.get_edges()],
         }
 
     @staticmethod
@@ -224,9 +568,10 @@ class Graph(object):
             g.add_node(node)
 
         for edge_dict in graph_dict['edges']:
-            src = edge_dict['src']
-            dest = edge_dict['dest']
+            rows = []
             for corr_dict in edge_dict['correspondences']:
-                g.add_correspondence(src, dest, Correspondence.from_dict(corr_dict))
+                point1, point2 = corr_dict['point1'], corr_dict['point2']
+                rows.append((point1['x'], point1['y'], point2['x'], point2['y']))
+            g.add_correspondence_array(edge_dict['src'], edge_dict['dest'], rows)
 
         return g
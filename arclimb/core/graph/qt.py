@@ -0,0 +1,19 @@
+"""
+Conversions between the Points of arclimb.core.graph and PyQt5 types, for the annotator. The rest of arclimb.core does
+not depend on Qt, so that it can be used (e.g. by batch workers) without a Qt installation; this module requires PyQt5.
+"""
+from PyQt5.QtCore import QPointF, QRectF
+
+from arclimb.core.graph.graph import Point
+
+
+def as_qpointf(point: Point) -> QPointF:
+    return QPointF(point.x, point.y)
+
+
+def from_qpointf(p: QPointF) -> Point:
+    return Point.fromQPointF(p)
+
+
+def in_rect(point: Point, rect: QRectF) -> bool:
+    return rect.contains(as_qpointf(point))
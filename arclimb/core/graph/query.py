@@ -0,0 +1,141 @@
+import heapq
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.pointmap import HomographicPointMap
+from arclimb.core.graph.graph import Graph, NodeId, Point
+
+# Note: this module is not imported by arclimb.core.graph, since arclimb.core.correspondence depends on it.
+
+PathMapping = NamedTuple('PathMapping', [('path', Tuple[NodeId, ...]), ('point', Point), ('confidence', float)])
+
+
+class GraphQuery(object):
+    """
+    Answers queries of the form "where in node2 is the point (x, y) of node1?" by composing the homographies fitted on
+    the edges along the best paths between the two nodes.
+
+    The quality of an edge is the fraction of its correspondences that agree with its homography (up to
+    INLIER_THRESHOLD, in relative coordinates), reduced if there are fewer than FULL_CONFIDENCE_INLIERS of them; the
+    confidence of a path is the product of the qualities of its edges.
+    Homographies of edges and paths are cached, and recomputed when the correspondences of an edge change.
+    """
+
+    INLIER_THRESHOLD = 0.01
+    FULL_CONFIDENCE_INLIERS = 20
+
+    def __init__(self, graph: Graph, max_paths: int = 3, max_path_length: int = 4, max_expansions: int = 10000):
+        self.graph = graph
+        self.max_paths = max_paths
+        self.max_path_length = max_path_length
+        self.max_expansions = max_expansions
+
+        # (node1_id, node2_id) -> (edge revision, homography or None, quality)
+        self._edge_cache = {}  # type: Dict[Tuple[NodeId, NodeId], Tuple[int, Optional[np.ndarray], float]]
+        # path -> (edge revisions, homography, confidence)
+        self._path_cache = {}  # type: Dict[Tuple[NodeId, ...], Tuple[Tuple[int, ...], np.ndarray, float]]
+        # (node1_id, node2_id) -> (graph revision, best paths)
+        self._paths_cache = {}  # type: Dict[Tuple[NodeId, NodeId], Tuple[int, List[Tuple[NodeId, ...]]]]
+
+    def get_edge_transform(self, node1_id: NodeId, node2_id: NodeId) -> Tuple[Optional[np.ndarray], float]:
+        """Returns the homography mapping points of node1_id to node2_id, and the quality of the edge."""
+        revision = self.graph.get_edge_revision(node1_id, node2_id)
+        cached = self._edge_cache.get((node1_id, node2_id))
+        if cached is not None and cached[0] == revision:
+            return cached[1], cached[2]
+
+        M, quality = None, 0.0
+        correspondences = list(self.graph.get_correspondences(node1_id, node2_id))
+        try:
+            pointmap = HomographicPointMap(correspondences, GraphQuery.INLIER_THRESHOLD)
+        except ValueError:
+            pointmap = None
+
+        if pointmap is not None:
+            M = pointmap.getPerspectiveTransformation()
+            estimate = pointmap.getEstimate()
+            n_inliers = np.count_nonzero(estimate.inliers)
+            quality = estimate.inlier_ratio * min(1.0, n_inliers / GraphQuery.FULL_CONFIDENCE_INLIERS)
+
+        self._edge_cache[(node1_id, node2_id)] = revision, M, quality
+        if M is not None:
+            # The reverse direction comes for free
+            self._edge_cache[(node2_id, node1_id)] = revision, np.linalg.inv(M), quality
+        return M, quality
+
+    def find_paths(self, node1_id: NodeId, node2_id: NodeId) -> List[Tuple[NodeId, ...]]:
+        """Returns up to max_paths simple paths from node1_id to node2_id, by decreasing confidence."""
+        key = (node1_id, node2_id)
+        revision = self.graph.get_revision()
+        cached = self._paths_cache.get(key)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+
+        # Best-first search; the cost of a path is -log(confidence), so complete paths are found by decreasing confidence
+        paths = []
+        heap = [(0.0, (node1_id,))]
+        expansions = 0
+        while heap and len(paths) < self.max_paths and expansions < self.max_expansions:
+            cost, path = heapq.heappop(heap)
+            last = path[-1]
+            if last == node2_id:
+                paths.append(path)
+                continue
+
+            expansions += 1
+            if len(path) > self.max_path_length:
+                continue
+            for neighbour in self.graph.get_neighbours(last):
+                if neighbour in path:
+                    continue
+                M, quality = self.get_edge_transform(last, neighbour)
+                if M is not None and quality > 0:
+                    heapq.heappush(heap, (cost - math.log(quality), path + (neighbour,)))
+
+        self._paths_cache[key] = revision, paths
+        return paths
+
+    def get_path_transform(self, path: Tuple[NodeId, ...]) -> Tuple[np.ndarray, float]:
+        """Returns the composition of the homographies along the path, and the confidence of the path."""
+        revisions = tuple(self.graph.get_edge_revision(a, b) for a, b in zip(path, path[1:]))
+        cached = self._path_cache.get(path)
+        if cached is not None and cached[0] == revisions:
+            return cached[1], cached[2]
+
+        M_path, confidence = np.eye(3), 1.0
+        for a, b in zip(path, path[1:]):
+            M, quality = self.get_edge_transform(a, b)
+            M_path = M.dot(M_path)
+            confidence *= quality
+
+        self._path_cache[path] = revisions, M_path, confidence
+        return M_path, confidence
+
+    def map_point_paths(self, node1_id: NodeId, node2_id: NodeId, point: Point) -> List[PathMapping]:
+        """Maps the point along each of the best paths from node1_id to node2_id."""
+        if node1_id == node2_id:
+            return [PathMapping((node1_id,), Point(point), 1.0)]
+
+        result = []
+        for path in self.find_paths(node1_id, node2_id):
+            M, confidence = self.get_path_transform(path)
+            x, y = cv2.perspectiveTransform(np.array([[[point[0], point[1]]]], dtype=np.float64), M).ravel()
+            result.append(PathMapping(path, Point(float(x), float(y)), confidence))
+        return result
+
+    def map_point(self, node1_id: NodeId, node2_id: NodeId, point: Point) -> Tuple[Optional[Point], float]:
+        """
+        Returns the average of the answers along the best paths, weighted by their confidence, together with the
+        confidence of the best path. If the nodes are not connected, returns (None, 0.0).
+        """
+        mappings = self.map_point_paths(node1_id, node2_id, point)
+        total = sum(m.confidence for m in mappings)
+        if total == 0:
+            return None, 0.0
+
+        x = sum(m.point.x * m.confidence for m in mappings) / total
+        y = sum(m.point.y * m.confidence for m in mappings) / total
+        return Point(x, y), max(m.confidence for m in mappings)
@@ -0,0 +1,5 @@
+from arclimb.core.utils.lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    '.retrieval': ['RetrievalIndex', 'train_binary_vocabulary'],
+})
@@ -0,0 +1,168 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from scipy import sparse
+
+from arclimb.core.correspondence.featurestore import FeatureStore, get_default_feature_store
+from arclimb.core.graph import Graph, NodeId
+from arclimb.core.utils.image import load_matching_image
+
+
+def train_binary_vocabulary(descriptors: np.ndarray, size: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Clusters packed binary descriptors (e.g. ORB) with k-majority, the binary counterpart of k-means: each descriptor is
+    assigned to the closest center in Hamming distance, and each bit of a center is set to the majority of its cluster.
+    Returns an array with (at most) size packed centers, the visual words.
+    """
+    descriptors = np.ascontiguousarray(descriptors, dtype=np.uint8)
+    n = len(descriptors)
+    size = min(size, n)
+
+    rnd = np.random.RandomState(seed)
+    centers = descriptors[rnd.choice(n, size, replace=False)]
+    # One byte per bit; the sums of the majority vote are only computed per cluster, in int32
+    bits = np.unpackbits(descriptors, axis=1)
+    matcher = cv2.BFMatcher(normType=cv2.NORM_HAMMING)
+
+    for _ in range(iterations):
+        labels = np.array([m.trainIdx for m in matcher.match(descriptors, centers)])
+
+        # Indices of the descriptors of each cluster, as consecutive runs of order
+        order = np.argsort(labels, kind='stable')
+        clusters, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+
+        # Empty clusters keep their previous center
+        new_centers = centers.copy()
+        for cluster, start, count in zip(clusters, starts, counts):
+            sums = bits[order[start:start + count]].sum(axis=0, dtype=np.int32)
+            new_centers[cluster] = np.packbits(2 * sums > count)
+        if np.array_equal(new_centers, centers):
+            break
+        centers = new_centers
+
+    return centers
+
+
+class RetrievalIndex(object):
+    """
+    Bag-of-visual-words index over the ORB descriptors of a set of images (typically the nodes of a Graph), used to
+    find quickly the few images that are most likely to match a new photo, before running a full matcher on them.
+
+    Images are scored by the cosine similarity of their tf-idf weighted histograms of visual words. Images can be added
+    at any time; the vocabulary is trained on the descriptors of the first images if it is not given, as soon as
+    min_training_images are added (or at the first query).
+    """
+
+    def __init__(self, vocabulary: Optional[np.ndarray] = None, vocabulary_size: int = 1000, nfeatures: int = 1000,
+                 min_training_images: int = 10, feature_store: Optional[FeatureStore] = None):
+        self.vocabulary = vocabulary
+        self.vocabulary_size = vocabulary_size
+        self.min_training_images = min_training_images
+        self.feature_store = feature_store
+
+        self._orb = cv2.ORB_create(nfeatures=nfeatures)
+        self._bf = cv2.BFMatcher(normType=cv2.NORM_HAMMING)
+
+        self._pending = {}  # type: Dict[NodeId, np.ndarray]
+        self._node_ids = []  # type: List[NodeId]
+        self._rows = {}  # type: Dict[NodeId, np.ndarray]
+        self._matrix = None  # type: Optional[Tuple[sparse.csr_matrix, np.ndarray, np.ndarray]]
+
+    def __len__(self):
+        return len(self._rows) + len(self._pending)
+
+    def __contains__(self, node_id: NodeId) -> bool:
+        return node_id in self._rows or node_id in self._pending
+
+    def _descriptors(self, image) -> np.ndarray:
+        store = self.feature_store if self.feature_store is not None else get_default_feature_store()
+        _, des = store.detect_and_compute(self._orb, image)
+        return des if des is not None else np.empty((0, 32), np.uint8)
+
+    def _histogram(self, descriptors: np.ndarray) -> np.ndarray:
+        """Returns the normalized histogram of the visual words of the descriptors."""
+        histogram = np.zeros(len(self.vocabulary))
+        if len(descriptors) > 0:
+            words = [m.trainIdx for m in self._bf.match(descriptors, self.vocabulary)]
+            histogram += np.bincount(words, minlength=len(self.vocabulary))
+            histogram /= len(descriptors)
+        return histogram
+
+    def train(self, max_descriptors: int = 100000, seed: int = 0) -> None:
+        """Trains the vocabulary on the descriptors of the images added so far, and indexes them."""
+        descriptors = np.concatenate([des for des in self._pending.values()] + [np.empty((0, 32), np.uint8)])
+        if len(descriptors) == 0:
+            return
+        if len(descriptors) > max_descriptors:
+            descriptors = descriptors[np.random.RandomState(seed).choice(len(descriptors), max_descriptors, False)]
+
+        self.vocabulary = train_binary_vocabulary(descriptors, self.vocabulary_size, seed=seed)
+
+        pending, self._pending = self._pending, {}
+        for node_id, des in pending.items():
+            self._add_descriptors(node_id, des)
+
+    def _add_descriptors(self, node_id: NodeId, descriptors: np.ndarray) -> None:
+        if self.vocabulary is None:
+            self._pending[node_id] = descriptors
+            if len(self._pending) >= self.min_training_images:
+                self.train()
+            return
+
+        if node_id not in self._rows:
+            self._node_ids.append(node_id)
+        self._rows[node_id] = self._histogram(descriptors)
+        self._matrix = None
+
+    def add(self, node_id: NodeId, image) -> None:
+        """Adds an image (grayscale, as given to the Matchers) to the index, or replaces it."""
+        self._add_descriptors(node_id, self._descriptors(image))
+
+    def remove(self, node_id: NodeId) -> None:
+        self._pending.pop(node_id, None)
+        if self._rows.pop(node_id, None) is not None:
+            self._node_ids.remove(node_id)
+            self._matrix = None
+
+    def update_from_graph(self, graph: Graph, load_image: Callable[[str], np.ndarray] = load_matching_image) -> int:
+        """Adds the nodes of the graph that are not indexed yet (node ids are paths of images); returns how many."""
+        added = 0
+        for node in graph.iter_nodes():
+            if node.id not in self:
+                self.add(node.id, load_image(node.id))
+                added += 1
+        return added
+
+    def _get_matrix(self) -> Tuple[sparse.csr_matrix, np.ndarray, np.ndarray]:
+        """Returns the tf-idf matrix of the indexed images, the norms of its rows and the idf of each word."""
+        if self._matrix is None:
+            rows = [self._rows[node_id] for node_id in self._node_ids]
+            tf = sparse.csr_matrix(np.array(rows).reshape(-1, len(self.vocabulary)))
+
+            # Inverse document frequency of each word, with the current set of images
+            n_docs = tf.shape[0]
+            df = np.bincount(tf.indices, minlength=tf.shape[1])
+            idf = np.log(1 + n_docs / np.maximum(df, 1))
+
+            weighted = tf.multiply(idf).tocsr()
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            self._matrix = weighted, norms, idf
+        return self._matrix
+
+    def query(self, image, k: int = 5) -> List[Tuple[NodeId, float]]:
+        """Returns the k indexed images most similar to image, as (node_id, score) pairs by decreasing score."""
+        if self.vocabulary is None:
+            self.train()
+        if len(self._rows) == 0:
+            return []
+
+        weighted, norms, idf = self._get_matrix()
+        q = self._histogram(self._descriptors(image)) * idf
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return []
+
+        scores = weighted.dot(q) / (np.maximum(norms, 1e-12) * q_norm)
+        best = np.argsort(-scores, kind='stable')[:k]
+        return [(self._node_ids[i], float(scores[i])) for i in best]
@@ -1 +1,5 @@
-from .image import scale_down_image
\ No newline at end of file
+from .lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    '.image': ['scale_down_image'],
+})
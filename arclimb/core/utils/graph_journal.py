@@ -0,0 +1,219 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from arclimb.core import Graph, Node, NodeId
+from arclimb.core.utils import graph_serialization
+
+# Signature of a graph file: (size, modification time in ns), or None if the file does not exist
+FileSignature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _rows(array) -> list:
+    return np.asarray(array, dtype=np.float32).reshape(-1, 4).tolist()
+
+
+class GraphJournal(object):
+    """
+    Append-only journal of the changes made to a graph since it was last saved to graph_filename, kept in
+    graph_filename + '.journal' as one JSON object per line. Each change costs a write proportional to its size, instead
+    of rewriting the whole graph file.
+
+    The first line records the signature of the graph file the journal applies to, so that a journal left behind by a
+    crash is replayed only on top of the same file (see replay). compact replaces the changes with a snapshot of the
+    whole graph, so that the journal stops growing; the graph file itself is only written by an explicit save. A journal that does not apply to the file is not deleted, but renamed to stale_path.
+    """
+
+    def __init__(self, graph_filename: str, compact_every: int = 200, max_bytes: int = 64 * 2 ** 20,
+                 sync: bool = True):
+        self.graph_filename = graph_filename
+        self.path = graph_filename + '.journal'
+        self.compact_every = compact_every
+        self.max_bytes = max_bytes
+        self.sync = sync
+
+        self._file = None
+        self._entries = 0
+        # Size of the header and of the snapshot written by compact, which don't count towards max_bytes
+        self._base_bytes = 0
+        # Where replay moved a journal written on top of another version of the graph file, if it did
+        self.stale_path = None  # type: Optional[str]
+
+    def __len__(self):
+        """Number of changes in the journal."""
+        return self._entries
+
+    def _header(self) -> Dict[str, Any]:
+        return {'op': 'base', 'signature': file_signature(self.graph_filename)}
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, 'a')
+            if self._file.tell() == 0:
+                self._file.write(json.dumps(self._header()) + '\n')
+
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self._entries += 1
+
+    # ----- changes -----
+    def add_node(self, node: Node) -> None:
+        self._append({'op': 'add_node', 'node': node.to_dict()})
+
+    def remove_node(self, node_id: NodeId) -> None:
+        self._append({'op': 'remove_node', 'id': node_id})
+
+    def remove_edge(self, node1_id: NodeId, node2_id: NodeId) -> None:
+        self._append({'op': 'remove_edge', 'src': node1_id, 'dest': node2_id})
+
+    def set_correspondences(self, node1_id: NodeId, node2_id: NodeId, array) -> None:
+        """Records that the correspondences of the edge were replaced by the rows of an Nx4 array."""
+        self._append({'op': 'set_correspondences', 'src': node1_id, 'dest': node2_id, 'rows': _rows(array)})
+
+    def add_correspondences(self, node1_id: NodeId, node2_id: NodeId, array) -> None:
+        self._append({'op': 'add_correspondences', 'src': node1_id, 'dest': node2_id, 'rows': _rows(array)})
+
+    def remove_correspondences(self, node1_id: NodeId, node2_id: NodeId, array) -> None:
+        self._append({'op': 'remove_correspondences', 'src': node1_id, 'dest': node2_id, 'rows': _rows(array)})
+
+    # ----- replay and compaction -----
+    @staticmethod
+    def _apply(graph: Graph, entry: Dict[str, Any]) -> None:
+        op = entry['op']
+        if op == 'add_node':
+            graph.add_node(Node(**entry['node']))
+        elif op == 'remove_node':
+            if graph.has_node(entry['id']):
+                graph.remove_node(entry['id'])
+        elif op == 'remove_edge':
+            if graph.has_edge(entry['src'], entry['dest']):
+                graph.remove_edge(entry['src'], entry['dest'])
+        elif op == 'set_correspondences':
+            graph.set_correspondence_array(entry['src'], entry['dest'], entry['rows'])
+        elif op == 'add_correspondences':
+            graph.add_correspondence_array(entry['src'], entry['dest'], entry['rows'])
+        elif op == 'remove_correspondences':
+            src, dest = entry['src'], entry['dest']
+            if graph.has_edge(src, dest):
+                array = graph.get_correspondence_array(src, dest)
+                removed = set(map(tuple, np.asarray(entry['rows'], dtype=np.float32).reshape(-1, 4).tolist()))
+                graph.set_correspondence_array(src, dest, [row for row in array.tolist() if tuple(row) not in removed])
+        elif op == 'snapshot':
+            for node_id in [node.id for node in graph.iter_nodes()]:
+                graph.remove_node(node_id)
+            snapshot = Graph.from_dict(entry['graph'])
+            for node in snapshot.iter_nodes():
+                graph.add_node(node)
+            for src, dest in snapshot.get_edges():
+                graph.set_correspondence_array(src, dest, snapshot.get_correspondence_array(src, dest))
+        else:
+            raise ValueError("Unknown journal operation %r" % op)
+
+    def replay(self, graph: Graph) -> int:
+        """
+        Applies the changes in the journal to graph, which must have been loaded from graph_filename; returns how many
+        were applied (a snapshot written by compact counts as one). A last line that was only partially written is discarded. A journal written on top of a different
+        version of the file (e.g. touched, or saved by another program) is not applied: it is renamed to
+        <journal>.stale-<time>, recorded in stale_path, so that its changes are not lost.
+        """
+        self.close()
+        self._entries = 0
+        self._base_bytes = 0
+        self.stale_path = None
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Only the last line can be truncated by a crash
+                break
+
+        if len(entries) <= 1:
+            # Nothing to apply
+            self.clear()
+            return 0
+
+        if entries[0] != json.loads(json.dumps(self._header())):
+            self.stale_path = self._move_aside()
+            return 0
+
+        self._base_bytes = len(lines[0].encode())
+        for line, entry in zip(lines[1:], entries[1:]):
+            self._apply(graph, entry)
+            if entry['op'] == 'snapshot':
+                self._entries = 0
+                self._base_bytes += len(line.encode())
+            else:
+                self._entries += 1
+
+        if len(entries) < len(lines):
+            # Rewrite the journal without the truncated line, so that new entries start on a line of their own
+            with open(self.path, 'w') as f:
+                f.writelines(lines[:len(entries)])
+        return len(entries) - 1
+
+    def _move_aside(self) -> str:
+        base = "%s.stale-%s" % (self.path, time.strftime('%Y%m%d-%H%M%S'))
+        stale_path, n = base, 1
+        while os.path.exists(stale_path):
+            n += 1
+            stale_path = "%s-%d" % (base, n)
+        os.replace(self.path, stale_path)
+        return stale_path
+
+    def needs_compaction(self) -> bool:
+        if self._entries >= self.compact_every:
+            return True
+        return self._file is not None and self._file.tell() - self._base_bytes >= self.max_bytes
+
+    def compact(self, graph: Graph) -> None:
+        """
+        Replaces the changes in the journal with a snapshot of graph, which must be the graph loaded from graph_filename
+        with the changes applied. graph_filename is left alone; the journal is replaced atomically.
+        """
+        self.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(self._header()) + '\n')
+            f.write('{"op": "snapshot", "graph": ')
+            graph_serialization.write_json(graph, f)
+            f.write('}\n')
+            self._base_bytes = f.tell()
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._entries = 0
+
+    def clear(self) -> None:
+        """Deletes the journal, e.g. after the graph was saved."""
+        self.close()
+        self._entries = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,14 +1,221 @@
 import json
+import math
+import os
+import re
+from typing import Any, Iterator, TextIO
+
 from arclimb.core import Graph, Node, Correspondence
 
+# Number of correspondences that are read or written at once
+BATCH_SIZE = 65536
+
+_CORRESPONDENCE_FORMAT = '{"point1": {"x": %r, "y": %r}, "point2": {"x": %r, "y": %r}}'
+
+# Matches the correspondences written by write_json, so that they can be read without a full JSON decode
+_NUMBER = r'\s*(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*'
+_POINT = r'\s*\{\s*"x"\s*:%s,\s*"y"\s*:%s\}\s*' % (_NUMBER, _NUMBER)
+_CORRESPONDENCE = r'\{\s*"point1"\s*:%s,\s*"point2"\s*:%s\}' % (_POINT, _POINT)
+_CORRESPONDENCE_PATTERN = re.compile(r'\s*' + _CORRESPONDENCE)
+_NEXT_CORRESPONDENCE_PATTERN = re.compile(r'\s*,\s*' + _CORRESPONDENCE)
+
+
+class _JSONStreamReader(object):
+    """
+    Minimal pull parser for JSON files, that reads the file in chunks and only decodes one value at a time.
+    Arrays and objects can be consumed incrementally with iter_array and iter_object; any other value is decoded
+    with json.JSONDecoder.raw_decode.
+    """
+
+    CHUNK_SIZE = 1 << 20
+
+    _whitespace = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, file: TextIO):
+        self._file = file
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    # Reads one more chunk, dropping the part of the buffer that was already consumed; returns False at end of file
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        chunk = self._file.read(_JSONStreamReader.CHUNK_SIZE)
+        if chunk == '':
+            self._eof = True
+            return False
+
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or '' at the end of the file."""
+        while True:
+            self._pos = self._whitespace.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError("Invalid JSON: expected %r at offset %d of the buffer" % (char, self._pos))
+        self._pos += 1
+
+    def match_all(self, pattern, max_length: int = 256) -> list:
+        """
+        Consumes the consecutive matches of the compiled regex pattern from the current position, and returns their
+        groups. Matches must be at most max_length characters long and must not end with a quantified expression,
+        since the end of the buffer is not taken into account.
+        """
+        groups = []
+        buf, pos = self._buf, self._pos
+        while True:
+            match = pattern.match(buf, pos)
+            if match is not None:
+                groups.append(match.groups())
+                pos = match.end()
+                continue
+
+            self._pos = pos
+            if len(buf) - pos >= max_length or not self._fill():
+                return groups
+            buf, pos = self._buf, self._pos
+
+    def value(self) -> Any:
+        """Decodes the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # The value may be truncated at the end of the buffer
+                if self._fill():
+                    continue
+                raise
+
+            # A number at the end of the buffer might continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _iter_container(self, open_char: str, close_char: str) -> Iterator[None]:
+        self.expect(open_char)
+        if self.peek() == close_char:
+            self._pos += 1
+            return
+
+        while True:
+            yield
+            char = self.peek()
+            self._pos += 1
+            if char == close_char:
+                return
+            elif char != ',':
+                raise ValueError("Invalid JSON: expected ',' or %r, found %r" % (close_char, char))
+
+    def iter_array(self) -> Iterator[None]:
+        """Iterates over the elements of an array; the caller must consume each element before asking for the next."""
+        return self._iter_container('[', ']')
+
+    def iter_object(self) -> Iterator[str]:
+        """Iterates over the keys of an object; the caller must consume each value before asking for the next key."""
+        for _ in self._iter_container('{', '}'):
+            key = self.value()
+            self.expect(':')
+            yield key
+
+
+def _read_edge(reader: _JSONStreamReader, graph: Graph) -> None:
+    src = dest = None
+    rows = []
+    for key in reader.iter_object():
+        if key == 'src':
+            src = reader.value()
+        elif key == 'dest':
+            dest = reader.value()
+        elif key == 'correspondences':
+            for _ in reader.iter_array():
+                # Fast path for the usual layout: the element and the ones after it are matched with a regex, and
+                # the numbers are only parsed by numpy
+                matched = reader.match_all(_CORRESPONDENCE_PATTERN)
+                if len(matched) > 0:
+                    rows.extend(matched)
+                    rows.extend(reader.match_all(_NEXT_CORRESPONDENCE_PATTERN))
+                else:
+                    corr_dict = reader.value()
+                    point1, point2 = corr_dict['point1'], corr_dict['point2']
+                    rows.append((point1['x'], point1['y'], point2['x'], point2['y']))
+
+                # Correspondences are only kept in memory until a batch is full, if the endpoints are already known
+                if len(rows) >= BATCH_SIZE and src is not None and dest is not None:
+                    graph.add_correspondence_array(src, dest, rows)
+                    rows = []
+        else:
+            reader.value()
+
+    graph.add_correspondence_array(src, dest, rows)
+
 
 def from_json(graph_fn: str) -> Graph:
+    """Loads a graph, reading the file incrementally so that the whole JSON tree is never in memory at once."""
+    graph = Graph()
+
     with open(graph_fn, 'r') as graph_file:
-        graph_dict = json.load(graph_file)
+        reader = _JSONStreamReader(graph_file)
+        for key in reader.iter_object():
+            if key == 'nodes':
+                for _ in reader.iter_array():
+                    graph.add_node(Node(**reader.value()))
+            elif key == 'edges':
+                for _ in reader.iter_array():
+                    _read_edge(reader, graph)
+            else:
+                reader.value()
+
+    return graph
+
+
+def _write_correspondences(file: TextIO, rows) -> None:
+    if all(math.isfinite(v) for row in rows for v in row):
+        file.write(', '.join(_CORRESPONDENCE_FORMAT % tuple(row) for row in rows))
+    else:
+        # Let json deal with NaN and infinity
+        file.write(', '.join(json.dumps({'point1': {'x': x1, 'y': y1}, 'point2': {'x': x2, 'y': y2}})
+                             for x1, y1, x2, y2 in rows))
+
+
+def write_json(graph: Graph, file: TextIO) -> None:
+    """Writes a graph with the same schema as json.dump(graph.to_dict()), one node or batch of correspondences at a time."""
+    file.write('{"nodes": [')
+    for i, node in enumerate(graph.iter_nodes()):
+        if i > 0:
+            file.write(', ')
+        json.dump(node.to_dict(), file)
+
+    file.write('], "edges": [')
+    for i, (src, dest) in enumerate(graph.get_edges()):
+        if i > 0:
+            file.write(', ')
+        file.write('{"src": %s, "dest": %s, "correspondences": [' % (json.dumps(src), json.dumps(dest)))
 
-    return Graph.from_dict(graph_dict)
+        array = graph.get_correspondence_array(src, dest)
+        for start in range(0, len(array), BATCH_SIZE):
+            if start > 0:
+                file.write(', ')
+            _write_correspondences(file, array[start:start + BATCH_SIZE].tolist())
+        file.write(']}')
+    file.write(']}')
 
 
 def to_json(graph: Graph, filename: str) -> None:
-    with open(filename, 'w') as file:
-        json.dump(graph.to_dict(), file)
+    """Saves a graph; the file is replaced atomically, so it is never left half-written."""
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as file:
+        write_json(graph, file)
+    os.replace(tmp_filename, filename)
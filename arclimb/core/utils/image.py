@@ -1,11 +1,24 @@
+from typing import Optional
+
 import cv2
 
 DEFAULT_MAX_PIXELS = 1000
 
 
 # Scale down an image so that each dimension is at most max_pixels (default to 1000), while preserving the aspect ratio.
-def scale_down_image(image, max_pixels: int = DEFAULT_MAX_PIXELS):
+# If max_pixels is None, the image is returned at full resolution.
+def scale_down_image(image, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS):
+    if max_pixels is None:
+        return image
     h, w, *_ = image.shape
-    scale = min(1.0, float(DEFAULT_MAX_PIXELS) / w, float(max_pixels) / h)
+    scale = min(1.0, float(max_pixels) / w, float(max_pixels) / h)
     result = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
     return result
+
+
+# Load an image from file, scaled down and converted to grayscale as expected by the Matchers.
+def load_matching_image(path: str, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS):
+    image = cv2.imread(path)
+    if image is None:
+        raise IOError("Could not read image %s" % path)
+    return cv2.cvtColor(scale_down_image(image, max_pixels), cv2.COLOR_BGR2GRAY)
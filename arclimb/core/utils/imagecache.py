@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from arclimb.core.utils.image import DEFAULT_MAX_PIXELS, scale_down_image
+
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class ImageCache(object):
+    """
+    LRU cache of images decoded from files, and of the variants computed from them (scaled down, grayscale, ...), with
+    a budget of max_bytes for the arrays it holds. The least recently used entries are evicted when the budget is
+    exceeded; entries larger than the whole budget are returned but not kept.
+
+    Entries are keyed by path and variant, and are dropped when the modification time or the size of the file change.
+    Cached arrays are shared, so they are returned read-only.
+
+    If cache_dir is given, the images used for matching (see get_matching_image) are also saved there as .npy files, so
+    that they survive the process; in that case max_bytes can be 0 to only keep them on disk.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+
+        self._entries = OrderedDict()  # type: OrderedDict[Tuple[str, Hashable], Tuple[Tuple[int, int], Any, int]]
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the cached arrays."""
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path: str, variant: Hashable, compute: Callable[[], Any], nbytes: Optional[int] = None):
+        """
+        Returns the given variant of the image at path, calling compute() to build it if it is not cached.
+        The size of the value is taken from its nbytes attribute (summed over tuples), unless nbytes is given.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (path, variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                self._drop_path(path)
+
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        size = _nbytes(value) if nbytes is None else nbytes
+
+        with self._lock:
+            if size <= self.max_bytes:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._nbytes -= old[2]
+                self._entries[key] = signature, value, size
+                self._nbytes += size
+                self._evict()
+        return value
+
+    def get_image(self, path: str) -> np.ndarray:
+        """Returns the image at path as decoded by cv2.imread (BGR); raises IOError if it can't be read."""
+        def compute():
+            image = cv2.imread(path)
+            if image is None:
+                raise IOError("Could not read image %s" % path)
+            return image
+        return self.get(path, 'image', compute)
+
+    def get_scaled_image(self, path: str, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS) -> np.ndarray:
+        """Returns the image at path scaled down with scale_down_image."""
+        return self.get(path, ('scaled', max_pixels), lambda: scale_down_image(self.get_image(path), max_pixels))
+
+    def get_matching_image(self, path: str, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS) -> np.ndarray:
+        """Returns the image at path scaled down and converted to grayscale, as expected by the Matchers."""
+        def compute():
+            disk_path = self._disk_path(path, 'gray-%d' % max_pixels if max_pixels is not None else 'gray-full')
+            if disk_path is not None:
+                try:
+                    return np.load(disk_path)
+                except (OSError, ValueError):
+                    pass
+
+            image = cv2.cvtColor(self.get_scaled_image(path, max_pixels), cv2.COLOR_BGR2GRAY)
+            if disk_path is not None:
+                # Write to a temporary file first, so that a concurrent reader never sees a partial file
+                tmp_path = "%s.%d.tmp" % (disk_path, os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, image)
+                os.replace(tmp_path, disk_path)
+            return image
+
+        return self.get(path, ('gray', max_pixels), compute)
+
+    # Returns the file in cache_dir for a variant of the image at path, or None; the name depends on the path, the
+    # modification time and the size of the file, so entries of old versions of the file are never used.
+    def _disk_path(self, path: str, variant: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        stat = os.stat(path)
+        key = "%s|%d|%d" % (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        name = "%s.%s.npy" % (hashlib.blake2b(key.encode(), digest_size=16).hexdigest(), variant)
+        return os.path.join(self.cache_dir, name)
+
+    def invalidate(self, path: str) -> None:
+        """Drops all the entries of the image at path."""
+        with self._lock:
+            self._drop_path(os.path.abspath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _drop_path(self, path: str) -> None:
+        for key in [key for key in self._entries if key[0] == path]:
+            self._nbytes -= self._entries.pop(key)[2]
+
+    def _evict(self) -> None:
+        while self._nbytes > self.max_bytes:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._nbytes -= size
+
+
+_default_image_cache = ImageCache()
+
+
+def get_default_image_cache() -> ImageCache:
+    """Returns the process-wide ImageCache."""
+    return _default_image_cache
+
+
+def set_default_image_cache(cache: ImageCache) -> None:
+    global _default_image_cache
+    _default_image_cache = cache
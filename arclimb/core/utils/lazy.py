@@ -0,0 +1,32 @@
+import importlib
+import sys
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, Sequence[str]],
+                 submodules: Sequence[str] = ()) -> Tuple[Callable, Callable, List[str]]:
+    """
+    Lazy re-exports for the __init__ of a package (PEP 562), so that importing the package does not import the heavy
+    dependencies (OpenCV, scipy, ...) of its modules until they are used.
+
+    exports maps each module, relative to the package, to the names it exports, and submodules are the ones that can be
+    accessed as attributes of the package; a module is imported when one of its names is first accessed.
+    Returns the __getattr__, __dir__ and __all__ of the package.
+    """
+    origins = {name: module for module, names in exports.items() for name in names}
+
+    def __getattr__(name: str):
+        if name in origins:
+            value = getattr(importlib.import_module(origins[name], package), name)
+        elif name in submodules:
+            value = importlib.import_module('.' + name, package)
+        else:
+            raise AttributeError("module %r has no attribute %r" % (package, name))
+        # Later accesses don't go through __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(origins) | set(submodules))
+
+    return __getattr__, __dir__, list(origins)
@@ -0,0 +1,95 @@
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class GridIndex(object):
+    """
+    Spatial index of 2D points on a uniform grid of square cells, supporting insertions and removals at any time.
+    Queries only visit the cells that overlap the query region, so their cost depends on the number of points around
+    it, not on the total number of points. Each point gets an integer id when it is added.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = float(cell_size)
+
+        self._points = {}  # type: Dict[int, Tuple[float, float]]
+        self._cells = {}  # type: Dict[Tuple[int, int], List[int]]
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._points)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._points)
+
+    def __contains__(self, point_id: int) -> bool:
+        return point_id in self._points
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def add(self, x: float, y: float) -> int:
+        point_id = self._next_id
+        self._next_id += 1
+        self._points[point_id] = (x, y)
+        self._cells.setdefault(self._cell(x, y), []).append(point_id)
+        return point_id
+
+    def add_many(self, points: Iterable[Tuple[float, float]]) -> List[int]:
+        return [self.add(x, y) for x, y in points]
+
+    def get(self, point_id: int) -> Tuple[float, float]:
+        return self._points[point_id]
+
+    def remove(self, point_id: int) -> None:
+        """Removes a point; raises KeyError if there is no point with this id."""
+        x, y = self._points.pop(point_id)
+        cell = self._cell(x, y)
+        ids = self._cells[cell]
+        ids.remove(point_id)
+        if len(ids) == 0:
+            del self._cells[cell]
+
+    def clear(self) -> None:
+        self._points.clear()
+        self._cells.clear()
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Returns the ids of the points with x0 <= x <= x1 and y0 <= y <= y1."""
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+
+        # If the rectangle covers more cells than there are non-empty cells, scan the cells instead
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            cells = [ids for (cx, cy), ids in self._cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            cells = [self._cells[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                     if (cx, cy) in self._cells]
+
+        points = self._points
+        result = []
+        for ids in cells:
+            for point_id in ids:
+                x, y = points[point_id]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    result.append(point_id)
+        return result
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[int]:
+        """Returns the ids of the points within radius of (x, y)."""
+        r2 = radius * radius
+        points = self._points
+        return [point_id for point_id in self.query_rect(x - radius, y - radius, x + radius, y + radius)
+                if (points[point_id][0] - x) ** 2 + (points[point_id][1] - y) ** 2 <= r2]
+
+    def nearest(self, x: float, y: float, max_distance: float) -> Optional[int]:
+        """Returns the id of the point closest to (x, y) among the ones within max_distance, or None."""
+        best, best_d2 = None, max_distance * max_distance
+        for point_id in self.query_rect(x - max_distance, y - max_distance, x + max_distance, y + max_distance):
+            px, py = self._points[point_id]
+            d2 = (px - x) ** 2 + (py - y) ** 2
+            if d2 <= best_d2:
+                best, best_d2 = point_id, d2
+        return best
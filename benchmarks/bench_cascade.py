@@ -0,0 +1,62 @@
+"""
+Compares DoubleORBMatcher with a CascadeMatcher using it as its fine stage, on synthetic pairs of images that overlap
+(one is a warped copy of the other) and that don't (two unrelated textures). Pairs are timed with the features of the
+images already in the FeatureStore ("warm", as for most pairs of a graph) and with empty FeatureStores ("cold"); the
+metrics are the number of matches and, for the cascade, the stage that rejected the pair, if any. Sizes are image sizes.
+
+Usage: python -m benchmarks.bench_cascade [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+from arclimb.core.correspondence.correspondence import CascadeMatcher, DoubleORBMatcher
+from arclimb.core.correspondence.featurestore import FeatureStore
+from benchmarks.synthetic import synthetic_image_pair
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000]
+
+
+def double_matcher():
+    return DoubleORBMatcher(feature_store=FeatureStore())
+
+
+def cascade_matcher():
+    return CascadeMatcher(DoubleORBMatcher(feature_store=FeatureStore()), feature_store=FeatureStore())
+
+
+def image_pair(pair, size):
+    image1, image2, _ = synthetic_image_pair(size, seed=0)
+    if pair == 'non-overlapping':
+        image2, _, _ = synthetic_image_pair(size, seed=1)
+    return image1, image2
+
+
+def metrics(matcher, image1, image2):
+    result = {'matches': len(matcher.match(image1, image2)[0])}
+    if isinstance(matcher, CascadeMatcher):
+        result.update(('rejected_' + name, count) for name, count in matcher.stats.rejected.items())
+    return result
+
+
+def _bench_warm(factory, pair, size):
+    image1, image2 = image_pair(pair, size)
+    matcher = factory()
+    matcher.precompute(image1)
+    matcher.precompute(image2)
+    return (lambda: matcher.match(image1, image2)), metrics(factory(), image1, image2)
+
+
+def _bench_cold(factory, pair, size):
+    image1, image2 = image_pair(pair, size)
+    return (lambda: factory().match(image1, image2)), metrics(factory(), image1, image2)
+
+
+for _pair in ['overlapping', 'non-overlapping']:
+    for _label, _factory in [('double', double_matcher), ('cascade', cascade_matcher)]:
+        for _state, _setup in [('warm', _bench_warm), ('cold', _bench_cold)]:
+            benchmark('cascade.%s.%s.%s' % (_pair, _label, _state), SIZES)(
+                lambda size, setup=_setup, factory=_factory, pair=_pair: setup(factory, pair, size))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Micro-benchmarks of the core data structures: Point, Graph and graph_serialization.
+
+Usage: python -m benchmarks.bench_core [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+Sizes are numbers of points or correspondences; graphs have one edge every CORRESPONDENCES_PER_EDGE correspondences.
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from arclimb.core.graph import Graph, Node, Point, Correspondence
+from arclimb.core.utils import graph_serialization
+from benchmarks.harness import benchmark, main
+
+POINT_SIZES = [1000]
+GRAPH_SIZES = [100, 1000, 10000]
+CORRESPONDENCES_PER_EDGE = 100
+
+_tmp_dir = tempfile.mkdtemp(prefix='arclimb-bench-')
+atexit.register(shutil.rmtree, _tmp_dir, True)
+
+
+def random_coordinates(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    return [(rnd.random(), rnd.random()) for _ in range(n)]
+
+
+def random_correspondences(n: int, seed: int = 0):
+    coordinates = random_coordinates(2 * n, seed)
+    return [Correspondence(Point(*p1), Point(*p2)) for p1, p2 in zip(coordinates[::2], coordinates[1::2])]
+
+
+def synthetic_graph(n_correspondences: int, seed: int = 0) -> Graph:
+    """Returns a chain of nodes with CORRESPONDENCES_PER_EDGE random correspondences on each edge."""
+    correspondences = random_correspondences(n_correspondences, seed)
+    n_edges = max(1, n_correspondences // CORRESPONDENCES_PER_EDGE)
+
+    graph = Graph()
+    for i in range(n_edges + 1):
+        graph.add_node(Node('image%05d.jpg' % i))
+    for i, corr in enumerate(correspondences):
+        edge = i % n_edges
+        graph.add_correspondence('image%05d.jpg' % edge, 'image%05d.jpg' % (edge + 1), corr)
+    return graph
+
+
+@benchmark('point.construct.floats', POINT_SIZES)
+def bench_point_construct_floats(n):
+    coordinates = random_coordinates(n)
+    return lambda: [Point(x, y) for x, y in coordinates]
+
+
+@benchmark('point.construct.tuple', POINT_SIZES)
+def bench_point_construct_tuple(n):
+    coordinates = random_coordinates(n)
+    return lambda: [Point(p) for p in coordinates]
+
+
+@benchmark('point.construct.keywords', POINT_SIZES)
+def bench_point_construct_keywords(n):
+    coordinates = random_coordinates(n)
+    return lambda: [Point(x=x, y=y) for x, y in coordinates]
+
+
+@benchmark('point.add', POINT_SIZES)
+def bench_point_add(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    return lambda: [p + q for p, q in zip(points, reversed(points))]
+
+
+@benchmark('point.add.tuple', POINT_SIZES)
+def bench_point_add_tuple(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    tuples = random_coordinates(n, seed=1)
+    return lambda: [p + t for p, t in zip(points, tuples)]
+
+
+@benchmark('point.sub', POINT_SIZES)
+def bench_point_sub(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    return lambda: [p - q for p, q in zip(points, reversed(points))]
+
+
+@benchmark('point.mul', POINT_SIZES)
+def bench_point_mul(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    return lambda: [p * 2.5 for p in points]
+
+
+@benchmark('point.dist', POINT_SIZES)
+def bench_point_dist(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    return lambda: [p.dist(q) for p, q in zip(points, reversed(points))]
+
+
+@benchmark('point.eq', POINT_SIZES)
+def bench_point_eq(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    copies = [Point(p) for p in points]
+    return lambda: [p == q for p, q in zip(points, copies)]
+
+
+@benchmark('point.hash', POINT_SIZES)
+def bench_point_hash(n):
+    points = [Point(p) for p in random_coordinates(n)]
+    return lambda: set(points)
+
+
+@benchmark('graph.add_correspondence', GRAPH_SIZES)
+def bench_graph_add_correspondence(n):
+    correspondences = random_correspondences(n)
+    n_edges = max(1, n // CORRESPONDENCES_PER_EDGE)
+
+    def run():
+        graph = Graph()
+        for i, corr in enumerate(correspondences):
+            edge = i % n_edges
+            graph.add_correspondence('image%05d.jpg' % edge, 'image%05d.jpg' % (edge + 1), corr)
+    return run
+
+
+@benchmark('graph.set_correspondences', GRAPH_SIZES)
+def bench_graph_set_correspondences(n):
+    correspondences = random_correspondences(n)
+
+    def run():
+        graph = Graph()
+        for i in range(0, n, CORRESPONDENCES_PER_EDGE):
+            edge = i // CORRESPONDENCES_PER_EDGE
+            graph.set_correspondences('image%05d.jpg' % edge, 'image%05d.jpg' % (edge + 1),
+                                      correspondences[i:i + CORRESPONDENCES_PER_EDGE])
+    return run
+
+
+@benchmark('graph.get_correspondences', GRAPH_SIZES)
+def bench_graph_get_correspondences(n):
+    graph = synthetic_graph(n)
+    edges = list(graph.get_edges())
+    return lambda: [set(graph.get_correspondences(src, dest)) for src, dest in edges]
+
+
+@benchmark('correspondence.from_dict', POINT_SIZES)
+def bench_correspondence_from_dict(n):
+    corr_dicts = [corr.to_dict() for corr in random_correspondences(n)]
+    return lambda: [Correspondence.from_dict(d) for d in corr_dicts]
+
+
+@benchmark('graph.get_nodes', GRAPH_SIZES)
+def bench_graph_get_nodes(n):
+    graph = Graph()
+    for i in range(n):
+        graph.add_node(Node('image%05d.jpg' % i))
+    return graph.get_nodes
+
+
+@benchmark('graph.to_dict', GRAPH_SIZES)
+def bench_graph_to_dict(n):
+    return synthetic_graph(n).to_dict
+
+
+@benchmark('graph.from_dict', GRAPH_SIZES)
+def bench_graph_from_dict(n):
+    graph_dict = synthetic_graph(n).to_dict()
+    return lambda: Graph.from_dict(graph_dict)
+
+
+@benchmark('serialization.to_json', GRAPH_SIZES)
+def bench_serialization_to_json(n):
+    graph = synthetic_graph(n)
+    filename = os.path.join(_tmp_dir, 'to_json_%d.json' % n)
+    return lambda: graph_serialization.to_json(graph, filename)
+
+
+@benchmark('serialization.from_json', GRAPH_SIZES)
+def bench_serialization_from_json(n):
+    filename = os.path.join(_tmp_dir, 'from_json_%d.json' % n)
+    graph_serialization.to_json(synthetic_graph(n), filename)
+    return lambda: graph_serialization.from_json(filename)
+
+
+@benchmark('serialization.round_trip', GRAPH_SIZES)
+def bench_serialization_round_trip(n):
+    graph = synthetic_graph(n)
+    filename = os.path.join(_tmp_dir, 'round_trip_%d.json' % n)
+
+    def run():
+        graph_serialization.to_json(graph, filename)
+        graph_serialization.from_json(filename)
+    return run
+
+
+if __name__ == '__main__':
+    sys.exit(main())
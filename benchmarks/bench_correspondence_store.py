@@ -0,0 +1,76 @@
+"""
+Compares the memory footprint and speed of the array-backed CorrespondenceStore used by Graph edges against the
+set of Correspondence objects that it replaced. Layouts are the set, the store built from Correspondence objects and
+the store built from an array of rows; the build benchmarks report the memory of the container (memory, and
+bytes_per_corr) as metrics. Sizes are numbers of correspondences.
+
+Usage: python -m benchmarks.bench_correspondence_store [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+
+from arclimb.core.graph import Point, Correspondence
+from arclimb.core.graph.graph import CorrespondenceStore
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000, 10000, 50000]
+N_QUERIES = 1000
+
+
+def random_correspondences(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    return [Correspondence(Point(rnd.random(), rnd.random()), Point(rnd.random(), rnd.random())) for _ in range(n)]
+
+
+def measure_memory(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    container = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return size
+
+
+def _store_from_array(rows):
+    store = CorrespondenceStore()
+    store.extend_array(rows)
+    return store
+
+
+def _builder(layout: str, n: int):
+    rows = [(c.point1.x, c.point1.y, c.point2.x, c.point2.y) for c in random_correspondences(n)]
+    if layout == 'set':
+        return lambda: set(Correspondence(Point(x1, y1), Point(x2, y2)) for x1, y1, x2, y2 in rows)
+    if layout == 'store':
+        return lambda: CorrespondenceStore(Correspondence(Point(x1, y1), Point(x2, y2)) for x1, y1, x2, y2 in rows)
+    return lambda: _store_from_array(rows)
+
+
+def _bench_build(layout, n):
+    build = _builder(layout, n)
+    memory = measure_memory(build)
+    return build, {'memory': memory, 'bytes_per_corr': memory / n}
+
+
+def _bench_lookup(layout, n):
+    container = _builder(layout, n)()
+    queries = random_correspondences(n)[:N_QUERIES]
+    return lambda: [q in container for q in queries]
+
+
+def _bench_iterate(layout, n):
+    container = _builder(layout, n)()
+    return lambda: list(container)
+
+
+for _layout in ['set', 'store', 'store_array']:
+    for _op, _setup in [('build', _bench_build), ('lookup', _bench_lookup), ('iterate', _bench_iterate)]:
+        benchmark('correspondence_store.%s.%s' % (_layout, _op), SIZES)(
+            lambda n, layout=_layout, setup=_setup: setup(layout, n))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
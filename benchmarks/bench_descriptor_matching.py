@@ -0,0 +1,59 @@
+"""
+Compares the descriptor matching backends of SIFTMatcher and ORBMatcher on a synthetic image pair, as the number of
+features grows: FLANN KD-trees (SIFT) and multi-probe LSH (ORB) against brute force. Each backend is timed on
+knn_match; the metrics are the number of matches that pass the ratio test and their recall, taking the ones of brute
+force as the ground truth. Sizes are numbers of features.
+
+Usage: python -m benchmarks.bench_descriptor_matching [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import cv2
+
+from arclimb.core.correspondence.descriptor_matching import BruteForceBackend, KDTreeBackend, LSHBackend, ratio_test
+from benchmarks.synthetic import synthetic_image_pair
+from benchmarks.harness import benchmark, main
+
+FEATURES = [1000, 5000, 20000]
+IMAGE_SIZE = 2000
+
+# For each descriptor: the detector, the brute force backend and the approximate one
+DESCRIPTORS = {
+    'sift': (cv2.xfeatures2d.SIFT_create, lambda: BruteForceBackend(cv2.NORM_L2), ('kdtree', KDTreeBackend)),
+    'orb': (cv2.ORB_create, lambda: BruteForceBackend(cv2.NORM_HAMMING), ('lsh', LSHBackend)),
+}
+
+_descriptors = {}
+
+
+def descriptors(name: str, n: int):
+    """Returns the descriptors of the two images of the pair, computed once for each detector and number of features."""
+    if (name, n) not in _descriptors:
+        image1, image2, _ = synthetic_image_pair(IMAGE_SIZE)
+        detector = DESCRIPTORS[name][0](nfeatures=n)
+        _descriptors[name, n] = detector.detectAndCompute(image1, None)[1], detector.detectAndCompute(image2, None)[1]
+    return _descriptors[name, n]
+
+
+def recall(matches, reference):
+    expected = {(m.queryIdx, m.trainIdx) for m in reference}
+    found = {(m.queryIdx, m.trainIdx) for m in matches}
+    return len(expected & found) / max(1, len(expected))
+
+
+def _bench_backend(name, backend_factory, n):
+    des1, des2 = descriptors(name, n)
+    backend = backend_factory()
+    matches = ratio_test(backend.knn_match(des1, des2))
+    reference = ratio_test(DESCRIPTORS[name][1]().knn_match(des1, des2))
+    return (lambda: backend.knn_match(des1, des2)), {'matches': len(matches), 'recall': recall(matches, reference)}
+
+
+for _name, (_, _bf_factory, (_ann_name, _ann_factory)) in DESCRIPTORS.items():
+    for _backend_name, _factory in [('bf', _bf_factory), (_ann_name, _ann_factory)]:
+        benchmark('descriptor_matching.%s.%s' % (_name, _backend_name), FEATURES)(
+            lambda n, name=_name, factory=_factory: _bench_backend(name, factory, n))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
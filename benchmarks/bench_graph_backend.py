@@ -0,0 +1,129 @@
+"""
+Compares the native Graph with NetworkxGraph, a minimal copy of the networkx-backed Graph that it replaced, on graphs
+with a given number of edges: building the graph, looking up the correspondences of every edge, iterating over nodes
+and edges, and querying neighbours. Requires networkx, which arclimb itself no longer depends on.
+
+Usage: python -m benchmarks.bench_graph_backend [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import random
+import sys
+
+import networkx as nx
+import numpy as np
+
+from arclimb.core.graph import Graph, Node
+from arclimb.core.graph.graph import CorrespondenceStore, CorrespondenceView
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000, 10000]
+EDGES_PER_NODE = 5
+
+
+class NetworkxGraph(object):
+    """The operations of the networkx-backed Graph that are measured here, as they were implemented."""
+
+    def __init__(self):
+        self._graph = nx.Graph()
+        self._revision = 0
+
+    def _touch(self, node1_id=None, node2_id=None):
+        self._revision += 1
+        if node1_id is not None:
+            self._graph[node1_id][node2_id]['revision'] = self._revision
+
+    def add_node(self, node):
+        self._graph.add_node(node.id, node=node)
+        self._touch()
+
+    def has_edge(self, node1_id, node2_id):
+        return self._graph.has_edge(node1_id, node2_id)
+
+    def add_edge(self, node1_id, node2_id):
+        if not self._graph.has_edge(node1_id, node2_id):
+            self._graph.add_edge(node1_id, node2_id, src=node1_id, correspondences=CorrespondenceStore())
+            self._touch(node1_id, node2_id)
+
+    def add_correspondence_array(self, node1_id, node2_id, array):
+        self.add_edge(node1_id, node2_id)
+        edge_data = self._graph[node1_id][node2_id]
+        array = np.asarray(array, dtype=np.float32).reshape(-1, 4)
+        edge_data['correspondences'].extend_array(array[:, [2, 3, 0, 1]] if edge_data['src'] != node1_id else array)
+        self._touch(node1_id, node2_id)
+
+    def get_neighbours(self, node_id):
+        return self._graph.neighbors(node_id)
+
+    def get_edge_revision(self, node1_id, node2_id):
+        return self._graph[node1_id][node2_id]['revision']
+
+    def get_nodes(self):
+        return set([data['node'] for _, data in self._graph.nodes(data=True)])
+
+    def get_edges(self):
+        for node1_id, node2_id, attr in self._graph.edges(data=True):
+            yield (node1_id, node2_id) if attr['src'] == node1_id else (node2_id, node1_id)
+
+    def get_correspondence_array(self, node1_id, node2_id):
+        if not self._graph.has_edge(node1_id, node2_id):
+            return np.empty((0, 4), dtype=np.float32)
+        edge_data = self._graph[node1_id][node2_id]
+        return CorrespondenceView(edge_data['correspondences'], edge_data['src'] != node1_id).array
+
+
+def random_edges(n_edges: int, seed: int = 0):
+    n_nodes = max(2, n_edges // EDGES_PER_NODE)
+    rnd = random.Random(seed)
+    names = ['IMG_%05d.jpg' % i for i in range(n_nodes)]
+    edges = set()
+    while len(edges) < n_edges:
+        a, b = rnd.sample(range(n_nodes), 2)
+        edges.add((names[min(a, b)], names[max(a, b)]))
+    return names, sorted(edges)
+
+
+ROWS = np.random.RandomState(0).rand(10, 4).astype(np.float32)
+
+
+def build(graph_class, names, edges):
+    graph = graph_class()
+    for name in names:
+        graph.add_node(Node(name))
+    for src, dest in edges:
+        graph.add_correspondence_array(src, dest, ROWS)
+    return graph
+
+
+def _bench_build(graph_class, n):
+    names, edges = random_edges(n)
+    return lambda: build(graph_class, names, edges)
+
+
+def _bench_lookup(graph_class, n):
+    names, edges = random_edges(n)
+    graph = build(graph_class, names, edges)
+    # Half of the lookups are in the opposite direction, half are of edges that don't exist
+    queries = [(b, a) for a, b in edges[::2]] + [(a, names[0]) for a, _ in edges[1::2]]
+    return lambda: [(graph.get_correspondence_array(a, b), graph.has_edge(a, b)) for a, b in queries]
+
+
+def _bench_iterate(graph_class, n):
+    graph = build(graph_class, *random_edges(n))
+    return lambda: (len(graph.get_nodes()), sum(1 for _ in graph.get_edges()))
+
+
+def _bench_neighbours(graph_class, n):
+    names, edges = random_edges(n)
+    graph = build(graph_class, names, edges)
+    return lambda: [graph.get_edge_revision(name, neighbour) for name in names
+                    for neighbour in graph.get_neighbours(name)]
+
+
+for _operation, _setup in [('build', _bench_build), ('lookup', _bench_lookup), ('iterate', _bench_iterate),
+                           ('neighbours', _bench_neighbours)]:
+    for _name, _graph_class in [('networkx', NetworkxGraph), ('native', Graph)]:
+        benchmark('graph.%s.%s' % (_operation, _name), SIZES)(
+            lambda n, setup=_setup, graph_class=_graph_class: setup(graph_class, n))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
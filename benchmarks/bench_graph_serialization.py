@@ -0,0 +1,87 @@
+"""
+Compares the time and the peak memory of saving and loading a large graph with the streaming reader and writer of
+graph_serialization against the json.load/json.dump of Graph.to_dict that they replaced. The metrics are the peak of
+allocated memory (peak_mb) and the size of the file (file_mb). Sizes are total numbers of correspondences.
+
+Usage: python -m benchmarks.bench_graph_serialization [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import atexit
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from arclimb.core.graph import Graph, Node
+from arclimb.core.utils import graph_serialization
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000000]
+N_NODES = 50
+
+_tmp_dir = tempfile.mkdtemp(prefix='arclimb-bench-')
+atexit.register(shutil.rmtree, _tmp_dir, True)
+
+
+def synthetic_graph(n_correspondences: int, n_nodes: int = N_NODES, seed: int = 0) -> Graph:
+    """Returns a chain of n_nodes nodes, with the correspondences spread evenly over its edges."""
+    rnd = np.random.RandomState(seed)
+    graph = Graph()
+    for i in range(n_nodes):
+        graph.add_node(Node('image%03d.jpg' % i))
+
+    per_edge = n_correspondences // (n_nodes - 1)
+    for i in range(n_nodes - 1):
+        graph.set_correspondence_array('image%03d.jpg' % i, 'image%03d.jpg' % (i + 1),
+                                       rnd.rand(per_edge, 4).astype(np.float32))
+    return graph
+
+
+def old_save(graph: Graph, filename: str) -> None:
+    with open(filename, 'w') as f:
+        json.dump(graph.to_dict(), f)
+
+
+def old_load(filename: str) -> Graph:
+    with open(filename) as f:
+        return Graph.from_dict(json.load(f))
+
+
+def measure_peak(function, *args) -> int:
+    """Returns the peak of memory allocated by function(*args), in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _bench_save(save, n):
+    graph = synthetic_graph(n)
+    filename = os.path.join(_tmp_dir, 'save_%d.json' % n)
+    peak = measure_peak(save, graph, filename)
+    metrics = {'peak_mb': peak / 2 ** 20, 'file_mb': os.path.getsize(filename) / 2 ** 20}
+    return (lambda: save(graph, filename)), metrics
+
+
+def _bench_load(save, load, n):
+    filename = os.path.join(_tmp_dir, 'load_%d.json' % n)
+    save(synthetic_graph(n), filename)
+    metrics = {'peak_mb': measure_peak(load, filename) / 2 ** 20, 'file_mb': os.path.getsize(filename) / 2 ** 20}
+    return (lambda: load(filename)), metrics
+
+
+for _name, _save, _load in [('json', old_save, old_load),
+                            ('streaming', graph_serialization.to_json, graph_serialization.from_json)]:
+    benchmark('graph_serialization.%s.save' % _name, SIZES)(lambda n, save=_save: _bench_save(save, n))
+    benchmark('graph_serialization.%s.load' % _name, SIZES)(
+        lambda n, save=_save, load=_load: _bench_load(save, load, n))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Compares the guided matching stage of DoubleORBMatcher (neighbour search, Hamming distances and spatial suppression)
+as it was originally written, with one KDTree query and one cv2.norm call per keypoint, against the batched engine in
+arclimb.core.correspondence.guided. Both are run on the same ORB keypoints of a synthetic image pair, and their output
+is checked to be identical; the metric is the number of matches. Sizes are numbers of features.
+
+Usage: python -m benchmarks.bench_guided_matching [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import cv2
+import numpy as np
+from scipy.spatial import KDTree
+
+from arclimb.core.correspondence.guided import guided_match, spatial_suppression
+from benchmarks.harness import benchmark, main
+from benchmarks.synthetic import synthetic_image_pair
+
+FEATURES = [3000, 10000]
+MIN_KP_DISTANCE = 0.01
+
+_inputs = {}
+
+
+def reference_match(kp1, des1, kp2, des2, M, disp, min_distance):
+    pts1 = np.float32([kp.pt for kp in kp1]).reshape(-1, 1, 2)
+    pts1_transformed = cv2.perspectiveTransform(pts1, M)
+
+    tree = KDTree([kp.pt for kp in kp2])
+
+    matches = []
+    for pt1_idx in range(len(kp1)):
+        points2_idxs = tree.query_ball_point(pts1_transformed[pt1_idx], disp)[0]
+
+        best_idx = None
+        best_dist = float('inf')
+        second_best_idx = None
+        second_best_dist = float('inf')
+
+        for pt2_idx in points2_idxs:
+            dist = cv2.norm(des1[pt1_idx], des2[pt2_idx], normType=cv2.NORM_HAMMING)
+            if dist < best_dist:
+                second_best_idx, second_best_dist = best_idx, best_dist
+                best_dist, best_idx = dist, pt2_idx
+            elif dist < second_best_dist:
+                second_best_dist, second_best_idx = dist, pt2_idx
+
+        if best_idx is not None:
+            if second_best_idx is None or best_dist < 0.75 * second_best_dist:
+                matches.append(cv2.DMatch(pt1_idx, best_idx, best_dist))
+
+    matches = sorted(matches, key=lambda x: x.distance)
+
+    final_matches = []
+    chosen_keypoints = []
+    for match_candidate in matches:
+        candidate_pt = kp1[match_candidate.queryIdx].pt
+        if len(chosen_keypoints) == 0:
+            min_dist = float('inf')
+        else:
+            min_dist = min(cv2.norm(candidate_pt, chosen_pt) for chosen_pt in chosen_keypoints)
+
+        if min_dist > min_distance:
+            final_matches.append(match_candidate)
+            chosen_keypoints.append(candidate_pt)
+
+    return final_matches
+
+
+def batched_match(kp1, des1, kp2, des2, M, disp, min_distance):
+    pts1 = cv2.KeyPoint_convert(kp1)
+    pts1_transformed = cv2.perspectiveTransform(pts1.reshape(-1, 1, 2), M)
+
+    query_idx, train_idx, distances = guided_match(pts1_transformed, des1, cv2.KeyPoint_convert(kp2), des2, disp)
+
+    order = np.argsort(distances, kind='stable')
+    query_idx, train_idx, distances = query_idx[order], train_idx[order], distances[order]
+    selected = spatial_suppression(pts1[query_idx], min_distance)
+
+    return [cv2.DMatch(int(query_idx[i]), int(train_idx[i]), float(distances[i])) for i in selected]
+
+
+def inputs(n: int):
+    """Returns the arguments of both matching functions for n features, computed once for each number of features."""
+    if n not in _inputs:
+        image1, image2, M = synthetic_image_pair()
+        disp = 0.01 * min(image2.shape[:2])
+        min_distance = MIN_KP_DISTANCE * min(image1.shape[:2])
+
+        orb = cv2.ORB_create(nfeatures=n)
+        kp1, des1 = orb.detectAndCompute(image1, None)
+        kp2, des2 = orb.detectAndCompute(image2, None)
+        _inputs[n] = kp1, des1, kp2, des2, M, disp, min_distance
+    return _inputs[n]
+
+
+@benchmark('guided_matching.reference', FEATURES)
+def bench_reference(n):
+    args = inputs(n)
+    return (lambda: reference_match(*args)), {'matches': len(reference_match(*args))}
+
+
+@benchmark('guided_matching.batched', FEATURES)
+def bench_batched(n):
+    args = inputs(n)
+    expected = reference_match(*args)
+    result = batched_match(*args)
+    assert [(m.queryIdx, m.trainIdx, m.distance) for m in expected] == \
+           [(m.queryIdx, m.trainIdx, m.distance) for m in result]
+    return (lambda: batched_match(*args)), {'matches': len(result)}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
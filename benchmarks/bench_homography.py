@@ -0,0 +1,58 @@
+"""
+Compares the homography estimation methods of HomographyEstimator with a plain cv2.findHomography(RANSAC) call, on
+synthetic correspondences with 30% of outliers ("good") and on random ones ("hopeless"). PROSAC gets the outliers
+last, as it would with descriptor distances as scores. The metrics are the number of inliers and the confidence of the
+estimate, or rejected=1 if there is none. Sizes are numbers of correspondences.
+
+Usage: python -m benchmarks.bench_homography [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.homography import METHODS, HomographyEstimator
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000]
+THRESHOLD = 3.0
+M = np.array([[0.9, 0.1, 20], [-0.05, 1.1, 10], [0.0001, 0, 1]])
+OUTLIER_RATIOS = [('good', 0.3), ('hopeless', 1.0)]
+
+
+def synthetic_points(n: int, outlier_ratio: float, seed: int = 0):
+    rnd = np.random.RandomState(seed)
+    src = rnd.uniform(0, 1000, (n, 2)).astype(np.float32)
+    dst = cv2.perspectiveTransform(src.reshape(-1, 1, 2), M).reshape(-1, 2) + rnd.normal(0, 1, (n, 2))
+    outliers = rnd.rand(n) < outlier_ratio
+    dst[outliers] = rnd.uniform(0, 1000, (np.count_nonzero(outliers), 2))
+    return src, dst.astype(np.float32), outliers + rnd.rand(n)
+
+
+def _bench_find_homography(outlier_ratio, n):
+    src, dst, _ = synthetic_points(n, outlier_ratio)
+    _, mask = cv2.findHomography(src, dst, cv2.RANSAC, THRESHOLD)
+    return (lambda: cv2.findHomography(src, dst, cv2.RANSAC, THRESHOLD)), {'inliers': int(mask.sum())}
+
+
+def _bench_estimator(method, outlier_ratio, n):
+    src, dst, scores = synthetic_points(n, outlier_ratio)
+    estimator = HomographyEstimator(method, THRESHOLD, min_inliers=10)
+    estimate = estimator.estimate(src, dst, scores)
+    if estimate is None:
+        metrics = {'rejected': 1}
+    else:
+        metrics = {'inliers': int(np.count_nonzero(estimate.inliers)), 'confidence': estimate.confidence}
+    return (lambda: estimator.estimate(src, dst, scores)), metrics
+
+
+for _input, _ratio in OUTLIER_RATIOS:
+    benchmark('homography.%s.findHomography' % _input, SIZES)(
+        lambda n, ratio=_ratio: _bench_find_homography(ratio, n))
+    for _method in sorted(set(METHODS) - {'lsq'}):
+        benchmark('homography.%s.%s' % (_input, _method), SIZES)(
+            lambda n, method=_method, ratio=_ratio: _bench_estimator(method, ratio, n))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
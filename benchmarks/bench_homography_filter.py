@@ -0,0 +1,51 @@
+"""
+Compares the per-point HomographyFilter verification loop with the batched homography_inliers on synthetic matches.
+The metric is the number of inliers, which is the same for both. Sizes are numbers of matches.
+
+Usage: python -m benchmarks.bench_homography_filter [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.correspondence import homography_inliers
+from benchmarks.harness import benchmark, main
+
+SIZES = [500, 5000, 20000]
+
+
+def synthetic_points(n: int, seed: int = 0):
+    rnd = np.random.RandomState(seed)
+    M = np.array([[0.9, 0.1, 20], [-0.05, 1.1, 10], [0.0001, 0, 1]])
+    src_pts = rnd.uniform(0, 1000, (n, 2)).astype(np.float32)
+    dst_pts = cv2.perspectiveTransform(src_pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    dst_pts += rnd.normal(0, 5, dst_pts.shape).astype(np.float32)
+    return src_pts, dst_pts, M
+
+
+def loop_filter(src_pts, dst_pts, M, size, threshold):
+    res = []
+    for src_pt, dst_pt in zip(src_pts, dst_pts):
+        src_transformed = cv2.perspectiveTransform(np.float32([src_pt]).reshape(-1, 1, 2), M)
+        diff_normalized = np.divide(dst_pt - src_transformed, size)
+        res.append(np.linalg.norm(diff_normalized) < threshold)
+    return res
+
+
+@benchmark('homography_filter.loop', SIZES)
+def bench_loop(n):
+    src_pts, dst_pts, M = synthetic_points(n)
+    inliers = int(sum(loop_filter(src_pts, dst_pts, M, (1000, 1000), 0.01)))
+    return (lambda: loop_filter(src_pts, dst_pts, M, (1000, 1000), 0.01)), {'inliers': inliers}
+
+
+@benchmark('homography_filter.batch', SIZES)
+def bench_batch(n):
+    src_pts, dst_pts, M = synthetic_points(n)
+    inliers = int(sum(homography_inliers(src_pts, dst_pts, M, (1000, 1000), 0.01)))
+    return (lambda: homography_inliers(src_pts, dst_pts, M, (1000, 1000), 0.01)), {'inliers': inliers}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
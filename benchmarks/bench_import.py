@@ -0,0 +1,75 @@
+"""
+Measures the time it takes a fresh interpreter to import parts of arclimb, as the headless batch workers do, and
+which of the heavy dependencies (PyQt5, OpenCV, scipy) each import pulls in. 'load_labels' imports graph_serialization
+and loads a small labels file.
+
+Each benchmark times a whole child interpreter, startup included; the metrics are the time of the import alone,
+measured in the child (import_ms, the minimum of REPEAT runs), and whether each heavy module was loaded (loaded_<name>).
+
+Usage: python -m benchmarks.bench_import [-k PATTERN] [-o results.json] [-c baseline.json]
+"""
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from arclimb.core.graph import Graph, Node, Correspondence, Point
+from arclimb.core.utils import graph_serialization
+from benchmarks.harness import benchmark, main
+
+REPEAT = 10
+HEAVY_MODULES = ['PyQt5', 'cv2', 'scipy']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_tmp_dir = tempfile.mkdtemp(prefix='arclimb-bench-')
+atexit.register(shutil.rmtree, _tmp_dir, True)
+
+# Run by the child interpreter: times the statement, then reports the time and the heavy modules that were loaded
+CHILD = """
+import sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in %r if m in sys.modules]]))
+"""
+
+SCENARIOS = [
+    ('core', "import arclimb.core"),
+    ('core_graph', "import arclimb.core.graph"),
+    ('load_labels', "from arclimb.core.utils import graph_serialization\n"
+                    "graph_serialization.from_json(sys.argv[1])"),
+    ('batch_workers', "import arclimb.core.correspondence.batch"),
+]
+
+
+def labels_file() -> str:
+    """Returns a small labels file, written once."""
+    filename = os.path.join(_tmp_dir, 'labels.json')
+    if not os.path.exists(filename):
+        graph = Graph()
+        graph.add_node(Node('a.jpg'))
+        graph.add_node(Node('b.jpg'))
+        graph.add_correspondence('a.jpg', 'b.jpg', Correspondence(Point(0.25, 0.5), Point(0.5, 0.75)))
+        graph_serialization.to_json(graph, filename)
+    return filename
+
+
+def _bench_import(statement):
+    command = [sys.executable, '-c', "import json\n" + CHILD % (statement, HEAVY_MODULES), labels_file()]
+    results = [json.loads(subprocess.check_output(command, cwd=ROOT)) for _ in range(REPEAT)]
+
+    metrics = {'import_ms': min(elapsed for elapsed, _ in results) * 1000}
+    for module in HEAVY_MODULES:
+        metrics['loaded_%s' % module] = int(module in results[0][1])
+    return (lambda: subprocess.check_output(command, cwd=ROOT)), metrics
+
+
+for _name, _statement in SCENARIOS:
+    benchmark('import.%s' % _name)(lambda n, statement=_statement: _bench_import(statement))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Hit-testing and painting of keypoints in the ImagePairEditor scene: one QGraphicsItem per keypoint (as the editor used
+to do, in a scene without index) against the single KeypointLayerItem of each image.
+
+Usage: QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_keypoint_layer [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import numpy as np
+from PyQt5.QtCore import QPointF, QRectF
+from PyQt5.QtGui import QImage, QPainter, QPainterPath, QPixmap
+from PyQt5.QtWidgets import QApplication, QGraphicsItem, QGraphicsScene
+
+from arclimb.annotator.pairtagger import KeypointLayerItem
+from arclimb.core.graph import Point
+from benchmarks.harness import benchmark, main
+
+SIZES = [1000, 10000]
+IMAGE_SIZE = 1000
+
+_app = QApplication.instance() or QApplication(sys.argv[:1])
+
+
+class SingleKeypointItem(QGraphicsItem):
+    """Same geometry as the KeypointItem that the editor created for each keypoint."""
+
+    RADIUS = 4
+
+    def __init__(self, x, y):
+        super().__init__()
+        self.setPos(x, y)
+        self.setFlag(QGraphicsItem.ItemIsSelectable)
+        self.setFlag(QGraphicsItem.ItemIgnoresTransformations)
+
+    def boundingRect(self):
+        r = SingleKeypointItem.RADIUS
+        return QRectF(-r, -r, 2 * r, 2 * r)
+
+    def shape(self):
+        path = QPainterPath()
+        path.addEllipse(self.boundingRect())
+        return path
+
+    def paint(self, painter, option, widget=None):
+        painter.drawEllipse(self.boundingRect())
+
+
+def random_positions(n: int, seed: int = 0):
+    return np.random.RandomState(seed).rand(n, 2)
+
+
+def item_scene(n: int) -> QGraphicsScene:
+    scene = QGraphicsScene()
+    scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+    scene.addPixmap(QPixmap(IMAGE_SIZE, IMAGE_SIZE))
+    for x, y in random_positions(n) * IMAGE_SIZE:
+        scene.addItem(SingleKeypointItem(x, y))
+    return scene
+
+
+def layer_scene(n: int):
+    scene = QGraphicsScene()
+    scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+    layer = KeypointLayerItem(scene.addPixmap(QPixmap(IMAGE_SIZE, IMAGE_SIZE)))
+    layer.addKeypoints([Point(x, y) for x, y in random_positions(n)])
+    return scene, layer
+
+
+def queries():
+    return [QPointF(x, y) for x, y in random_positions(100, seed=1) * IMAGE_SIZE]
+
+
+@benchmark('keypoints.hit_test.items', SIZES)
+def bench_hit_test_items(n):
+    scene = item_scene(n)
+    points = queries()
+    return lambda: [scene.items(p) for p in points]
+
+
+@benchmark('keypoints.hit_test.layer', SIZES)
+def bench_hit_test_layer(n):
+    scene, layer = layer_scene(n)
+    points = queries()
+    return lambda: [(scene.items(p), layer.keypointAt(p, 1.0)) for p in points]
+
+
+def _render(scene):
+    image = QImage(IMAGE_SIZE, IMAGE_SIZE, QImage.Format_ARGB32)
+
+    def run():
+        painter = QPainter(image)
+        scene.render(painter)
+        painter.end()
+    return run
+
+
+@benchmark('keypoints.paint.items', SIZES)
+def bench_paint_items(n):
+    return _render(item_scene(n))
+
+
+@benchmark('keypoints.paint.layer', SIZES)
+def bench_paint_layer(n):
+    return _render(layer_scene(n)[0])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Compares PyramidMatcher with DoubleORBMatcher (on images scaled down to its max_pixels) and with ORB features detected
+densely at full resolution (ORBMatcher with tiles), on a synthetic pair of large images where one is a warped copy of
+the other. Pairs are timed with an empty FeatureStore; the metrics are the number of matches, their spread (see
+grid_coverage) and their reprojection error, in pixels of the full resolution images, against the homography used to
+warp the image. pyramid-full always goes down to full resolution. Sizes are image sizes.
+
+Usage: python -m benchmarks.bench_pyramid [-k PATTERN] [-s SIZE ...] [-o results.json] [-c baseline.json]
+"""
+import sys
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.correspondence import DoubleORBMatcher, ORBMatcher, PyramidMatcher
+from arclimb.core.correspondence.featurestore import FeatureStore
+from arclimb.core.correspondence.guided import grid_coverage
+from arclimb.core.utils.image import scale_down_image
+from benchmarks.synthetic import synthetic_image_pair
+from benchmarks.harness import benchmark, main
+
+SIZES = [2000, 4000]
+
+MATCHERS = [
+    ('dense-orb', lambda: ORBMatcher(nfeatures=5000, feature_store=FeatureStore(), tile_size=1024)),
+    ('double-orb', lambda: DoubleORBMatcher(feature_store=FeatureStore())),
+    ('pyramid', lambda: PyramidMatcher(feature_store=FeatureStore())),
+    ('pyramid-full', lambda: PyramidMatcher(max_error=0.0, feature_store=FeatureStore())),
+]
+
+
+def match(matcher, image1, image2):
+    """Returns the matched points of a pair, in the coordinates of the full resolution images."""
+    small1, small2 = scale_down_image(image1, matcher.max_pixels), scale_down_image(image2, matcher.max_pixels)
+    matches, kp1, kp2 = matcher.match(small1, small2)
+    pts1 = cv2.KeyPoint_convert(kp1)[[m.queryIdx for m in matches]].reshape(-1, 2) * image1.shape[1] / small1.shape[1]
+    pts2 = cv2.KeyPoint_convert(kp2)[[m.trainIdx for m in matches]].reshape(-1, 2) * image2.shape[1] / small2.shape[1]
+    return pts1, pts2
+
+
+def metrics(pts1, pts2, image1, M):
+    if len(pts1) == 0:
+        return {'matches': 0, 'spread': 0.0, 'median_error': float('nan'), 'inliers_3px': 0.0}
+    errors = np.hypot(*(cv2.perspectiveTransform(pts1.reshape(-1, 1, 2).astype(np.float64), M).reshape(-1, 2) -
+                        pts2).T)
+    return {
+        'matches': len(pts1),
+        'spread': grid_coverage(pts1, image1.shape[1], image1.shape[0]),
+        'median_error': float(np.median(errors)),
+        'inliers_3px': float(np.mean(errors < 3)),
+    }
+
+
+def _bench_matcher(factory, size):
+    image1, image2, M = synthetic_image_pair(size)
+    return (lambda: match(factory(), image1, image2)), metrics(*match(factory(), image1, image2), image1, M)
+
+
+for _name, _factory in MATCHERS:
+    benchmark('pyramid.%s' % _name, SIZES)(lambda size, factory=_factory: _bench_matcher(factory, size))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
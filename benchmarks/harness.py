@@ -0,0 +1,143 @@
+"""
+Minimal harness for micro-benchmarks with machine-readable results.
+
+A benchmark is a function decorated with @benchmark, that takes a problem size, does its setup and returns the
+callable to be timed; it can also return a (callable, metrics) tuple, where metrics is a dict of other measurements
+(e.g. the number of matches or their accuracy) that is saved with the timings. Each benchmark is run for each of its
+sizes; results are lists of dicts, that can be saved as JSON and compared against a previous run to find regressions.
+"""
+import argparse
+import fnmatch
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Result = Dict[str, Any]
+
+_registry = []  # type: List[Benchmark]
+
+
+class Benchmark(object):
+    def __init__(self, name: str, setup: Callable[[int], Callable[[], Any]], sizes: Sequence[int]):
+        self.name = name
+        self.setup = setup
+        self.sizes = list(sizes)
+
+    def run(self, size: int, repeat: int = 5, min_time: float = 0.2) -> Result:
+        """
+        Times the benchmark for the given size. The number of calls per measurement is chosen so that a measurement
+        takes at least min_time seconds; times are reported per call, in seconds.
+        """
+        function = self.setup(size)
+        metrics = None
+        if isinstance(function, tuple):
+            function, metrics = function
+        timer = timeit.Timer(function)
+
+        number = 1
+        while True:
+            elapsed = timer.timeit(number)
+            if elapsed >= min_time or number >= 1 << 20:
+                break
+            number *= 10 if elapsed < min_time / 10 else 2
+
+        times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+        result = {
+            'name': self.name,
+            'size': size,
+            'number': number,
+            'repeat': repeat,
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times),
+        }
+        if metrics is not None:
+            result['metrics'] = metrics
+        return result
+
+
+def benchmark(name: str, sizes: Sequence[int] = (1,)):
+    """Decorator that registers a benchmark with the given name, to be run for each of the sizes."""
+    def decorator(setup: Callable[[int], Callable[[], Any]]):
+        _registry.append(Benchmark(name, setup, sizes))
+        return setup
+    return decorator
+
+
+def get_benchmarks(pattern: str = '*') -> List[Benchmark]:
+    """Returns the registered benchmarks whose name matches the shell-style pattern."""
+    return [b for b in _registry if fnmatch.fnmatchcase(b.name, pattern)]
+
+
+def run_benchmarks(pattern: str = '*', sizes: Optional[Sequence[int]] = None, repeat: int = 5, min_time: float = 0.2,
+                   verbose: bool = True) -> List[Result]:
+    """Runs the matching benchmarks, each for its own sizes unless sizes is given."""
+    results = []
+    for b in get_benchmarks(pattern):
+        for size in (sizes if sizes is not None else b.sizes):
+            result = b.run(size, repeat, min_time)
+            results.append(result)
+            if verbose:
+                metrics = ", ".join("%s=%.4g" % item for item in result.get('metrics', {}).items())
+                print(("%-40s %9d %14.3f us  %s" % (b.name, size, result['min'] * 1e6, metrics)).rstrip())
+                sys.stdout.flush()
+    return results
+
+
+def compare(results: List[Result], baseline: List[Result], tolerance: float = 0.2) -> List[Result]:
+    """
+    Returns the results that are slower than the result with the same name and size in baseline by more than
+    tolerance (as a fraction), with the baseline time and the ratio added. Minimum times are compared, since they are
+    the least affected by noise.
+    """
+    baseline_times = {(r['name'], r['size']): r['min'] for r in baseline}
+    regressions = []
+    for r in results:
+        base = baseline_times.get((r['name'], r['size']))
+        if base is not None and base > 0 and r['min'] > base * (1 + tolerance):
+            regressions.append(dict(r, baseline=base, ratio=r['min'] / base))
+    return regressions
+
+
+def save_results(results: List[Result], filename: str) -> None:
+    with open(filename, 'w') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, f, indent=2)
+
+
+def load_results(filename: str) -> List[Result]:
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Runs the registered benchmarks.")
+    parser.add_argument('-k', '--filter', default='*', help="only run the benchmarks matching this pattern")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', help="override the sizes of all the benchmarks")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="measurements per benchmark (default: 5)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum duration of a measurement in seconds")
+    parser.add_argument('-o', '--output', help="save the results as JSON to this file")
+    parser.add_argument('-c', '--compare', help="compare against the results saved in this file")
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2,
+                        help="slowdown (as a fraction) reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter, args.sizes, args.repeat, args.min_time)
+    if args.output is not None:
+        save_results(results, args.output)
+
+    if args.compare is not None:
+        regressions = compare(results, load_results(args.compare), args.tolerance)
+        for r in regressions:
+            print("REGRESSION %-40s %9d %8.2fx slower" % (r['name'], r['size'], r['ratio']))
+        if len(regressions) > 0:
+            return 1
+    return 0
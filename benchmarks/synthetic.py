@@ -0,0 +1,20 @@
+"""Synthetic inputs shared by the benchmarks."""
+import cv2
+import numpy as np
+
+
+def synthetic_image_pair(size: int = 1000, seed: int = 0):
+    """
+    Returns a textured image made of noise at several scales, the same image warped by a mild homography, and the
+    homography.
+    """
+    rnd = np.random.RandomState(seed)
+    image = np.zeros((size, size), np.float32)
+    for scale in [4, 16, 64]:
+        noise = rnd.uniform(0, 1, (size // scale, size // scale)).astype(np.float32)
+        image += cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    M = np.array([[0.95, 0.05, 15], [-0.03, 1.02, 10], [0.00002, 0.00001, 1]])
+    warped = cv2.warpPerspective(image, M, (size, size))
+    return image, warped, M
@@ -0,0 +1,93 @@
+import os
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.batch import find_all_correspondences, precompute_features
+from arclimb.core.correspondence.correspondence import DoubleORBMatcher
+
+
+def write_images(directory):
+    rnd = np.random.RandomState(0)
+    image = cv2.resize(rnd.randint(0, 256, (100, 100)).astype(np.uint8), (400, 400), interpolation=cv2.INTER_CUBIC)
+    paths = [os.path.join(directory, name) for name in ['a.png', 'b.png']]
+    cv2.imwrite(paths[0], image)
+    cv2.imwrite(paths[1], cv2.warpAffine(image, np.float32([[1, 0, 10], [0, 1, 5]]), (400, 400)))
+    return paths
+
+
+def test_find_all_correspondences(tmpdir):
+    path1, path2 = write_images(str(tmpdir))
+    missing = os.path.join(str(tmpdir), 'missing.png')
+    pairs = [(path1, path2), (path1, missing)]
+
+    for workers in [1, 2]:
+        results = {(p1, p2): corrs for p1, p2, corrs in find_all_correspondences(pairs, workers=workers)}
+        assert results[(path1, missing)] is None
+
+        corrs = results[(path1, path2)]
+        assert corrs.shape[1] == 4 and len(corrs) > 0
+        # The second image is shifted by (10, 5) pixels
+        assert np.allclose(np.median(corrs[:, 2:] - corrs[:, :2], axis=0), [10 / 400, 5 / 400], atol=2 / 400)
+
+
+class FailingMatcher(DoubleORBMatcher):
+    """Fails on pairs of identical images, and when precomputing features, like a matcher on a degenerate image."""
+
+    def match(self, image1, image2):
+        if np.array_equal(image1, image2):
+            raise IndexError("degenerate pair")
+        return super().match(image1, image2)
+
+    def precompute(self, image):
+        raise ValueError("degenerate image")
+
+
+def test_failing_matcher(tmpdir):
+    path1, path2 = write_images(str(tmpdir))
+    pairs = [(path1, path1), (path1, path2)]
+
+    for workers in [1, 2]:
+        results = {(p1, p2): corrs for p1, p2, corrs in find_all_correspondences(pairs, FailingMatcher, workers)}
+        assert results[(path1, path1)] is None
+        assert len(results[(path1, path2)]) > 0
+
+        results = dict(precompute_features([path1], str(tmpdir.join('cache')), FailingMatcher, workers))
+        assert results == {path1: None}
+
+
+def test_precompute_features(tmpdir):
+    path1, path2 = write_images(str(tmpdir.mkdir('images')))
+    missing = os.path.join(str(tmpdir), 'missing.png')
+    cache_dir = str(tmpdir.join('cache'))
+
+    results = dict(precompute_features([path1, path2, missing], cache_dir, workers=2))
+    assert results[missing] is None
+    assert results[path1] > 0 and results[path2] > 0
+
+    # The grayscale images and the features of both images are saved
+    saved = sorted(os.listdir(cache_dir))
+    assert len([name for name in saved if '.gray-' in name]) == 2
+    assert len(saved) > 2
+
+    # Matching uses the saved files, and does not add new ones
+    results = list(find_all_correspondences([(path1, path2)], workers=2, cache_dir=cache_dir))
+    assert len(results[0][2]) > 0
+    assert sorted(os.listdir(cache_dir)) == saved
+
+
+def test_precompute_features_changed_file(tmpdir):
+    path1, path2 = write_images(str(tmpdir.mkdir('images')))
+    cache_dir = str(tmpdir.join('cache'))
+
+    def features():
+        return sorted(name for name in os.listdir(cache_dir) if name.endswith('.kp.npy'))
+
+    dict(precompute_features([path1, path2], cache_dir, workers=2))
+    saved = features()
+
+    # The features of the old version of the file are replaced, not kept next to the new ones
+    cv2.imwrite(path1, cv2.flip(cv2.imread(path1), 1))
+    os.utime(path1, ns=(0, 0))
+    dict(precompute_features([path1, path2], cache_dir, workers=2))
+    assert len(features()) == len(saved) and features() != saved
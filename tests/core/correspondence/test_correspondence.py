@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence import correspondence as cr
+from arclimb.core.correspondence.featurestore import FeatureStore
+from arclimb.core.correspondence.trace import Trace
+
+
+class FixedMatcher(cr.Matcher):
+    """Matcher returning precomputed matches, used to test the decorators."""
+
+    def __init__(self, matches, kp1, kp2):
+        super().__init__()
+        self.result = matches, kp1, kp2
+
+    def match(self, image1, image2):
+        return self.result
+
+
+def synthetic_matches(n=200, n_outliers=20, seed=0):
+    rnd = np.random.RandomState(seed)
+    M = np.array([[0.9, 0.1, 20], [-0.05, 1.1, 10], [0.0001, 0, 1]])
+
+    pts1 = rnd.uniform(0, 500, (n, 2)).astype(np.float32)
+    pts2 = cv2.perspectiveTransform(pts1.reshape(-1, 1, 2), M).reshape(-1, 2)
+    pts2[:n_outliers] = rnd.uniform(0, 500, (n_outliers, 2))
+
+    kp1 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in pts1]
+    kp2 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in pts2]
+    matches = [cv2.DMatch(i, i, 0) for i in range(n)]
+    return matches, kp1, kp2, M
+
+
+def reference_homography_filter(matches, kp1, kp2, M, image2, threshold):
+    res = []
+    for m in matches:
+        src_pt = kp1[m.queryIdx].pt
+        dst_pt = kp2[m.trainIdx].pt
+
+        src_transformed = cv2.perspectiveTransform(np.float32([src_pt]).reshape(-1, 1, 2), M)
+        h, w, *_ = image2.shape
+        diff_normalized = np.divide(dst_pt - src_transformed, [w, h])
+
+        if np.linalg.norm(diff_normalized) < threshold:
+            res.append(m)
+    return res
+
+
+def test_homography_inliers():
+    matches, kp1, kp2, M = synthetic_matches()
+    image2 = np.zeros((500, 400), np.uint8)
+
+    src_pts = np.float32([kp.pt for kp in kp1])
+    dst_pts = np.float32([kp.pt for kp in kp2])
+    for threshold in [0.01, 0.05, 0.2]:
+        inliers = cr.homography_inliers(src_pts, dst_pts, M, (400, 500), threshold)
+        expected = reference_homography_filter(matches, kp1, kp2, M, image2, threshold)
+        assert [m.queryIdx for m in expected] == list(np.flatnonzero(inliers))
+
+    mask = np.ones((len(matches), 1), np.uint8)
+    mask[-1] = 0
+    inliers = cr.homography_inliers(src_pts, dst_pts, M, (400, 500), 10.0, mask)
+    assert inliers.tolist() == [True] * (len(matches) - 1) + [False]
+
+
+def test_homography_filter():
+    matches, kp1, kp2, _ = synthetic_matches()
+    image = np.zeros((500, 500), np.uint8)
+
+    for use_mask in [False, True]:
+        res, _, _ = cr.HomographyFilter(FixedMatcher(matches, kp1, kp2), 0.01, use_mask).match(image, image)
+        assert set(m.queryIdx for m in res) <= set(range(20, 200))
+        assert len(res) >= 170
+
+
+def textured_image(size=600, seed=0):
+    rnd = np.random.RandomState(seed)
+    image = np.zeros((size, size), np.float32)
+    for scale in [4, 16, 64]:
+        noise = rnd.uniform(0, 1, (size // scale, size // scale)).astype(np.float32)
+        image += cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    return cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+def test_cascade_matcher():
+    image1 = textured_image(seed=0)
+    image2 = cv2.warpPerspective(image1, np.array([[0.95, 0.05, 15], [-0.03, 1.02, 10], [0.00002, 0.00001, 1]]),
+                                 (600, 600))
+    other = textured_image(seed=1)
+
+    matcher = cr.CascadeMatcher(feature_store=FeatureStore())
+    assert len(matcher.match(image1, image2)[0]) > 0
+    assert matcher.match(image1, other) == ([], [], [])
+    assert matcher.stats.pairs == 2 and matcher.stats.accepted == 1
+    assert matcher.stats.rejected['coarse'] + matcher.stats.rejected['homography'] == 1
+
+    total = cr.CascadeStats()
+    total.merge(matcher.stats)
+    total.merge(matcher.stats)
+    assert total.pairs == 4 and total.accepted == 2
+
+
+def test_pyramid_matcher():
+    M = np.array([[0.95, 0.05, 15], [-0.03, 1.02, 10], [0.00002, 0.00001, 1]])
+    image1 = textured_image(size=800, seed=0)
+    image2 = cv2.warpPerspective(image1, M, (800, 800))
+
+    def reprojection_errors(matches, kp1, kp2):
+        pts1 = cv2.KeyPoint_convert(kp1)[[m.queryIdx for m in matches]].reshape(-1, 1, 2).astype(np.float64)
+        pts2 = cv2.KeyPoint_convert(kp2)[[m.trainIdx for m in matches]]
+        return np.hypot(*(cv2.perspectiveTransform(pts1, M).reshape(-1, 2) - pts2).T)
+
+    # Levels of 200, 400 and 800 pixels; the keypoints are always in the coordinates of the input images
+    full = Trace()
+    with full:
+        matches, kp1, kp2 = cr.PyramidMatcher(coarse_pixels=200, max_error=0.0,
+                                              feature_store=FeatureStore()).match(image1, image2)
+    assert len(matches) >= 200
+    assert np.median(reprojection_errors(matches, kp1, kp2)) < 1.5
+    assert full['pyramid'].counts == {'levels': 3, 'stopped_early': 0}
+
+    early = Trace()
+    with early:
+        matches, kp1, kp2 = cr.PyramidMatcher(coarse_pixels=200, target_matches=50, max_error=10.0,
+                                              feature_store=FeatureStore()).match(image1, image2)
+    assert len(matches) >= 50
+    assert np.median(reprojection_errors(matches, kp1, kp2)) < 3.0
+    assert early['pyramid'].counts == {'levels': 2, 'stopped_early': 1}
+    assert early['detect'].counts['images'] < full['detect'].counts['images']
+
+    assert cr.PyramidMatcher(feature_store=FeatureStore()).match(image1, textured_image(size=800, seed=1)) == \
+        ([], [], [])
+
+    store = FeatureStore()
+    assert cr.PyramidMatcher(coarse_pixels=200, feature_store=store).precompute(image1) > 0
+    assert len(store) == 3
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pytest
+
+from arclimb.core.correspondence.descriptor_matching import BruteForceBackend, KDTreeBackend, LSHBackend, \
+    make_backend, ratio_test
+
+
+def recall(matches, reference):
+    expected = {(m.queryIdx, m.trainIdx) for m in reference}
+    return len(expected & {(m.queryIdx, m.trainIdx) for m in matches}) / len(expected)
+
+
+def float_descriptors(n=2000, seed=0):
+    rnd = np.random.RandomState(seed)
+    des2 = rnd.uniform(0, 1, (n, 32)).astype(np.float32)
+    # Queries are noisy copies of half of the train descriptors
+    des1 = des2[:n // 2] + rnd.normal(0, 0.01, (n // 2, 32)).astype(np.float32)
+    return des1, des2
+
+
+def binary_descriptors(n=2000, seed=0):
+    rnd = np.random.RandomState(seed)
+    des2 = rnd.randint(0, 256, (n, 32)).astype(np.uint8)
+    des1 = des2[:n // 2].copy()
+    # Flip a few bits of each query
+    flips = rnd.randint(0, 32 * 8, (n // 2, 4))
+    for i, bits in enumerate(flips):
+        for bit in bits:
+            des1[i, bit // 8] ^= 1 << (bit % 8)
+    return des1, des2
+
+
+def test_kdtree_backend():
+    des1, des2 = float_descriptors()
+    reference = ratio_test(BruteForceBackend(cv2.NORM_L2).knn_match(des1, des2))
+    assert len(reference) == len(des1)
+    assert recall(ratio_test(KDTreeBackend().knn_match(des1, des2)), reference) > 0.9
+
+
+def test_lsh_backend():
+    des1, des2 = binary_descriptors()
+    reference = ratio_test(BruteForceBackend(cv2.NORM_HAMMING).knn_match(des1, des2))
+    assert len(reference) == len(des1)
+    assert recall(ratio_test(LSHBackend().knn_match(des1, des2)), reference) > 0.9
+
+
+@pytest.mark.parametrize('backend', [BruteForceBackend(cv2.NORM_HAMMING), LSHBackend()])
+def test_few_descriptors(backend):
+    des1, des2 = binary_descriptors(n=2)
+    assert backend.knn_match(des1, None) == []
+    assert backend.knn_match(des1[:0], des2) == []
+
+    # With a single train descriptor there is no second neighbour, and the ratio test drops the match
+    knn_matches = backend.knn_match(des1, des2[:1], k=2)
+    assert all(len(neighbours) <= 1 for neighbours in knn_matches)
+    assert ratio_test(knn_matches) == []
+
+
+def test_make_backend():
+    assert isinstance(make_backend('bf', binary=True), BruteForceBackend)
+    assert make_backend(None, binary=True).norm_type == cv2.NORM_HAMMING
+    assert make_backend('bf', binary=False).norm_type == cv2.NORM_L2
+    assert isinstance(make_backend('flann', binary=True), LSHBackend)
+    assert isinstance(make_backend('flann', binary=False), KDTreeBackend)
+
+    backend = KDTreeBackend(checks=8)
+    assert make_backend(backend, binary=False) is backend
+
+    with pytest.raises(ValueError):
+        make_backend('annoy', binary=False)
@@ -0,0 +1,140 @@
+import os
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence import featurestore as fs
+from arclimb.core.correspondence import correspondence as cr
+
+
+class CountingORB(object):
+    """Wraps an ORB detector and counts the calls to detectAndCompute."""
+
+    def __init__(self, nfeatures=500):
+        self._orb = cv2.ORB_create(nfeatures=nfeatures)
+        self.calls = 0
+
+    def getDefaultName(self):
+        return self._orb.getDefaultName()
+
+    def getMaxFeatures(self):
+        return self._orb.getMaxFeatures()
+
+    def detectAndCompute(self, image, mask):
+        self.calls += 1
+        return self._orb.detectAndCompute(image, mask)
+
+
+def random_image(seed=0):
+    rnd = np.random.RandomState(seed)
+    return cv2.GaussianBlur(rnd.randint(0, 256, (200, 200)).astype(np.uint8), (5, 5), 0)
+
+
+def assert_same_features(result_a, result_b):
+    kp_a, des_a = result_a
+    kp_b, des_b = result_b
+    assert [kp.pt for kp in kp_a] == [kp.pt for kp in kp_b]
+    assert [(kp.size, kp.angle, kp.octave) for kp in kp_a] == [(kp.size, kp.angle, kp.octave) for kp in kp_b]
+    assert np.array_equal(des_a, des_b)
+
+
+def test_detector_key():
+    assert fs.detector_key(cv2.ORB_create(nfeatures=100)) == fs.detector_key(cv2.ORB_create(nfeatures=100))
+    assert fs.detector_key(cv2.ORB_create(nfeatures=100)) != fs.detector_key(cv2.ORB_create(nfeatures=200))
+
+
+def test_memory_cache():
+    store = fs.FeatureStore(max_entries=2)
+    orb = CountingORB()
+    image1, image2, image3 = random_image(1), random_image(2), random_image(3)
+
+    result = store.detect_and_compute(orb, image1)
+    assert store.detect_and_compute(orb, image1.copy()) is result
+    assert orb.calls == 1
+
+    store.detect_and_compute(CountingORB(nfeatures=100), image1)
+    store.detect_and_compute(orb, image2)
+    store.detect_and_compute(orb, image3)
+    assert len(store) == 2
+
+    # The first entry was evicted
+    store.detect_and_compute(orb, image1)
+    assert orb.calls == 4
+
+
+def test_disk_cache(tmpdir):
+    orb = CountingORB()
+    image = random_image()
+
+    result = fs.FeatureStore(cache_dir=str(tmpdir)).detect_and_compute(orb, image)
+    assert_same_features(fs.FeatureStore(cache_dir=str(tmpdir)).detect_and_compute(orb, image), result)
+    assert orb.calls == 1
+
+    # Images without keypoints
+    blank = np.zeros((50, 50), np.uint8)
+    fs.FeatureStore(cache_dir=str(tmpdir)).detect_and_compute(orb, blank)
+    kp, des = fs.FeatureStore(cache_dir=str(tmpdir)).detect_and_compute(orb, blank)
+    assert len(kp) == 0 and des is None
+
+
+def features_on_disk(store):
+    return len([name for name in os.listdir(store.cache_dir) if name.endswith('.npy')])
+
+
+def test_register_source(tmpdir):
+    path = os.path.join(str(tmpdir), 'image.png')
+    store = fs.FeatureStore(cache_dir=os.path.join(str(tmpdir), 'cache'))
+    orb = CountingORB()
+
+    cv2.imwrite(path, random_image(1))
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    store.register_source(path, image)
+    store.detect_and_compute(orb, image)
+    assert len(store) == 1 and features_on_disk(store) == 2
+
+    # A second image loaded from the same file (e.g. at another resolution)
+    small = cv2.resize(image, (50, 50))
+    store.register_source(path, small)
+    store.detect_and_compute(orb, small)
+    assert len(store) == 2 and features_on_disk(store) == 4
+
+    cv2.imwrite(path, random_image(2))
+    os.utime(path, ns=(0, 0))
+    store.register_source(path, cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+    assert len(store) == 0 and features_on_disk(store) == 0
+
+
+def test_register_source_across_runs(tmpdir):
+    path = os.path.join(str(tmpdir), 'image.png')
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+
+    cv2.imwrite(path, random_image(1))
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    store = fs.FeatureStore(cache_dir=cache_dir)
+    store.register_source(path, image)
+    store.detect_and_compute(CountingORB(), image)
+
+    # The file is unchanged: the entries are kept
+    store = fs.FeatureStore(cache_dir=cache_dir)
+    store.register_source(path, image)
+    assert features_on_disk(store) == 2
+
+    # The file changed while no store was using it
+    cv2.imwrite(path, random_image(2))
+    os.utime(path, ns=(0, 0))
+    store = fs.FeatureStore(cache_dir=cache_dir)
+    store.register_source(path, cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+    assert features_on_disk(store) == 0
+
+    store.invalidate(path)
+    assert os.listdir(os.path.join(cache_dir, 'sources')) == []
+
+
+def test_matchers_use_store():
+    store = fs.FeatureStore()
+    image1, image2 = random_image(1), random_image(2)
+
+    matcher = cr.ORBMatcher(feature_store=store)
+    matches, kp1, kp2 = matcher.match(image1, image2)
+    assert len(store) == 2
+    assert matcher.match(image1, image2)[1] is kp1
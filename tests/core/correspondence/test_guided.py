@@ -0,0 +1,76 @@
+import math
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence import guided
+
+
+def test_hamming_distances():
+    rnd = np.random.RandomState(0)
+    des1 = rnd.randint(0, 256, (50, 32)).astype(np.uint8)
+    des2 = rnd.randint(0, 256, (50, 32)).astype(np.uint8)
+
+    expected = [cv2.norm(d1, d2, normType=cv2.NORM_HAMMING) for d1, d2 in zip(des1, des2)]
+    assert guided.hamming_distances(des1, des2).tolist() == expected
+
+
+def naive_guided_match(pts1, des1, pts2, des2, radius, ratio=0.75):
+    result = []
+    for i, pt1 in enumerate(pts1):
+        candidates = sorted((cv2.norm(des1[i], des2[j], normType=cv2.NORM_HAMMING), j)
+                            for j, pt2 in enumerate(pts2) if math.hypot(*(pt1 - pt2)) <= radius)
+        if len(candidates) == 1 or (len(candidates) > 1 and candidates[0][0] < ratio * candidates[1][0]):
+            result.append((i, candidates[0][1], candidates[0][0]))
+    return result
+
+
+def test_guided_match():
+    rnd = np.random.RandomState(1)
+    pts1 = rnd.uniform(0, 100, (300, 2))
+    pts2 = rnd.uniform(0, 100, (300, 2))
+    # Few distinct descriptors, so that there are many ties
+    des1 = rnd.randint(0, 4, (300, 1)).astype(np.uint8)
+    des2 = rnd.randint(0, 4, (300, 1)).astype(np.uint8)
+
+    for radius in [0.0, 3.0, 10.0]:
+        query_idx, train_idx, distances = guided.guided_match(pts1, des1, pts2, des2, radius)
+        assert list(zip(query_idx, train_idx, distances)) == naive_guided_match(pts1, des1, pts2, des2, radius)
+
+    query_idx, _, _ = guided.guided_match(pts1, des1, np.empty((0, 2)), des2[:0], 10.0)
+    assert len(query_idx) == 0
+
+
+def test_spatial_suppression():
+    rnd = np.random.RandomState(2)
+    points = rnd.uniform(-50, 50, (500, 2))
+
+    for min_distance in [0.0, 2.5, 10.0]:
+        expected = []
+        for i, pt in enumerate(points):
+            if all(math.hypot(*(pt - points[j])) > min_distance for j in expected):
+                expected.append(i)
+        assert guided.spatial_suppression(points, min_distance) == expected
+
+    assert guided.spatial_suppression([(0, 0), (0, 0), (1, 1)], 0.0) == [0, 2]
+
+
+def test_adaptive_suppression():
+    rnd = np.random.RandomState(2)
+    # A dense cluster of strong points in a corner, and weaker points everywhere
+    points = np.concatenate([rnd.uniform(0, 10, (2000, 2)), rnd.uniform(0, 100, (500, 2))])
+    responses = np.concatenate([rnd.uniform(1, 2, 2000), rnd.uniform(0, 1, 500)])
+
+    selected = guided.adaptive_suppression(points, responses, 100)
+    assert len(selected) == 100 and len(set(selected)) == 100
+    assert np.all(np.diff(responses[selected]) <= 0)
+    assert np.mean(np.all(points[selected] < 10, axis=1)) < 0.1
+
+    # With less points than requested, all of them are kept
+    assert sorted(guided.adaptive_suppression(points[:50], responses[:50], 100)) == list(range(50))
+
+
+def test_grid_coverage():
+    assert guided.grid_coverage(np.empty((0, 2)), 100, 100) == 0.0
+    assert guided.grid_coverage([[1, 1], [2, 2]], 100, 100, grid_size=2) == 0.25
+    assert guided.grid_coverage([[1, 1], [99, 1], [1, 99], [100, 100]], 100, 100, grid_size=2) == 1.0
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+import pytest
+
+from arclimb.core.correspondence.homography import METHODS, HomographyEstimator, homography_is_plausible
+
+M = np.array([[0.9, 0.1, 20], [-0.05, 1.1, 10], [0.0001, 0, 1]])
+
+
+def synthetic_points(n=200, outlier_ratio=0.3, noise=0.5, seed=0):
+    rnd = np.random.RandomState(seed)
+    src = rnd.uniform(0, 500, (n, 2))
+    dst = cv2.perspectiveTransform(src.reshape(-1, 1, 2), M).reshape(-1, 2) + rnd.normal(0, noise, (n, 2))
+    outliers = rnd.rand(n) < outlier_ratio
+    dst[outliers] = rnd.uniform(0, 500, (np.count_nonzero(outliers), 2))
+    return src, dst, outliers
+
+
+@pytest.mark.parametrize('method', sorted(set(METHODS) - {'lsq'}))
+def test_estimate(method):
+    src, dst, outliers = synthetic_points()
+    # Outliers get the worst scores, as PROSAC expects
+    scores = outliers + np.random.RandomState(1).rand(len(src))
+
+    estimate = HomographyEstimator(method, threshold=3.0).estimate(src, dst, scores=scores)
+    assert estimate is not None
+    H = estimate.homography / estimate.homography[2, 2]
+    assert np.allclose(H, M, rtol=0.05, atol=0.5)
+
+    # The inliers are in the order of the input, in spite of the sorting by score
+    assert np.count_nonzero(estimate.inliers & outliers) <= 2
+    assert np.count_nonzero(estimate.inliers) >= 0.9 * np.count_nonzero(~outliers)
+    assert estimate.inlier_ratio == pytest.approx(np.count_nonzero(estimate.inliers) / len(src))
+    assert 0.5 < estimate.confidence < estimate.inlier_ratio
+
+
+def test_confidence():
+    estimator = HomographyEstimator(threshold=3.0)
+    src, dst, _ = synthetic_points(outlier_ratio=0)
+    exact = estimator.evaluate(src, cv2.perspectiveTransform(src.reshape(-1, 1, 2), M).reshape(-1, 2), M)
+    noisy = estimator.evaluate(src, dst, M)
+    assert exact.confidence == pytest.approx(1.0)
+    assert exact.rms_residual == pytest.approx(0.0, abs=1e-6)
+    assert 0 < noisy.confidence < exact.confidence
+
+
+def test_hopeless_inputs():
+    estimator = HomographyEstimator(threshold=3.0, min_inliers=10)
+    rnd = np.random.RandomState(2)
+    # Too few points, points on a line, and no relation between the points at all
+    assert estimator.estimate(rnd.uniform(0, 500, (5, 2)), rnd.uniform(0, 500, (5, 2))) is None
+    line = np.stack([np.linspace(0, 500, 50)] * 2, axis=1)
+    assert estimator.estimate(line, line) is None
+    assert estimator.estimate(rnd.uniform(0, 500, (200, 2)), rnd.uniform(0, 500, (200, 2))) is None
+
+
+def test_implausible_homography():
+    src, _, _ = synthetic_points(outlier_ratio=0)
+    mirrored = src * [-1, 1] + [500, 0]
+    assert HomographyEstimator(threshold=3.0).estimate(src, mirrored) is None
+    # The scale can only be checked against the size of the images
+    shrunk = src * 0.1
+    size = (500, 500)
+    assert HomographyEstimator(threshold=3.0).estimate(src, shrunk) is not None
+    assert HomographyEstimator(threshold=3.0).estimate(src, shrunk, size1=size, size2=size) is None
+    assert HomographyEstimator(threshold=3.0, max_scale=20).estimate(src, shrunk, size1=size, size2=size) is not None
+
+
+def test_homography_is_plausible():
+    size = (400, 300)
+    assert homography_is_plausible(np.eye(3), size, size)
+    assert homography_is_plausible(M, size, size)
+    assert not homography_is_plausible(None, size, size)
+    # Mirrored
+    assert not homography_is_plausible(np.array([[-1, 0, 400], [0, 1, 0], [0, 0, 1]]), size, size)
+    # Scaled down too much
+    assert not homography_is_plausible(np.diag([0.1, 0.1, 1]), size, size)
+    # The horizon crosses the image
+    assert not homography_is_plausible(np.array([[1, 0, 0], [0, 1, 0], [-0.005, 0, 1]]), size, size)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        HomographyEstimator('ransack')
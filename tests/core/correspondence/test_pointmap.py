@@ -0,0 +1,166 @@
+import cv2
+import numpy as np
+import pytest
+
+import arclimb.core.graph as gr
+from arclimb.core.correspondence.homography import HomographyEstimator
+from arclimb.core.correspondence.pointmap import PointMap, HomographicPointMap
+
+M = np.array([[0.9, 0.1, 0.05], [-0.05, 1.1, 0.02], [0.1, 0.05, 1]])
+
+
+def create_pointmap():
+    pts = np.random.RandomState(0).uniform(0, 1, (20, 2))
+    mapped = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    return HomographicPointMap([gr.Correspondence(gr.Point(*p1), gr.Point(*p2)) for p1, p2 in zip(pts, mapped)])
+
+
+class TranslationPointMap(PointMap):
+    """PointMap only implementing map and inverse_map, to test the default implementation of map_many."""
+
+    def __init__(self, correspondences):
+        super().__init__(correspondences)
+
+    def map(self, point):
+        return point + (1, 2), 0.5
+
+    def inverse_map(self, point):
+        return point - (1, 2), 0.5
+
+
+class IncompletePointMap(PointMap):
+    def __init__(self, correspondences):
+        super().__init__(correspondences)
+
+    def map(self, point):
+        return point, None
+
+
+def test_map_many():
+    pointmap = create_pointmap()
+    points = np.random.RandomState(1).uniform(0, 1, (50, 2))
+
+    mapped, confidence = pointmap.map_many(points)
+    assert mapped.shape == (50, 2)
+    # All the correspondences are exact, so the confidence of the homography is (almost) 1
+    assert np.allclose(confidence, pointmap.getEstimate().confidence) and confidence[0] > 0.99
+    assert np.allclose(mapped, cv2.perspectiveTransform(points.reshape(-1, 1, 2), M).reshape(-1, 2))
+    for point, mapped_point in zip(points, mapped):
+        assert np.allclose(pointmap.map(gr.Point(*point))[0].asTuple(), mapped_point)
+
+    assert pointmap.map_many(np.empty((0, 2)))[0].shape == (0, 2)
+
+
+def test_inverse_map():
+    pointmap = create_pointmap()
+    points = np.random.RandomState(1).uniform(0, 1, (50, 2))
+
+    assert np.allclose(pointmap.inverse_map_many(pointmap.map_many(points)[0])[0], points)
+    assert pointmap.getInversePerspectiveTransformation() is pointmap.getInversePerspectiveTransformation()
+
+    p, _ = pointmap.inverse_map(pointmap.map(gr.Point(0.3, 0.4))[0])
+    assert np.allclose(p.asTuple(), (0.3, 0.4))
+
+
+def test_default_map_many():
+    mapped, confidence = TranslationPointMap([]).map_many(np.array([[0, 0], [1, 1]]))
+    assert mapped.tolist() == [[1, 2], [2, 3]]
+    assert confidence.tolist() == [0.5, 0.5]
+
+    mapped, confidence = TranslationPointMap([]).inverse_map_many(mapped)
+    assert mapped.tolist() == [[0, 0], [1, 1]]
+    assert confidence.tolist() == [0.5, 0.5]
+
+
+def test_abstract_inverse_map():
+    # A PointMap without inverse_map can't be created
+    with pytest.raises(TypeError):
+        IncompletePointMap([])
+
+
+def test_not_enough_correspondences():
+    with pytest.raises(ValueError):
+        HomographicPointMap([gr.Correspondence(gr.Point(0, 0), gr.Point(0, 0))])
+
+
+def test_initial_homography():
+    rnd = np.random.RandomState(2)
+    pts = rnd.uniform(0, 1, (30, 2))
+    mapped = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    mapped[:5] += rnd.uniform(0.2, 0.5, (5, 2))  # outliers
+    correspondences = [gr.Correspondence(gr.Point(*p1), gr.Point(*p2)) for p1, p2 in zip(pts, mapped)]
+
+    # A slightly wrong hypothesis is refined on the inliers
+    initial = M + np.array([[0.01, 0, 0.005], [0, -0.01, 0], [0, 0, 0]])
+    pointmap = HomographicPointMap(correspondences, 0.05, initialHomography=initial)
+    M_fit = pointmap.getPerspectiveTransformation()
+    assert np.allclose(M_fit / M_fit[2, 2], M / M[2, 2], atol=1e-4)
+
+    # A hypothesis that explains too few correspondences is ignored
+    pointmap = HomographicPointMap(correspondences, 0.05, initialHomography=np.eye(3) * 2)
+    M_fit = pointmap.getPerspectiveTransformation()
+    assert np.allclose(M_fit / M_fit[2, 2], M / M[2, 2], atol=1e-4)
+
+
+def test_degenerate_correspondences():
+    # All the points on a line: no homography is determined by them
+    pts = [gr.Point(x, 2 * x) for x in np.linspace(0, 1, 10)]
+    with pytest.raises(ValueError):
+        HomographicPointMap([gr.Correspondence(p, p) for p in pts])
+
+    # A mirrored copy is not a plausible view of the same scene
+    pts = np.random.RandomState(3).uniform(0, 1, (20, 2))
+    with pytest.raises(ValueError):
+        HomographicPointMap([gr.Correspondence(gr.Point(x, y), gr.Point(1 - x, y)) for x, y in pts.tolist()], 0.01)
+
+
+@pytest.mark.parametrize('n_outliers', [8, 25])
+def test_outliers(n_outliers):
+    rnd = np.random.RandomState(4)
+    pts = rnd.uniform(0, 1, (50, 2))
+    mapped = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    mapped[:n_outliers] = rnd.uniform(0, 1, (n_outliers, 2))
+    correspondences = [gr.Correspondence(gr.Point(*p1), gr.Point(*p2)) for p1, p2 in zip(pts, mapped)]
+
+    # The default threshold is in relative coordinates, so the outliers are told apart
+    pointmap = HomographicPointMap(correspondences)
+    estimate = pointmap.getEstimate()
+    assert not estimate.inliers[:n_outliers].any() and estimate.inliers[n_outliers:].all()
+    assert estimate.inlier_ratio == pytest.approx(1 - n_outliers / 50)
+    assert estimate.confidence < 1 - n_outliers / 50 + 1e-6
+    M_fit = pointmap.getPerspectiveTransformation()
+    assert np.allclose(M_fit / M_fit[2, 2], M / M[2, 2], atol=1e-4)
+
+
+class NoRansacEstimator(HomographyEstimator):
+    """Fails if the full estimation is used instead of refining the initial homography."""
+
+    def estimate(self, *args, **kwargs):
+        raise AssertionError("The initial homography was not used")
+
+
+def test_initial_homography_ignores_outlier():
+    pts = np.random.RandomState(5).uniform(0, 1, (20, 2))
+    mapped = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    mapped[0] += (0.1, -0.05)  # e.g. a correspondence dragged to the wrong place
+    correspondences = [gr.Correspondence(gr.Point(*p1), gr.Point(*p2)) for p1, p2 in zip(pts, mapped)]
+
+    pointmap = HomographicPointMap(correspondences, initialHomography=M,
+                                   estimator=NoRansacEstimator('ransac', HomographicPointMap.DEFAULT_THRESHOLD))
+    M_fit = pointmap.getPerspectiveTransformation()
+    assert np.allclose(M_fit / M_fit[2, 2], M / M[2, 2], atol=1e-4)
+    assert not pointmap.getEstimate().inliers[0] and pointmap.getEstimate().inliers[1:].all()
+
+    # The same with the default estimator
+    M_fit = HomographicPointMap(correspondences, initialHomography=M).getPerspectiveTransformation()
+    assert np.allclose(M_fit / M_fit[2, 2], M / M[2, 2], atol=1e-4)
+
+
+def test_threshold_and_estimator():
+    pts = np.random.RandomState(6).uniform(0, 1, (20, 2))
+    mapped = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+    correspondences = [gr.Correspondence(gr.Point(*p1), gr.Point(*p2)) for p1, p2 in zip(pts, mapped)]
+
+    with pytest.raises(ValueError):
+        HomographicPointMap(correspondences, 0.05, estimator=HomographyEstimator('lmeds', 0.01))
+    HomographicPointMap(correspondences, estimator=HomographyEstimator('lmeds', 0.01))
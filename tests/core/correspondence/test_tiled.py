@@ -0,0 +1,64 @@
+from functools import partial
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence.featurestore import FeatureStore, detector_key
+from arclimb.core.correspondence.tiled import TiledDetector, tile_grid
+
+
+def textured_image(size=600, seed=0):
+    rnd = np.random.RandomState(seed)
+    image = cv2.resize(rnd.uniform(0, 1, (size // 8, size // 8)).astype(np.float32), (size, size),
+                       interpolation=cv2.INTER_CUBIC)
+    return cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+def test_tile_grid():
+    tiles = tile_grid(250, 120, 100)
+    assert len(tiles) == 6
+    assert tiles[0] == (0, 0, 100, 100)
+    assert tiles[-1] == (200, 100, 250, 120)
+    assert sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in tiles) == 250 * 120
+
+
+def test_same_keypoints_as_whole_image():
+    image = textured_image()
+    # Without a limit on the number of keypoints, tiling must not change them, nor their descriptors
+    factory = partial(cv2.ORB_create, nfeatures=100000, nlevels=1)
+    kp, des = factory().detectAndCompute(image, None)
+    tiled_kp, tiled_des = TiledDetector(factory, tile_size=128, overlap=64, workers=4).detectAndCompute(image)
+
+    expected = {k.pt: d.tobytes() for k, d in zip(kp, des)}
+    result = {k.pt: d.tobytes() for k, d in zip(tiled_kp, tiled_des)}
+    assert len(tiled_kp) == len(kp)
+    assert result == expected
+
+
+def test_max_keypoints():
+    image = textured_image()
+    # A bright corner that would attract most of the keypoints of the whole image
+    image[:100, :100] = np.random.RandomState(1).randint(0, 256, (100, 100))
+
+    detector = TiledDetector(partial(cv2.ORB_create, nfeatures=300), tile_size=200, max_keypoints=300)
+    kp, des = detector.detectAndCompute(image)
+    assert len(kp) == 300 and des.shape == (300, 32)
+
+    pts = cv2.KeyPoint_convert(kp)
+    assert np.mean((pts[:, 0] < 100) & (pts[:, 1] < 100)) < 0.2
+    # Keypoints are found all over the image
+    counts, _, _ = np.histogram2d(pts[:, 0], pts[:, 1], bins=3, range=[[0, 600], [0, 600]])
+    assert counts.min() > 0
+
+
+def test_feature_store():
+    image = textured_image(300)
+    factory = partial(cv2.ORB_create, nfeatures=200)
+    assert detector_key(TiledDetector(factory, tile_size=100)) != detector_key(TiledDetector(factory, tile_size=150))
+    assert detector_key(TiledDetector(factory, tile_size=100)) == detector_key(TiledDetector(factory, tile_size=100))
+
+    store = FeatureStore()
+    detector = TiledDetector(factory, tile_size=100)
+    kp, des = store.detect_and_compute(detector, image)
+    assert len(kp) > 0 and len(store) == 1
+    assert store.detect_and_compute(TiledDetector(factory, tile_size=100), image)[1] is des
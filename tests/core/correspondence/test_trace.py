@@ -0,0 +1,69 @@
+import os
+
+import cv2
+import numpy as np
+
+from arclimb.core.correspondence import correspondence as cr
+from arclimb.core.correspondence.batch import find_all_correspondences
+from arclimb.core.correspondence.featurestore import FeatureStore
+from arclimb.core.correspondence.trace import Trace, current_trace, stage
+
+
+def test_stages():
+    trace = Trace()
+    assert current_trace() is None
+    with stage('ignored') as counts:
+        counts['n'] = 1
+
+    with trace:
+        assert current_trace() is trace
+        for i in range(3):
+            with stage('work') as counts:
+                counts['in'] = 10
+                counts['out'] = i
+    assert current_trace() is None
+
+    assert list(trace.stages) == ['work']
+    assert trace['work'].calls == 3
+    assert trace['work'].counts == {'in': 30, 'out': 3}
+    assert trace['work'].seconds >= 0
+
+    total = Trace.from_dict(trace.to_dict())
+    total.merge(trace)
+    assert total['work'].calls == 6 and total['work'].counts == {'in': 60, 'out': 6}
+    assert 'work' in str(total)
+
+
+def shifted_pair(size=400):
+    rnd = np.random.RandomState(0)
+    image = cv2.resize(rnd.randint(0, 256, (100, 100)).astype(np.uint8), (size, size), interpolation=cv2.INTER_CUBIC)
+    return image, cv2.warpAffine(image, np.float32([[1, 0, 10], [0, 1, 5]]), (size, size))
+
+
+def test_matcher_stages():
+    image1, image2 = shifted_pair()
+    trace = Trace()
+    finder = cr.CorrespondenceFinder(cr.HomographyFilter(cr.ORBMatcher(feature_store=FeatureStore())), trace)
+    correspondences = finder.find_correspondences(image1, image2)
+
+    assert list(trace.stages) == ['detect', 'knn_match', 'ratio_test', 'homography', 'homography_filter', 'total']
+    assert trace['detect'].calls == 2 and trace['detect'].counts['keypoints'] > 0
+    assert trace['ratio_test'].counts['in'] == trace['knn_match'].counts['candidates']
+    assert trace['homography_filter'].counts['in'] == trace['ratio_test'].counts['out']
+    assert trace['homography_filter'].counts['out'] == len(correspondences)
+    assert trace['total'].counts == {'pairs': 1, 'correspondences': len(correspondences)}
+
+
+def test_batch_trace(tmpdir):
+    paths = [os.path.join(str(tmpdir), name) for name in ['a.png', 'b.png']]
+    for path, image in zip(paths, shifted_pair()):
+        cv2.imwrite(path, image)
+    pairs = [tuple(paths)] * 3
+
+    for workers in [1, 2]:
+        trace = Trace()
+        results = list(find_all_correspondences(pairs, workers=workers, trace=trace))
+        assert trace['total'].counts['pairs'] == 3
+        assert trace['total'].counts['correspondences'] == sum(len(rows) for _, _, rows in results)
+        assert trace['load'].counts['images'] == 6
+        assert 'guided_match' in trace and 'suppression' in trace
@@ -1,3 +1,9 @@
+import copy
+import pickle
+
+import numpy as np
+import pytest
+
 import arclimb.core.graph as gr
 
 
@@ -9,6 +15,62 @@ def test_create_point():
     _ = gr.Point(5.0, 10.0)
 
 
+class TestPoint(object):
+    def test_constructors(self):
+        p = gr.Point(5.0, 10.0)
+        for q in [gr.Point(p), gr.Point((5.0, 10.0)), gr.Point([5.0, 10.0]), gr.Point(x=5.0, y=10.0),
+                  gr.Point.fromTuple((5.0, 10.0)), gr.Point.from_dict({'x': 5.0, 'y': 10.0})]:
+            assert q == p and (q.x, q.y) == (5.0, 10.0)
+        with pytest.raises(TypeError):
+            gr.Point(1.0, 2.0, 3.0)
+        with pytest.raises(TypeError):
+            gr.Point(1.0, y=2.0)
+
+    def test_immutable(self):
+        p = gr.Point(1.0, 2.0)
+        with pytest.raises(AttributeError):
+            p.x = 3.0
+        with pytest.raises(AttributeError):
+            p[1] = 3.0
+        with pytest.raises(AttributeError):
+            p.z = 3.0
+
+    def test_operators(self):
+        p = gr.Point(1.0, 2.0)
+        assert p + gr.Point(1.0, 1.0) == (2.0, 3.0)
+        assert p + (1.0, 1.0) == gr.Point(2.0, 3.0)
+        assert (1.0, 1.0) + p == gr.Point(2.0, 3.0)
+        assert p - (1.0, 1.0) == gr.Point(0.0, 1.0)
+        assert (1.0, 1.0) - p == gr.Point(0.0, -1.0)
+        assert 2 * p == p * 2 == gr.Point(2.0, 4.0)
+        assert -p == abs(-p) * -1
+        assert p != (1.0, 3.0)
+        assert p.dist((4.0, 6.0)) == 5.0
+
+    def test_hash(self):
+        p = gr.Point(1.0, 2.0)
+        assert hash(p) == hash(p) == hash(gr.Point((1.0, 2.0))) == hash(p + (0.0, 0.0))
+        assert len({p, gr.Point(1.0, 2.0), gr.Point(2.0, 1.0)}) == 2
+
+    def test_qt(self):
+        QtCore = pytest.importorskip('PyQt5.QtCore')
+        from arclimb.core.graph import qt
+        p = gr.Point(QtCore.QPointF(1.0, 2.0))
+        assert p == gr.Point.fromQPointF(QtCore.QPointF(1.0, 2.0)) == qt.from_qpointf(QtCore.QPointF(1.0, 2.0))
+        assert p.asQPointF() == qt.as_qpointf(p) == QtCore.QPointF(1.0, 2.0)
+        assert p.inRect(QtCore.QRectF(0.0, 0.0, 2.0, 2.0)) and not p.inRect(QtCore.QRectF(0.0, 0.0, 1.0, 1.0))
+        assert p.toRelativeCoordinates(QtCore.QRectF(0.0, 0.0, 2.0, 4.0)) == (0.5, 0.5)
+
+    def test_pickle(self):
+        p = gr.Point(1.0, 2.0)
+        hash(p)
+        q = pickle.loads(pickle.dumps(p))
+        assert q == p and hash(q) == hash(p)
+        corr = gr.Correspondence(p, gr.Point(3.0, 4.0))
+        assert pickle.loads(pickle.dumps(corr)) == corr
+        assert copy.deepcopy(corr) == corr
+
+
 def test_create_correspondence():
     _ = gr.Correspondence(gr.Point(5.0, 10.0), gr.Point(1.0, 3.0))
 
@@ -110,4 +172,109 @@ class TestGraph(object):
         sample_graph = TestGraph.create_sample_graph()
         graph_dict = sample_graph.to_dict()
         reconstructed = gr.Graph.from_dict(graph_dict)
-        TestGraph.assert_graphs_match(sample_graph, reconstructed)
\ No newline at end of file
+        TestGraph.assert_graphs_match(sample_graph, reconstructed)
+
+    def test_duplicate_correspondences(self):
+        graph = gr.Graph()
+        corr = gr.Correspondence(gr.Point(0.25, 0.5), gr.Point(0.75, 1.0))
+        graph.add_correspondence('view1.png', 'view2.png', corr)
+        graph.add_correspondence('view1.png', 'view2.png', gr.Correspondence(gr.Point(0.25, 0.5), gr.Point(0.75, 1.0)))
+
+        corrs = graph.get_correspondences('view1.png', 'view2.png')
+        assert len(corrs) == 1
+        assert corrs == {corr}
+
+    def test_reversed_correspondences(self):
+        graph = gr.Graph()
+        graph.add_node(gr.Node('view1.png'))
+        graph.add_node(gr.Node('view2.png'))
+        corr = gr.Correspondence(gr.Point(1, 2), gr.Point(3, 4))
+        graph.add_correspondence('view1.png', 'view2.png', corr)
+
+        reversed_corr = gr.Correspondence(gr.Point(3, 4), gr.Point(1, 2))
+        assert set(graph.get_correspondences('view2.png', 'view1.png')) == {reversed_corr}
+
+        graph.add_correspondence('view2.png', 'view1.png', gr.Correspondence(gr.Point(5, 6), gr.Point(7, 8)))
+        assert gr.Correspondence(gr.Point(7, 8), gr.Point(5, 6)) in graph.get_correspondences('view1.png', 'view2.png')
+
+        graph.remove_correspondence('view2.png', 'view1.png', reversed_corr)
+        assert corr not in graph.get_correspondences('view1.png', 'view2.png')
+
+        edge_dict = graph.to_dict()['edges'][0]
+        assert edge_dict['src'] == 'view1.png'
+        assert edge_dict['correspondences'] == [{'point1': {'x': 7, 'y': 8}, 'point2': {'x': 5, 'y': 6}}]
+
+    def test_set_correspondences(self):
+        graph = TestGraph.create_sample_graph()
+        corrs = [gr.Correspondence(gr.Point(5, 6), gr.Point(7, 8)), gr.Correspondence(gr.Point(5, 6), gr.Point(7, 8))]
+        graph.set_correspondences('node2', 'node1', corrs)
+
+        assert graph.get_correspondences('node2', 'node1') == set(corrs)
+        assert graph.get_correspondences('node1', 'node2') == {gr.Correspondence(gr.Point(7, 8), gr.Point(5, 6))}
+
+    def test_correspondence_array(self):
+        graph = TestGraph.create_sample_graph()
+
+        array = graph.get_correspondence_array('node1', 'node2')
+        assert array.shape == (2, 4)
+        assert array.dtype == np.float32
+        assert not array.flags.writeable
+        assert sorted(array.tolist()) == [[1, 2, 2, 3], [2, 1, 3, 2]]
+        assert sorted(graph.get_correspondence_array('node2', 'node1').tolist()) == [[2, 3, 1, 2], [3, 2, 2, 1]]
+        assert graph.get_correspondence_array('node1', 'node4').shape == (0, 4)
+
+        graph.set_correspondence_array('node1', 'node4', np.array([[0, 0, 1, 1], [0, 0, 1, 1], [1, 1, 2, 2]]))
+        assert graph.get_correspondences('node1', 'node4') == {
+            gr.Correspondence(gr.Point(0, 0), gr.Point(1, 1)),
+            gr.Correspondence(gr.Point(1, 1), gr.Point(2, 2))
+        }
+
+    def test_edges_and_neighbours(self):
+        graph = gr.Graph()
+        for name in ['a', 'b', 'c', 'd']:
+            graph.add_node(gr.Node(name))
+        graph.add_edge('a', 'b')
+        graph.add_edge('c', 'a')
+        graph.add_edge('b', 'c')
+
+        assert [node.id for node in graph.iter_nodes()] == ['a', 'b', 'c', 'd']
+        assert list(graph.get_edges()) == [('a', 'b'), ('c', 'a'), ('b', 'c')]
+        assert sorted(graph.get_neighbours('a')) == ['b', 'c']
+        assert list(graph.get_neighbours('d')) == []
+
+        # Removing a node removes its edges, also from its neighbours
+        graph.remove_node('a')
+        assert list(graph.get_edges()) == [('b', 'c')]
+        assert list(graph.get_neighbours('b')) == ['c']
+        assert not graph.has_edge('b', 'a')
+
+        # A node added again with the same id has no edges
+        graph.add_node(gr.Node('a'))
+        assert list(graph.get_neighbours('a')) == []
+        assert not graph.has_edge('a', 'c')
+
+    def test_add_edge_adds_nodes(self):
+        graph = gr.Graph()
+        graph.add_correspondence('x', 'y', gr.Correspondence(gr.Point(0, 0), gr.Point(1, 1)))
+        assert graph.get_nodes() == {gr.Node('x'), gr.Node('y')}
+        assert list(graph.get_edges()) == [('x', 'y')]
+
+    def test_missing_edges(self):
+        graph = TestGraph.create_sample_graph()
+        with pytest.raises(KeyError):
+            graph.remove_edge('node1', 'missing')
+        with pytest.raises(KeyError):
+            graph.remove_node('missing')
+        with pytest.raises(KeyError):
+            graph.get_edge_revision('node1', 'missing')
+
+    def test_edge_revision(self):
+        graph = TestGraph.create_sample_graph()
+        revision = graph.get_edge_revision('node1', 'node2')
+        assert graph.get_edge_revision('node2', 'node1') == revision
+
+        graph.add_correspondence('node2', 'node1', gr.Correspondence(gr.Point(9, 9), gr.Point(8, 8)))
+        assert graph.get_edge_revision('node1', 'node2') > revision
+        graph.remove_edge('node1', 'node2')
+        graph.add_edge('node1', 'node2')
+        assert graph.get_edge_revision('node1', 'node2') > revision
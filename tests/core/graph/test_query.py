@@ -0,0 +1,61 @@
+import numpy as np
+
+import arclimb.core.graph as gr
+from arclimb.core.graph.query import GraphQuery
+
+
+def translation_correspondences(dx, dy, n=30, seed=0):
+    rnd = np.random.RandomState(seed)
+    return [gr.Correspondence(gr.Point(x, y), gr.Point(x + dx, y + dy)) for x, y in rnd.uniform(0, 1, (n, 2))]
+
+
+def create_chain_graph():
+    graph = gr.Graph()
+    for node_id in ['a', 'b', 'c', 'd']:
+        graph.add_node(gr.Node(node_id))
+
+    graph.set_correspondences('a', 'b', translation_correspondences(0.1, 0.0))
+    graph.set_correspondences('c', 'b', translation_correspondences(0.0, -0.2))
+    return graph
+
+
+def test_map_point_along_path():
+    graph = create_chain_graph()
+
+    point, confidence = graph.map_point('a', 'c', gr.Point(0.5, 0.5))
+    assert np.allclose(point.asTuple(), (0.6, 0.7), atol=1e-4)
+    assert confidence > 0.9
+
+    point, confidence = graph.map_point('c', 'a', gr.Point(0.6, 0.7))
+    assert np.allclose(point.asTuple(), (0.5, 0.5), atol=1e-4)
+
+    assert graph.map_point('a', 'd', gr.Point(0.5, 0.5)) == (None, 0.0)
+
+
+def test_invalidation():
+    graph = create_chain_graph()
+    query = GraphQuery(graph)
+    assert np.allclose(query.map_point('a', 'c', gr.Point(0.5, 0.5))[0].asTuple(), (0.6, 0.7), atol=1e-4)
+
+    graph.set_correspondences('a', 'b', translation_correspondences(0.3, 0.0))
+    assert np.allclose(query.map_point('a', 'c', gr.Point(0.5, 0.5))[0].asTuple(), (0.8, 0.7), atol=1e-4)
+
+    graph.set_correspondences('a', 'c', translation_correspondences(0.3, 0.2))
+    mappings = query.map_point_paths('a', 'c', gr.Point(0.5, 0.5))
+    assert set(m.path for m in mappings) == {('a', 'c'), ('a', 'b', 'c')}
+
+    graph.remove_edge('a', 'c')
+    assert [m.path for m in query.map_point_paths('a', 'c', gr.Point(0.5, 0.5))] == [('a', 'b', 'c')]
+
+
+def test_edge_quality():
+    graph = create_chain_graph()
+    corrs = translation_correspondences(0.1, 0.0, n=10) + translation_correspondences(0.5, 0.5, n=4, seed=1)
+    graph.set_correspondences('a', 'd', corrs)
+
+    query = GraphQuery(graph)
+    _, quality = query.get_edge_transform('a', 'd')
+    assert np.isclose(quality, 10 / 14 * 10 / GraphQuery.FULL_CONFIDENCE_INLIERS)
+
+    graph.set_correspondences('a', 'd', corrs[:3])
+    assert query.get_edge_transform('a', 'd') == (None, 0.0)
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+import arclimb.core.graph as gr
+from arclimb.core.retrieval import RetrievalIndex, train_binary_vocabulary
+
+
+def random_texture(seed, size=400):
+    rnd = np.random.RandomState(seed)
+    image = np.zeros((size, size), np.float32)
+    for scale in [4, 16]:
+        noise = rnd.uniform(0, 1, (size // scale, size // scale)).astype(np.float32)
+        image += cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    return cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+def test_train_binary_vocabulary():
+    rnd = np.random.RandomState(0)
+    centers = rnd.randint(0, 256, (4, 32)).astype(np.uint8)
+    # Flip a few random bits of each center
+    noise = np.packbits(rnd.uniform(0, 1, (400, 256)) < 0.02, axis=1)
+    descriptors = centers[np.arange(400) % 4] ^ noise
+
+    vocabulary = train_binary_vocabulary(descriptors, 4)
+    assert sorted(map(bytes, vocabulary)) == sorted(map(bytes, centers))
+
+
+def test_query():
+    images = {'img%d.jpg' % i: random_texture(i) for i in range(8)}
+    index = RetrievalIndex(vocabulary_size=200, min_training_images=5)
+    for node_id in sorted(images)[:6]:
+        index.add(node_id, images[node_id])
+    assert index.vocabulary is not None
+
+    # Incremental additions after training
+    for node_id in sorted(images)[6:]:
+        index.add(node_id, images[node_id])
+    assert len(index) == 8
+
+    for node_id, image in images.items():
+        warped = cv2.warpAffine(image, cv2.getRotationMatrix2D((200, 200), 10, 0.9), (400, 400))
+        result = index.query(warped, k=3)
+        assert len(result) == 3
+        assert result[0][0] == node_id
+
+    index.remove('img3.jpg')
+    assert 'img3.jpg' not in [node_id for node_id, _ in index.query(images['img3.jpg'], k=8)]
+
+
+def test_update_from_graph():
+    graph = gr.Graph()
+    for i in range(3):
+        graph.add_node(gr.Node('img%d.jpg' % i))
+
+    index = RetrievalIndex(vocabulary_size=100)
+    assert index.update_from_graph(graph, lambda node_id: random_texture(int(node_id[3]))) == 3
+    assert index.update_from_graph(graph, lambda node_id: random_texture(int(node_id[3]))) == 0
+    assert index.query(random_texture(1), k=1)[0][0] == 'img1.jpg'
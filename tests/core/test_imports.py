@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+import pytest
+
+import arclimb.core
+
+
+def run_isolated(code: str) -> str:
+    """Runs code in a fresh interpreter, in which PyQt5 can't be imported."""
+    return subprocess.check_output([sys.executable, '-c', "import sys; sys.modules['PyQt5'] = None\n" + code],
+                                   universal_newlines=True)
+
+
+def test_graph_without_qt(tmpdir):
+    labels_file = str(tmpdir.join('labels.json'))
+    output = run_isolated("""
+from arclimb.core import Graph, Node, Correspondence, Point
+from arclimb.core.utils import graph_serialization
+graph = Graph()
+graph.add_correspondence('a', 'b', Correspondence(Point(0.25, 0.5), Point((0.5, 0.75))))
+graph_serialization.to_json(graph, %r)
+graph = graph_serialization.from_json(%r)
+print(len(graph.get_correspondences('b', 'a')), sorted(m for m in ['cv2', 'scipy'] if m in sys.modules))
+""" % (labels_file, labels_file))
+    assert output.split() == ['1', '[]']
+
+
+def test_lazy_exports():
+    output = run_isolated("""
+import arclimb.core
+assert 'cv2' not in sys.modules
+assert 'HomographyEstimator' in dir(arclimb.core)
+print(arclimb.core.HomographyEstimator.__module__, 'cv2' in sys.modules)
+""")
+    assert output.split() == ['arclimb.core.correspondence.homography', 'True']
+
+
+def test_exports():
+    for name in arclimb.core.__all__:
+        assert getattr(arclimb.core, name) is not None
+    assert arclimb.core.correspondence.SIFTMatcher is arclimb.core.SIFTMatcher
+    with pytest.raises(AttributeError):
+        _ = arclimb.core.NotExported
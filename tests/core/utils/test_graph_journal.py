@@ -0,0 +1,150 @@
+import os
+
+import numpy as np
+
+import tests.core.graph.test_graph as tg
+import arclimb.core.utils.graph_serialization as gs
+from arclimb.core.graph import Graph, Node
+from arclimb.core.utils.graph_journal import GraphJournal
+
+
+def make_edits(graph, journal):
+    rows = np.array([[0.1, 0.2, 0.3, 0.4], [0.5, 0.6, 0.7, 0.8], [0.25, 0.5, 0.75, 1.0]], dtype=np.float32)
+    for node_id in ['a', 'b', 'c']:
+        node = Node(node_id)
+        graph.add_node(node)
+        journal.add_node(node)
+
+    graph.set_correspondence_array('a', 'b', rows)
+    journal.set_correspondences('a', 'b', rows)
+    graph.add_correspondence_array('c', 'b', rows[:1])
+    journal.add_correspondences('c', 'b', rows[:1])
+
+    graph.set_correspondence_array('b', 'a', rows[[1, 2, 0]][:, [2, 3, 0, 1]])
+    journal.set_correspondences('b', 'a', rows[[1, 2, 0]][:, [2, 3, 0, 1]])
+    graph.set_correspondence_array('a', 'b', rows[1:])
+    journal.remove_correspondences('a', 'b', rows[:1])
+
+    graph.remove_node('c')
+    journal.remove_node('c')
+
+
+def test_replay(tmp_path):
+    filename = str(tmp_path / 'labels.json')
+    gs.to_json(tg.TestGraph.create_sample_graph(), filename)
+
+    graph = gs.from_json(filename)
+    journal = GraphJournal(filename)
+    make_edits(graph, journal)
+    journal.close()
+
+    recovered = gs.from_json(filename)
+    assert GraphJournal(filename).replay(recovered) == 8
+    tg.TestGraph.assert_graphs_match(graph, recovered)
+
+
+def test_replay_without_graph_file(tmp_path):
+    filename = str(tmp_path / 'labels.json')
+    graph = Graph()
+    journal = GraphJournal(filename, sync=False)
+    make_edits(graph, journal)
+
+    recovered = Graph()
+    assert GraphJournal(filename).replay(recovered) == 8
+    tg.TestGraph.assert_graphs_match(graph, recovered)
+
+
+def test_truncated_entry(tmp_path):
+    filename = str(tmp_path / 'labels.json')
+    journal = GraphJournal(filename)
+    journal.add_node(Node('a'))
+    journal.add_node(Node('b'))
+    journal.close()
+    with open(journal.path, 'a') as f:
+        f.write('{"op": "add_node", "node": {"id": "c", "attri')
+
+    graph = Graph()
+    journal = GraphJournal(filename)
+    assert journal.replay(graph) == 2
+    assert sorted(node.id for node in graph.get_nodes()) == ['a', 'b']
+
+    # New entries go after the last complete one
+    journal.add_node(Node('d'))
+    journal.close()
+    graph = Graph()
+    assert GraphJournal(filename).replay(graph) == 3
+
+
+def test_stale_journal_and_compaction(tmp_path):
+    filename = str(tmp_path / 'labels.json')
+    gs.to_json(tg.TestGraph.create_sample_graph(), filename)
+
+    graph = gs.from_json(filename)
+    journal = GraphJournal(filename, compact_every=3)
+    journal.add_node(Node('x'))
+    graph.add_node(Node('x'))
+    assert not journal.needs_compaction()
+    journal.close()
+
+    # The graph file changed since the journal was started: the journal does not apply to it
+    graph2 = tg.TestGraph.create_sample_graph()
+    graph2.add_node(Node('y'))
+    gs.to_json(graph2, filename)
+    os.utime(filename, ns=(0, 1))
+    stale = GraphJournal(filename)
+    assert stale.replay(gs.from_json(filename)) == 0
+    assert not os.path.exists(journal.path)
+
+    # Its changes are kept aside
+    assert stale.stale_path.startswith(journal.path + '.stale-')
+    with open(stale.stale_path) as f:
+        assert len(f.readlines()) == 2
+
+    journal = GraphJournal(filename, compact_every=3)
+    graph = gs.from_json(filename)
+    for node_id in ['p', 'q', 'r']:
+        graph.add_node(Node(node_id))
+        journal.add_node(Node(node_id))
+    assert journal.needs_compaction()
+
+
+def test_compaction(tmp_path):
+    filename = str(tmp_path / 'labels.json')
+    gs.to_json(tg.TestGraph.create_sample_graph(), filename)
+    with open(filename) as f:
+        saved = f.read()
+
+    graph = gs.from_json(filename)
+    journal = GraphJournal(filename, compact_every=3)
+    make_edits(graph, journal)
+    assert journal.needs_compaction()
+
+    # The changes are folded into a snapshot in the journal; the graph file is left as the user saved it
+    journal.compact(graph)
+    assert len(journal) == 0 and not journal.needs_compaction()
+    with open(filename) as f:
+        assert f.read() == saved
+
+    # Changes after the compaction go on top of the snapshot
+    graph.remove_node('a')
+    journal.remove_node('a')
+    journal.close()
+
+    recovered = gs.from_json(filename)
+    journal = GraphJournal(filename, compact_every=3)
+    assert journal.replay(recovered) == 2
+    assert len(journal) == 1
+    tg.TestGraph.assert_graphs_match(graph, recovered)
+
+    # Compacting again replaces the previous snapshot
+    journal.compact(recovered)
+    recovered = gs.from_json(filename)
+    assert GraphJournal(filename).replay(recovered) == 1
+    tg.TestGraph.assert_graphs_match(graph, recovered)
+
+    # The snapshot does not count towards max_bytes
+    journal = GraphJournal(filename, max_bytes=100)
+    journal.replay(gs.from_json(filename))
+    assert os.path.getsize(journal.path) > 100
+    journal.add_node(Node('z'))
+    assert not journal.needs_compaction()
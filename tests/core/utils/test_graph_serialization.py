@@ -1,6 +1,11 @@
+import json
+import os
+
+import numpy as np
+
 import tests.core.graph.test_graph as tg
 import arclimb.core.utils.graph_serialization as gs
-import os
+from arclimb.core.graph import Graph, Node
 
 tmp_filename = 'tmp_serialization.json'
 
@@ -31,3 +36,39 @@ def test_to_json():
 
     # Clean up
     os.remove(tmp_filename)
+
+
+def test_from_json_small_chunks(monkeypatch):
+    # Values and keys split across chunks, and edges with 'src'/'dest' after the correspondences
+    monkeypatch.setattr(gs._JSONStreamReader, 'CHUNK_SIZE', 7)
+    monkeypatch.setattr(gs, 'BATCH_SIZE', 1)
+    with open(tmp_filename, 'w') as tmp_serial:
+        tmp_serial.write('{ "nodes" : [ {"id": "node1", "attributes": {}}, {"id": "node2", "attributes": {}} ] ,\n'
+                         ' "edges": [{"correspondences": [{"point1": {"x": 0.125, "y": 1e-3}, '
+                         '"point2": {"x": 12345.5, "y": 2}}, {"point1": {"x": 1, "y": 2}, "point2": {"x": 2, "y": 3}}],'
+                         ' "dest": "node1", "src": "node2"}], "extra": [1, 2, {"a": null}]}')
+
+    graph = gs.from_json(tmp_filename)
+    os.remove(tmp_filename)
+
+    assert set(map(tuple, graph.get_correspondence_array('node2', 'node1').tolist())) == {
+        (0.125, float(np.float32(1e-3)), 12345.5, 2.0), (1.0, 2.0, 2.0, 3.0)}
+
+
+def test_to_json_large_edge(monkeypatch):
+    monkeypatch.setattr(gs, 'BATCH_SIZE', 16)
+    graph = Graph()
+    graph.add_node(Node('a'))
+    graph.add_node(Node('b'))
+    rows = np.random.RandomState(0).rand(100, 4).astype(np.float32)
+    graph.set_correspondence_array('b', 'a', rows)
+
+    gs.to_json(graph, tmp_filename)
+    with open(tmp_filename) as f:
+        graph_dict = json.load(f)
+    loaded = gs.from_json(tmp_filename)
+    os.remove(tmp_filename)
+
+    # Same schema as Graph.to_dict
+    assert graph_dict == graph.to_dict()
+    assert np.array_equal(np.sort(loaded.get_correspondence_array('b', 'a'), axis=0), np.sort(rows, axis=0))
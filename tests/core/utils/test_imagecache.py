@@ -0,0 +1,71 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from arclimb.core.utils.imagecache import ImageCache
+
+
+def write_image(path, value=0, shape=(40, 60, 3)):
+    image = np.full(shape, value, np.uint8)
+    image[10:20, 10:30] = 255 - value
+    cv2.imwrite(str(path), image)
+    return image
+
+
+def test_decodes_once(tmp_path):
+    path = str(tmp_path / 'a.png')
+    expected = write_image(path)
+    cache = ImageCache()
+
+    image = cache.get_image(path)
+    assert np.array_equal(image, expected)
+    assert cache.get_image(path) is image
+    assert not image.flags.writeable
+
+    gray = cache.get_matching_image(path, 30)
+    assert gray.ndim == 2 and gray.shape[0] <= 30
+    assert cache.get_matching_image(path, 30) is gray
+    assert cache.nbytes == image.nbytes + gray.nbytes + cache.get_scaled_image(path, 30).nbytes
+
+
+def test_invalidated_when_file_changes(tmp_path):
+    path = str(tmp_path / 'a.png')
+    write_image(path, 0)
+    cache = ImageCache()
+    first = cache.get_image(path)
+
+    write_image(path, 100, (50, 50, 3))
+    os.utime(path, ns=(0, 123456789))
+    second = cache.get_image(path)
+    assert second is not first
+    assert second.shape == (50, 50, 3)
+
+
+def test_byte_budget(tmp_path):
+    paths = [str(tmp_path / ('%d.png' % i)) for i in range(4)]
+    for i, path in enumerate(paths):
+        write_image(path, i)
+    size = 40 * 60 * 3
+    cache = ImageCache(max_bytes=2 * size)
+
+    for path in paths:
+        cache.get_image(path)
+    assert len(cache) == 2 and cache.nbytes == 2 * size
+
+    # The least recently used entries were evicted
+    image = cache.get_image(paths[3])
+    assert cache.get_image(paths[3]) is image
+    assert len(cache) == 2
+
+    # Entries larger than the budget are not kept
+    small_cache = ImageCache(max_bytes=size - 1)
+    assert small_cache.get_image(paths[0]).shape == (40, 60, 3)
+    assert len(small_cache) == 0 and small_cache.nbytes == 0
+
+
+def test_missing_file(tmp_path):
+    cache = ImageCache()
+    with pytest.raises(IOError):
+        cache.get_image(str(tmp_path / 'missing.png'))
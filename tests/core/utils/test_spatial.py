@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from arclimb.core.utils.spatial import GridIndex
+
+
+def brute_force_radius(points, x, y, radius):
+    return sorted(i for i, (px, py) in points.items() if (px - x) ** 2 + (py - y) ** 2 <= radius ** 2)
+
+
+def test_queries_match_brute_force():
+    rnd = random.Random(0)
+    index = GridIndex(7.5)
+    points = {}
+    for _ in range(2000):
+        x, y = rnd.uniform(-50, 150), rnd.uniform(-50, 150)
+        points[index.add(x, y)] = (x, y)
+
+    for point_id in rnd.sample(sorted(points), 500):
+        index.remove(point_id)
+        del points[point_id]
+    assert len(index) == len(points)
+
+    for _ in range(100):
+        x, y, radius = rnd.uniform(-60, 160), rnd.uniform(-60, 160), rnd.uniform(0, 40)
+        assert sorted(index.query_radius(x, y, radius)) == brute_force_radius(points, x, y, radius)
+
+        nearest = index.nearest(x, y, radius)
+        candidates = brute_force_radius(points, x, y, radius)
+        if len(candidates) == 0:
+            assert nearest is None
+        else:
+            best = min((points[i][0] - x) ** 2 + (points[i][1] - y) ** 2 for i in candidates)
+            assert (points[nearest][0] - x) ** 2 + (points[nearest][1] - y) ** 2 == best
+
+    # A rectangle covering everything scans the non-empty cells instead
+    assert sorted(index.query_rect(-1e9, -1e9, 1e9, 1e9)) == sorted(points)
+
+
+def test_remove_and_clear():
+    index = GridIndex(1)
+    a = index.add(0.5, 0.5)
+    b = index.add(0.6, 0.5)
+    index.remove(a)
+    assert index.nearest(0.5, 0.5, 1) == b
+    with pytest.raises(KeyError):
+        index.remove(a)
+
+    index.clear()
+    assert len(index) == 0
+    assert index.query_radius(0.5, 0.5, 10) == []
+    assert index.add(1, 1) not in (a, b)